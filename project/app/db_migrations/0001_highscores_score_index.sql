@@ -0,0 +1,4 @@
+-- Leaderboard reads (top N, keyset pages, leaderboard rebuild) order the highscores by
+-- (score, id) descending. With this index they become backward index range scans instead
+-- of a filesort over the whole table.
+ALTER TABLE highscores ADD INDEX idx_highscores_score_id (score, id);
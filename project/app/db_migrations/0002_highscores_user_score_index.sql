@@ -0,0 +1,4 @@
+-- Per-player reads (a player's highscores, the best score of every player) look up the
+-- highscores of a user ordered by score. The index also backs the user_id foreign key,
+-- so MySQL drops the single-column index it created for the constraint.
+ALTER TABLE highscores ADD INDEX idx_highscores_user_score (user_id, score);
@@ -0,0 +1,6 @@
+-- Highscores written behind from the Redis stream carry the id of their stream entry. The
+-- unique index makes the flush idempotent: an entry delivered twice (e.g. after a crash
+-- between the INSERT and the acknowledgement) is stored only once. One statement, so a
+-- failure cannot leave the column added without its index.
+ALTER TABLE highscores ADD COLUMN submission_id VARCHAR(64) NULL,
+    ADD UNIQUE INDEX uq_highscores_submission_id (submission_id);
@@ -4,15 +4,23 @@ Main entry point for the DexQuiz Application
 import os
 import sys
 import logging
+from contextlib import asynccontextmanager
 from pathlib import Path
 from fastapi import FastAPI
 from fastapi.staticfiles import StaticFiles
-import pokebase as pb
 from dotenv import load_dotenv
-from app.routes import frontend, highscores, users, quiz
+from app.routes import frontend, highscores, users, quiz, metrics
 from app.util.logger import get_logger
 from app.services.database_service import is_database_healthy
-from app.services.redis_service import is_redis_healthy
+from app.services.redis_service import is_redis_healthy, close_redis_client
+from app.services import database_async_service, redis_async_service
+from app.services.auth_service import close_hash_executor
+from app.services.leaderboard_service import ensure_leaderboard
+from app.services.migration_service import migrate_on_startup
+from app.services.highscore_writer import is_write_behind, start_writer, stop_writer
+from app.services.prefetch_service import start_prefetcher, stop_prefetcher
+from app.services.pokeapi_client import get_client, close_client
+from app.services.pokeapi_cache import install_pokebase_cache
 
 # Initialization of the application
 
@@ -20,16 +28,37 @@ load_dotenv()
 logging.basicConfig()
 logger = get_logger(name="DexQuiz", debug=True, level=logging.DEBUG)
 
+
+@asynccontextmanager
+async def lifespan(_app: FastAPI):
+    """Starts and stops the background services that live as long as the application."""
+    if not migrate_on_startup() and is_write_behind():
+        # The flusher stores highscores by submission id (migration 0003); without it
+        # every queued submission would be acknowledged but never stored
+        raise RuntimeError("Write-behind highscores need the pending schema migrations")
+    get_client()
+    redis_async_service.get_redis_client()
+    await ensure_leaderboard()
+    start_prefetcher(logger)
+    start_writer(logger)
+    yield
+    await stop_writer()
+    await stop_prefetcher()
+    await close_client()
+    await redis_async_service.close_redis_client()
+    close_redis_client()
+    await database_async_service.close_pool()
+    close_hash_executor()
+
+
 sessions = {}
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 cache_dir = os.getenv("POKEMON_CACHE", default="./cache")
 host_ip = os.getenv("HOST_IP", "127.0.0.1")
 
-pb.cache.set_cache()
+install_pokebase_cache()
 logger.info("Welcome to the DexQuiz Application")
 
-# print(f"{dir(pb.cache.API_CACHE)}")
-
 # Mount the required directories for the webpage
 
 BASE_DIR = Path(__file__).resolve().parent
@@ -49,6 +78,7 @@ app.include_router(frontend.router)
 app.include_router(highscores.router)
 app.include_router(users.router)
 app.include_router(quiz.router)
+app.include_router(metrics.router)
 
 
 if __name__ == "__main__":
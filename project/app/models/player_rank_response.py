@@ -0,0 +1,32 @@
+"""Player Rank Data Object, the answer to "where am I on the leaderboard?"."""
+from typing import List
+
+from pydantic import BaseModel
+
+
+class RankedPlayer(BaseModel):
+    """A player on the leaderboard.
+
+    rank (int): global rank (players with the same best score share a rank)
+    username (str): the player
+    score (int): best score of the player
+    """
+    rank: int
+    username: str
+    score: int
+
+
+class PlayerRankResponse(BaseModel):
+    """Rank of the requesting player.
+
+    username (str): the player
+    best_score (int): best score of the player
+    rank (int): global rank of the best score
+    players (int): number of ranked players
+    neighbours (List[RankedPlayer]): the players directly around, including the player
+    """
+    username: str
+    best_score: int
+    rank: int
+    players: int
+    neighbours: List[RankedPlayer]
@@ -1,19 +1,100 @@
 """
 Module QuizInfo
 
-Contains the model for the Quiz data.
+Contains the model for the Quiz data and its compact binary encoding.
+
+Encoded quiz state (schema version 1) is a msgpack array:
+    [1, name, pokemon_id, height, weight, stats, types, entry, score]
+where stats is a list in STAT_NAMES order, or a map if the stats use other names.
+
+Minimal quiz state (schema version 2), written by older versions, only references the
+question:
+    [2, pokemon_id, entry_index, score]
+The question itself has to be rehydrated from the Pokédex snapshot by the caller.
 """
+from dataclasses import asdict, dataclass
+import json
+import msgpack
 
+STATE_SCHEMA_VERSION = 1
+MINIMAL_STATE_SCHEMA_VERSION = 2
+STAT_NAMES = ("Hp", "Attack", "Defense", "Special-attack", "Special-defense", "Speed")
 
+
+@dataclass(slots=True)
 class QuizInfo:
     """Object containing information about the pokemon the user is to be quizzed about.
     """
+    name: str
+    pokemon_id: int
+    height: int
+    weight: int
+    stats: dict[str, int]
+    types: list[str]
+    entry: str
+    entry_index: int | None = None  # index into the snapshot entries, if built from it
+
+    def to_dict(self) -> dict:
+        """Returns the fields as a plain dictionary (e.g. for templates and session state)."""
+        return asdict(self)
 
-    def __init__(self, name, pokemon_id, height, weight, stats, types, entry):
-        self.name = name
-        self.pokemon_id = pokemon_id
-        self.height = height
-        self.weight = weight
-        self.stats = stats
-        self.types = types
-        self.entry = entry
+
+def encode_state(state: dict) -> bytes:
+    """Encode a quiz session state (QuizInfo fields plus score) into the binary format.
+
+    Args:
+        state (dict): The session state, as produced by QuizInfo.to_dict() plus "score".
+
+    Returns:
+        bytes: The msgpack-encoded state.
+    """
+    stats = state.get("stats") or {}
+    packed_stats = [stats[name] for name in STAT_NAMES] \
+        if set(stats) == set(STAT_NAMES) else stats
+    return msgpack.packb([
+        STATE_SCHEMA_VERSION,
+        state.get("name"),
+        state.get("pokemon_id"),
+        state.get("height"),
+        state.get("weight"),
+        packed_stats,
+        state.get("types"),
+        state.get("entry"),
+        state.get("score", 0)
+    ])
+
+
+def decode_state(blob: bytes) -> dict:
+    """Decode a session state written by encode_state (or a minimal state).
+
+    States written before the binary format was introduced (plain JSON) are still read.
+    Minimal states are returned as {"pokemon_id", "entry_index", "score"} only.
+
+    Args:
+        blob (bytes): The stored state.
+
+    Raises:
+        ValueError: If the state uses an unknown schema version.
+
+    Returns:
+        dict: The session state.
+    """
+    if blob[:1] == b"{":
+        return json.loads(blob)
+    fields = msgpack.unpackb(blob)
+    if fields[0] == MINIMAL_STATE_SCHEMA_VERSION:
+        _, pokemon_id, entry_index, score = fields
+        return {"pokemon_id": pokemon_id, "entry_index": entry_index, "score": score}
+    if fields[0] != STATE_SCHEMA_VERSION:
+        raise ValueError(f"Unknown quiz state schema version: {fields[0]}")
+    _, name, pokemon_id, height, weight, stats, types, entry, score = fields
+    return {
+        "name": name,
+        "pokemon_id": pokemon_id,
+        "height": height,
+        "weight": weight,
+        "stats": dict(zip(STAT_NAMES, stats)) if isinstance(stats, list) else stats,
+        "types": types,
+        "entry": entry,
+        "score": score
+    }
@@ -10,10 +10,10 @@ class UserInDb(BaseModel):
 
     id (int): User ID
     username (str): username
-    password_hash (str): hashed password
+    password_hash (str | None): hashed password, None for users built from token claims
     created_at (datetime): timestamp of when the user was created.
     """
     id: int
     username: str
-    password_hash: str
+    password_hash: str | None = None
     created_at: datetime.datetime
@@ -6,9 +6,9 @@ import os
 from fastapi import APIRouter, Request
 from fastapi.responses import HTMLResponse, RedirectResponse
 from fastapi.templating import Jinja2Templates
-from app.services.redis_service import get_state, set_state
+from app.services.redis_async_service import get_state, set_state
 
-from app.services.pokemon_service import fetch_pokemon
+from app.services.prefetch_service import next_question
 from app.util.logger import get_logger
 
 router = APIRouter()
@@ -102,11 +102,11 @@ async def get_quiz(request: Request):
             "Missing quiz_session_id cookie in /quiz. Redirecting to /api/start_quiz")
         return RedirectResponse(url="/api/start_quiz")
 
-    state = get_state(session_id)
+    state = await get_state(session_id)
     if not state:
-        pokemon = fetch_pokemon(logger)
-        set_state(session_id, pokemon.__dict__)
-        state = pokemon.__dict__
+        pokemon = await next_question(logger)
+        await set_state(session_id, pokemon.to_dict())
+        state = pokemon.to_dict()
 
     logger.info(f"Pokemon information captured: {state}")
     return templates.TemplateResponse(
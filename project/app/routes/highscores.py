@@ -1,16 +1,26 @@
 """
 Module highscores: Contains all backend routes that are highscore-related.
 """
+import asyncio
 import json
-from typing import List
-from fastapi import APIRouter, Cookie, HTTPException, Request, Depends
+from typing import List, Literal
+from fastapi import APIRouter, Cookie, HTTPException, Request, Depends, Query, Response
+from fastapi.responses import StreamingResponse
+import aiomysql
 import mysql
-
-from app.services.database_service import get_highscores, add_highscore, get_top_highscores, get_connection
-from app.services.auth_service import get_user_from_token
-from app.services.redis_service import get_redis_client
+import redis
+
+from app.services.database_service import (
+    get_connection, iter_highscore_batches, decode_highscore_cursor)
+from app.services.database_async_service import (
+    connection, get_db, insert_highscore, get_top_highscores, get_user_rank,
+    get_highscores_page, get_highscore_rank as get_highscore_rank_from_db)
+from app.services.auth_service import get_user_from_token_async
+from app.services.redis_async_service import get_state, reset_score
+from app.services import highscore_writer, leaderboard_service
 from app.util.logger import get_logger
 from app.models.highscore_response import HighscoreResponse
+from app.models.player_rank_response import PlayerRankResponse
 from app.models.user_in_db import UserInDb
 
 
@@ -35,9 +45,14 @@ def get_token_from_cookie(access_token: str | None = Cookie(default=None)):
     return access_token
 
 
-def get_current_user_from_cookie(token: str = Depends(get_token_from_cookie)) -> UserInDb:
+async def get_current_user_from_cookie(
+    token: str = Depends(get_token_from_cookie)
+) -> UserInDb:
     """Retrieves the current user based on the token stored in cookies.
 
+    Needs no database connection: the user is built from the token claims, and only
+    looked up (on a connection of its own) for tokens without them.
+
     Args:
         token (str): JWT token obtained from cookies.
 
@@ -45,78 +60,132 @@ def get_current_user_from_cookie(token: str = Depends(get_token_from_cookie)) ->
         UserInDb: The user associated with the token.
 
     Raises:
-        HTTPException: If token is invalid or user cannot be found.
+        HTTPException: If token is invalid or revoked, or user cannot be found.
     """
-    db_conn = get_connection()
+    return await get_user_from_token_async(token)
+
+
+def _highscore_json(row) -> str:
+    return json.dumps({"username": row["username"], "score": row["score"],
+                       "achieved_at": row["achieved_at"].isoformat()})
+
+
+def _stream_highscores(db_conn, after, stream_format):
+    """Serialize the highscores batch by batch and release the connection at the end."""
     try:
-        user = get_user_from_token(token, db_conn)
-        return user
+        first = True
+        if stream_format == "json":
+            yield "["
+        for rows in iter_highscore_batches(db_conn, after):
+            if stream_format == "json":
+                chunk = ",".join(_highscore_json(row) for row in rows)
+                yield chunk if first else "," + chunk
+            else:
+                yield "".join(_highscore_json(row) + "\n" for row in rows)
+            first = False
+        if stream_format == "json":
+            yield "]"
+    except mysql.connector.Error as err:
+        # The status line is already sent, the client sees a truncated body.
+        logger.error(f"Highscore stream aborted: {err}")
     finally:
-        if db_conn:
-            db_conn.close()
+        db_conn.close()
 
 
 @router.get("/api/highscores", response_model=List[HighscoreResponse])
-async def get_all_highscores(user: UserInDb = Depends(get_current_user_from_cookie)):
-    """Returns all highscores in the database.
+async def get_all_highscores(
+    response: Response,
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: str | None = None,
+    stream: Literal["ndjson", "json"] | None = None,
+    user: UserInDb = Depends(get_current_user_from_cookie)
+):
+    """Returns the highscores in the database, best first, one page at a time.
+
+    Pages are keyset-paginated on (score, id): the X-Next-Cursor header of a page holds the
+    token to pass as cursor for the next one, and is missing on the last page. With
+    stream, all highscores from the cursor on are streamed straight from the database
+    as NDJSON or as a JSON array instead.
+
+    The route does not depend on get_db, whose connection would only be returned after
+    the response (and so the whole stream) has been sent. A page takes an asyncio
+    connection for its query; a stream holds a connection of the synchronous pool until
+    it ends.
 
     Requires user to be authenticated via a JWT token in cookies.
 
     Args:
+        response (Response): Used to set the X-Next-Cursor header.
+        limit (int): Page size, 1 to 1000. Defaults to 100.
+        cursor (str, optional): Token of the page to return. Defaults to the first page.
+        stream (str, optional): "ndjson" or "json" to stream instead of paging.
         user (UserInDb): The authenticated user.
 
     Returns:
-        List[HighscoreResponse]: A list of all highscores.
+        List[HighscoreResponse] | StreamingResponse: A page of highscores, or the stream.
 
     Raises:
-        HTTPException: 404 if highscores are not found.
+        HTTPException: 400 if the cursor is invalid.
         HTTPException: 500 if a database error occurs.
     """
-    db_conn = None
     try:
-        db_conn = get_connection()
-        highscores = get_highscores(db_conn)
-        return highscores
+        after = decode_highscore_cursor(cursor) if cursor else None
     except ValueError as valueerr:
-        raise HTTPException(
-            status_code=404, detail=str(valueerr)) from valueerr
-    except mysql.connector.Error as err:
+        raise HTTPException(status_code=400, detail=str(valueerr)) from valueerr
+
+    try:
+        if stream:
+            # The checkout may wait for the synchronous pool, so it runs in a thread.
+            stream_conn = await asyncio.to_thread(get_connection)
+            return StreamingResponse(
+                _stream_highscores(stream_conn, after, stream),
+                media_type="application/x-ndjson" if stream == "ndjson" else "application/json")
+        async with connection() as db_conn:
+            highscores, next_cursor = await get_highscores_page(db_conn, limit, after)
+        if next_cursor:
+            response.headers["X-Next-Cursor"] = next_cursor
+        return highscores
+    except (aiomysql.MySQLError, mysql.connector.Error) as err:
         raise HTTPException(status_code=500, detail=str(err)) from err
-    finally:
-        if db_conn:
-            db_conn.close()
 
 
 @router.get("/api/highscore/{top}", response_model=List[HighscoreResponse])
 async def get_top_highscores_api(
     top: int,
-    user: UserInDb = Depends(get_current_user_from_cookie)
+    user: UserInDb = Depends(get_current_user_from_cookie),
+    db_conn=Depends(get_db)
 ):
     """"Returns the top N highscores. Requires authentication.
 
     Args:
         top (int): The number of top scores to retrieve.
         user (UserInDb): The authenticated user (access control only).
+        db_conn: Connection of the request.
 
     Returns:
         List[HighscoreResponse]: The top N highscores.
 
+    Served from the Redis leaderboard. Falls back to MySQL while the leaderboard is not
+    available.
+
     Raises:
         HTTPException: 404 if no highscores are found.
         HTTPException: 500 if a database error occurs.
     """
-    db_conn = None
     try:
-        db_conn = get_connection()
-        highscores = get_top_highscores(db_conn, top)
+        highscores = await leaderboard_service.get_top(top)
+        if highscores is not None:
+            return highscores
+    except redis.exceptions.RedisError as e:
+        logger.warn(f"Leaderboard unavailable, reading from the database: {e}")
+
+    try:
+        highscores = await get_top_highscores(db_conn, top)
         return highscores
     except ValueError as ve:
         raise HTTPException(status_code=404, detail=str(ve)) from ve
-    except mysql.connector.Error as e:
+    except aiomysql.MySQLError as e:
         raise HTTPException(status_code=500, detail=str(e)) from e
-    finally:
-        if db_conn:
-            db_conn.close()
 
 
 def get_session_id_from_request(request: Request) -> str:
@@ -127,15 +196,12 @@ def get_session_id_from_request(request: Request) -> str:
     return session_id
 
 
-def get_score_from_redis(session_id: str) -> int:
-    redis = get_redis_client()
-    redis_key = f"quiz:{session_id}"
-    json_data = redis.get(redis_key)
-    if json_data is None:
+async def get_score_from_redis(session_id: str) -> int:
+    data = await get_state(session_id, ("score",))
+    if data is None:
         logger.warn("No quiz data found.")
         raise HTTPException(status_code=400, detail="No quiz data found")
 
-    data = json.loads(json_data)
     score = data.get("score")
     if score is None:
         logger.warn("No score found in quiz data.")
@@ -144,25 +210,123 @@ def get_score_from_redis(session_id: str) -> int:
     return int(score)
 
 
-def reset_score_in_redis(session_id: str) -> None:
-    redis = get_redis_client()
-    redis_key = f"quiz:{session_id}"
-    redis.set(redis_key, 0)
+async def reset_score_in_redis(session_id: str) -> None:
+    await reset_score(session_id)
+
+
+async def add_to_leaderboard(highscore_data) -> None:
+    """Mirror a new highscore into the Redis leaderboard. MySQL stays the source of truth,
+    so a failure is only logged (the next rebuild picks the highscore up)."""
+    try:
+        await leaderboard_service.add_entry(*highscore_data)
+    except redis.exceptions.RedisError as e:
+        logger.warn(f"Could not add highscore {highscore_data[0]} to the leaderboard: {e}")
+
+
+@router.get("/api/highscore/rank/me", response_model=PlayerRankResponse)
+async def get_my_rank(
+    user: UserInDb = Depends(get_current_user_from_cookie),
+    db_conn=Depends(get_db)
+):
+    """Returns the caller's best score, global rank and the players directly around them.
+
+    Served from the Redis player ranking. Falls back to MySQL while the leaderboard is
+    not available.
+
+    Args:
+        user (UserInDb): The authenticated user.
+        db_conn: Connection of the request.
+
+    Returns:
+        PlayerRankResponse: Best score, rank and neighbours of the user.
+
+    Raises:
+        HTTPException: 404 if the user has no highscore yet.
+        HTTPException: 500 if a database error occurs.
+    """
+    result = None
+    answered = False
+    try:
+        if await leaderboard_service.is_ready():
+            result = await leaderboard_service.get_player_rank(user.username)
+            answered = True
+    except redis.exceptions.RedisError as e:
+        logger.warn(f"Leaderboard unavailable, reading from the database: {e}")
+
+    if not answered:
+        try:
+            result = await get_user_rank(db_conn, user.username)
+        except aiomysql.MySQLError as e:
+            raise HTTPException(status_code=500, detail=str(e)) from e
+
+    if result is None:
+        raise HTTPException(status_code=404, detail="No highscore yet")
+    return result
+
+
+@router.get("/api/highscore/rank/{highscore_id}")
+async def get_highscore_rank(
+    highscore_id: int,
+    user: UserInDb = Depends(get_current_user_from_cookie),
+    db_conn=Depends(get_db)
+):
+    """Returns the leaderboard rank of a highscore. Requires authentication.
+
+    Served from the Redis leaderboard. Falls back to MySQL while the leaderboard is not
+    available.
+
+    Args:
+        highscore_id (int): Id of the highscore.
+        user (UserInDb): The authenticated user (access control only).
+        db_conn: Connection of the request.
+
+    Returns:
+        dict: The highscore id and its 1-based rank.
+
+    Raises:
+        HTTPException: 404 if the highscore is not on the leaderboard.
+        HTTPException: 500 if a database error occurs.
+    """
+    rank = None
+    answered = False
+    try:
+        if await leaderboard_service.is_ready():
+            rank = await leaderboard_service.get_rank(highscore_id)
+            answered = True
+    except redis.exceptions.RedisError as e:
+        logger.warn(f"Leaderboard unavailable, reading from the database: {e}")
+
+    if not answered:
+        try:
+            rank = await get_highscore_rank_from_db(db_conn, highscore_id)
+        except aiomysql.MySQLError as e:
+            raise HTTPException(status_code=500, detail=str(e)) from e
+        # The leaderboard only holds the best LEADERBOARD_MAX_ENTRIES highscores
+        if rank is not None and rank > leaderboard_service.get_max_entries():
+            rank = None
+
+    if rank is None:
+        raise HTTPException(status_code=404, detail="Highscore not on the leaderboard")
+    return {"highscore_id": highscore_id, "rank": rank}
 
 
 @router.post("/api/highscore")
 async def post_highscore(
     request: Request,
     user: UserInDb = Depends(get_current_user_from_cookie),
+    db_conn=Depends(get_db)
 ):
     """Submits the user's current score as a highscore.
 
     Reads score data from Redis using the quiz session ID stored in cookies.
     Validates and stores the highscore in the database. Resets the score in Redis afterward.
+    In write-behind mode the highscore is queued instead and its id is None until the
+    flusher has stored it.
 
     Args:
         request (Request): The HTTP request containing cookies.
         user (UserInDb): The authenticated user submitting the score.
+        db_conn: Connection of the request.
 
     Returns:
         dict: The newly created highscore record.
@@ -173,21 +337,26 @@ async def post_highscore(
         HTTPException: 500 on internal server or database error.
     """
     session_id = get_session_id_from_request(request)
-    score = get_score_from_redis(session_id)
+    score = await get_score_from_redis(session_id)
+
+    if highscore_writer.is_write_behind():
+        try:
+            highscore_data = await highscore_writer.enqueue_highscore(user.id, user.username, score)
+        except redis.exceptions.RedisError as e:
+            raise HTTPException(
+                status_code=500, detail="Internal server error") from e
+        await reset_score_in_redis(session_id)
+        return highscore_data
 
-    db_conn = None
     try:
-        db_conn = get_connection()
         logger.info(f"Storing highscore for {user.username}: {score}")
-        highscore_data = add_highscore(db_conn, user.username, score)
+        highscore_data = await insert_highscore(db_conn, user.id, user.username, score)
+        await add_to_leaderboard(highscore_data)
 
-        reset_score_in_redis(session_id)
+        await reset_score_in_redis(session_id)
         return highscore_data
     except ValueError as ve:
         raise HTTPException(status_code=404, detail=str(ve)) from ve
-    except mysql.connector.Error as e:
+    except aiomysql.MySQLError as e:
         raise HTTPException(
             status_code=500, detail="Internal server error") from e
-    finally:
-        if db_conn:
-            db_conn.close()
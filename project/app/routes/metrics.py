@@ -0,0 +1,25 @@
+"""
+Module metrics: Exposes the in-process metrics of this worker as JSON.
+"""
+from fastapi import APIRouter, Depends
+
+from app.models.user_in_db import UserInDb
+from app.routes.highscores import get_current_user_from_cookie
+from app.util import metrics
+
+router = APIRouter()
+
+
+@router.get("/api/metrics")
+async def get_metrics(_current_user: UserInDb = Depends(get_current_user_from_cookie)):
+    """Returns all counters, gauges and timings recorded by this worker.
+
+    Only available to logged in users, like the other /api routes.
+
+    Returns:
+        dict: The current metrics snapshot.
+
+    Raises:
+        HTTPException: 401 if the request is not authenticated.
+    """
+    return metrics.snapshot()
@@ -2,8 +2,8 @@ import uuid
 from fastapi import APIRouter, Request, Form, Response
 from fastapi.responses import JSONResponse, RedirectResponse
 
-from app.services.pokemon_service import fetch_pokemon
-from app.services.redis_service import get_state, set_state
+from app.services.prefetch_service import next_question
+from app.services.redis_async_service import get_state, set_state, evaluate_guess, reset_score
 
 from app.util.logger import get_logger
 
@@ -53,13 +53,8 @@ async def next_quiz(request: Request):
     if session_id is None:
         return JSONResponse(status_code=400, content={"error": "No quiz session found"})
 
-    current_state = get_state(session_id)
-    score = current_state.get("score", 0) if current_state else 0
-
-    new_pokemon = fetch_pokemon(logger)
-    state = new_pokemon.__dict__
-    state["score"] = score
-    set_state(session_id, state)
+    new_pokemon = await next_question(logger)
+    await set_state(session_id, new_pokemon.to_dict())
 
     return {"message": "New quiz loaded."}
 
@@ -68,13 +63,13 @@ def get_or_create_session_id(request: Request) -> str:
     return request.cookies.get("quiz_session_id") or str(uuid.uuid4())
 
 
-def get_or_init_state(session_id: str) -> dict:
-    state = get_state(session_id)
+async def get_or_init_state(session_id: str) -> dict:
+    state = await get_state(session_id)
     if not state:
-        pokemon = fetch_pokemon(logger)
-        state = pokemon.__dict__
+        pokemon = await next_question(logger)
+        state = pokemon.to_dict()
         state["score"] = 0
-        set_state(session_id, state)
+        await set_state(session_id, state)
     return state
 
 
@@ -110,8 +105,8 @@ def set_session_cookie(response: JSONResponse, session_id: str):
 async def post_quiz(request: Request, guess: str = Form(...)):
     """Processes the user's guess and updates the quiz session.
 
-    Checks the submitted answer against the correct Pokémon name.
-    Updates the score on a correct guess and prepares hints for incorrect guesses.
+    Checks the submitted answer against the correct Pokémon name and updates the score
+    on a correct guess in one atomic Redis call (see redis_async_service.evaluate_guess).
     Initializes a new session if none exists.
 
     Args:
@@ -123,19 +118,15 @@ async def post_quiz(request: Request, guess: str = Form(...)):
         the updated score, and optional hints.
     """
     session_id = get_or_create_session_id(request)
-    state = get_or_init_state(session_id)
-
-    guess = guess.strip().lower()
-    correct_answer = state["name"].lower()
-    score = state.get("score", 0)
+    result = await evaluate_guess(session_id, guess)
+    if result is None:
+        await get_or_init_state(session_id)
+        result = await evaluate_guess(session_id, guess)
+    correct, score = result
 
-    if guess == correct_answer:
-        score += 25
-        state["score"] = score
-        set_state(session_id, state)
+    if correct:
         response = create_correct_response(score)
     else:
-        set_state(session_id, state)
         response = create_incorrect_response(score)
 
     if "quiz_session_id" not in request.cookies:
@@ -158,11 +149,7 @@ async def reset_quiz_score(request: Request):
     if not session_id:
         return JSONResponse(status_code=400, content={"error": "No quiz session found"})
 
-    state = get_state(session_id)
-    if not state:
+    if not await reset_score(session_id):
         return JSONResponse(status_code=404, content={"error": "Quiz session state not found"})
 
-    state["score"] = 0
-    set_state(session_id, state)
-
     return JSONResponse(content={"message": "Quiz score has been reset.", "score": 0})
\ No newline at end of file
@@ -9,15 +9,19 @@ from fastapi.security import OAuth2PasswordRequestForm
 from pydantic import BaseModel
 
 from app.services.auth_service import (
-    authenticate_user,
+    authenticate_user_async,
     create_access_token,
     create_refresh_token,
-    refresh_token_pair,
-    register_user
+    refresh_token_pair_async,
+    register_user_async,
+    revoke_tokens,
+    user_claims
 )
-from app.services.database_service import get_user, add_user, get_connection
+from app.services.database_async_service import get_user, add_user, get_db
+from app.services.login_throttle import check_login_attempt
 from app.util.logger import get_logger
 from app.routes.highscores import get_current_user_from_cookie
+from app.models.user_in_db import UserInDb
 
 router = APIRouter()
 templates = Jinja2Templates(directory="templates")
@@ -33,28 +37,24 @@ class RegisterRequest(BaseModel):
     password: str
 
 
-def verify_credentials(username: str, password: str):
-    conn = get_connection()
-    try:
-        db_user = get_user(conn, username)
-        if db_user is None:
-            logger.warning("Login failed: User %s not found", username)
-            raise HTTPException(
-                status_code=401, detail="Invalid username or password")
-
-        user = authenticate_user(db_user, password)
-        if not user:
-            logger.warning("Login failed: Invalid password")
-            raise HTTPException(
-                status_code=401, detail="Invalid username or password")
-        return user
-    finally:
-        conn.close()
-
-
-def set_login_cookies(response: Response, username: str):
-    access_token = create_access_token(data={"sub": username})
-    refresh_token = create_refresh_token(data={"sub": username})
+async def verify_credentials(username: str, password: str, conn):
+    db_user = await get_user(conn, username)
+    if db_user is None:
+        logger.warning("Login failed: User %s not found", username)
+        raise HTTPException(
+            status_code=401, detail="Invalid username or password")
+
+    user = await authenticate_user_async(db_user, password)
+    if not user:
+        logger.warning("Login failed: Invalid password")
+        raise HTTPException(
+            status_code=401, detail="Invalid username or password")
+    return user
+
+
+def set_login_cookies(response: Response, user: UserInDb):
+    access_token = create_access_token(data=user_claims(user))
+    refresh_token = create_refresh_token(data={"sub": user.username})
 
     response.set_cookie(
         key="access_token",
@@ -76,13 +76,30 @@ def set_login_cookies(response: Response, username: str):
     )
 
 
+async def throttled_login_form(request: Request,
+                               form_data: OAuth2PasswordRequestForm = Depends()):
+    """Login form dependency that throttles attempts per username and client IP.
+
+    Resolved before the database connection, so a throttled attempt costs neither a
+    connection nor a password check.
+
+    Raises:
+        HTTPException: 429 once a budget is used up.
+    """
+    await check_login_attempt(
+        form_data.username, request.client.host if request.client else "unknown")
+    return form_data
+
+
 @router.post("/api/token")
-async def login(response: Response, form_data: OAuth2PasswordRequestForm = Depends()):
+async def login(response: Response,
+                form_data: OAuth2PasswordRequestForm = Depends(throttled_login_form),
+                db_conn=Depends(get_db)):
     """Login route that returns access and refresh tokens as HTTP-only cookies."""
     logger.info("Login attempt for user: %s", form_data.username)
     try:
-        user = verify_credentials(form_data.username, form_data.password)
-        set_login_cookies(response, user.username)
+        user = await verify_credentials(form_data.username, form_data.password, db_conn)
+        set_login_cookies(response, user)
     except HTTPException as e:
         logger.error("HTTPException during login for user %s: %s",
                      form_data.username, e.detail)
@@ -95,60 +112,55 @@ async def login(response: Response, form_data: OAuth2PasswordRequestForm = Depen
 
 
 @router.post("/api/token/refresh")
-def refresh_token(response: Response, request: Request):
-    db_conn = None
-    try:
-        db_conn = get_connection()
-        old_token = request.cookies.get("refresh_token")
-        if not old_token:
-            raise HTTPException(
-                status_code=401, detail="Missing refresh token")
+async def refresh_token(response: Response, request: Request, db_conn=Depends(get_db)):
+    old_token = request.cookies.get("refresh_token")
+    if not old_token:
+        raise HTTPException(
+            status_code=401, detail="Missing refresh token")
 
-        access_token, new_refresh_token, username = refresh_token_pair(
-            old_token, db_conn)
+    access_token, new_refresh_token, username = await refresh_token_pair_async(
+        old_token, db_conn)
 
-        response.set_cookie("access_token", access_token, httponly=True,
-                            secure=True, samesite="strict", max_age=1800, path="/")
-        response.set_cookie("refresh_token", new_refresh_token, httponly=True,
-                            secure=True, samesite="strict", max_age=7 * 24 * 60 * 60, path="/")
-        return {"message": f"Token refreshed for {username}"}
-    finally:
-        if db_conn:
-            db_conn.close()
+    response.set_cookie("access_token", access_token, httponly=True,
+                        secure=True, samesite="strict", max_age=1800, path="/")
+    response.set_cookie("refresh_token", new_refresh_token, httponly=True,
+                        secure=True, samesite="strict", max_age=7 * 24 * 60 * 60, path="/")
+    return {"message": f"Token refreshed for {username}"}
 
 
 @router.post("/api/register", status_code=status.HTTP_201_CREATED)
-async def register(request: RegisterRequest):
+async def register(request: RegisterRequest, db_conn=Depends(get_db)):
     """Registers a new user.
     Args:
         request (RegisterRequest): Request
+        db_conn: Connection of the request.
 
     Raises:
         HTTPException: _description_
     """
-    db_conn = None
     logger.info("Register attempt for new user: %s", request.username)
+    hashed_password = await register_user_async(request.username, request.password)
     try:
-        db_conn = get_connection()
-        add_user(db_conn, request.username, register_user(
-            request.username, request.password))
+        await add_user(db_conn, request.username, hashed_password)
         logger.info("User registered successfully: %s", request.username)
     except Exception as e:
         logger.error("Error during registration for user %s: %s",
                      request.username, e)
         raise HTTPException(status_code=400, detail=str(e)) from e
-    finally:
-        if db_conn:
-            db_conn.close()
 
 
 @router.post("/api/logout")
-def logout(response: Response):
+async def logout(request: Request, response: Response):
+    """Deletes the token cookies and puts the tokens on the deny-list, so copies of them
+    are rejected as well."""
+    await revoke_tokens(request.cookies.get("access_token"),
+                        request.cookies.get("refresh_token"))
     response.delete_cookie("access_token")
     response.delete_cookie("refresh_token")
     return {"detail": "Logged out successfully"}
 
 
-@router.get("/api/username")
-async def get_username(current_user: dict = Depends(get_current_user_from_cookie)):
+@router.get("/api/username", response_model=UserInDb,
+            response_model_exclude={"password_hash"})
+async def get_username(current_user: UserInDb = Depends(get_current_user_from_cookie)):
     return current_user
@@ -3,10 +3,40 @@ Module auth_service: Authentication Service
 
 Handles everything authentication- and token-related.
 However does NOT connect to the database directly. only via imports from the database service.
+
+bcrypt spends 100-300 ms of CPU per hash. The async routes therefore hash and verify
+passwords on a small dedicated thread pool (bcrypt releases the GIL), so the event loop
+keeps serving other requests. Requests beyond the queue limit are answered with 503
+instead of piling up behind a login storm.
+
+Access tokens carry the claims of their user (uid, sub, created_at) next to a token id
+(jti) and issue time (iat), so authenticated requests build their user from the token
+without a database round trip. Revocation (logout, deleted users) is checked against the
+Redis deny-list of token_denylist. Tokens without these claims, and every request while
+the deny-list cannot be read, fall back to looking the user up.
+
+Metrics:
+- password_hash.hash_seconds / password_hash.verify_seconds (timings): CPU time per bcrypt call.
+- password_hash.wait_seconds (timing): Time a call waited for a free worker.
+- password_hash.pending (gauge): Calls queued or running.
+- password_hash.rejected (counter): Calls refused with 503 because the queue was full.
+- auth.stateless / auth.lookups (counters): Requests whose user was built from the token
+  claims / looked up in the user cache or database.
+- auth.revoked (counter): Requests rejected with a revoked token.
+- auth.denylist_errors (counter): Requests that could not check the deny-list.
+
+Environment Variables:
+- PASSWORD_HASH_WORKERS: Threads hashing passwords. Defaults to 2.
+- PASSWORD_HASH_MAX_PENDING: Calls allowed to be queued or running. Defaults to 16.
 """
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
+import asyncio
 import os
+import time
+import uuid
 import bcrypt
+import redis
 from jose import jwt, JWTError
 from dotenv import load_dotenv
 from fastapi import HTTPException
@@ -15,6 +45,9 @@ from fastapi.security import OAuth2PasswordBearer
 from app.models.user_in_db import UserInDb
 from app.models.token import Token
 from app.services.database_service import get_user
+from app.services import database_async_service, token_denylist, user_cache
+from app.util import metrics
+from app.util.logger import get_logger
 
 load_dotenv()
 
@@ -26,6 +59,66 @@ MIN_PASSWORD_LENGTH = 8
 MAX_STRING_LENGTH = 100
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/token")
+logger = get_logger("Auth")
+
+HASH_EXECUTOR = None
+_HASH_PENDING = 0
+
+
+def get_hash_executor() -> ThreadPoolExecutor:
+    """Returns the password hashing thread pool, creating it on first use."""
+    global HASH_EXECUTOR
+    if HASH_EXECUTOR is None:
+        HASH_EXECUTOR = ThreadPoolExecutor(
+            max_workers=int(os.getenv("PASSWORD_HASH_WORKERS", "2")),
+            thread_name_prefix="password-hash")
+    return HASH_EXECUTOR
+
+
+def close_hash_executor():
+    """Shut the password hashing thread pool down."""
+    global HASH_EXECUTOR
+    if HASH_EXECUTOR is not None:
+        HASH_EXECUTOR.shutdown(wait=False, cancel_futures=True)
+        HASH_EXECUTOR = None
+
+
+async def _run_hash(name: str, func, *args):
+    """Run a bcrypt call on the hashing pool and time it.
+
+    Args:
+        name (str): "hash" or "verify", used in the metric names.
+        func: The bcrypt function.
+        *args: Its arguments.
+
+    Raises:
+        HTTPException: 503 if PASSWORD_HASH_MAX_PENDING calls are already queued or running.
+
+    Returns:
+        The result of func.
+    """
+    global _HASH_PENDING
+    if _HASH_PENDING >= int(os.getenv("PASSWORD_HASH_MAX_PENDING", "16")):
+        metrics.increment("password_hash.rejected")
+        raise HTTPException(status_code=503, detail="Server busy, please try again",
+                            headers={"Retry-After": "1"})
+    submitted = time.perf_counter()
+
+    def timed():
+        start = time.perf_counter()
+        metrics.observe("password_hash.wait_seconds", start - submitted)
+        try:
+            return func(*args)
+        finally:
+            metrics.observe(f"password_hash.{name}_seconds", time.perf_counter() - start)
+
+    _HASH_PENDING += 1
+    metrics.set_gauge("password_hash.pending", _HASH_PENDING)
+    try:
+        return await asyncio.get_running_loop().run_in_executor(get_hash_executor(), timed)
+    finally:
+        _HASH_PENDING -= 1
+        metrics.set_gauge("password_hash.pending", _HASH_PENDING)
 
 
 def register_user(username, password):
@@ -47,8 +140,44 @@ def register_user(username, password):
     return hashed
 
 
-def authenticate_user(db_user, plain_pw):
-    """Authenticates a user by checking the provided password against the stored hash.
+async def register_user_async(username, password):
+    """register_user with the hashing run on the password hashing pool.
+
+    Args:
+        username (str): The desired username.
+        password (str): The user's plain-text password.
+
+    Raises:
+        HTTPException: 400 if the credentials do not meet the required standards.
+        HTTPException: 503 if the hashing pool is saturated.
+
+    Returns:
+        bytes: The hashed password using bcrypt.
+    """
+    if not check_credentials(username, password):
+        raise HTTPException(status_code=400, detail="Registration failed")
+    return await _run_hash("hash", bcrypt.hashpw, password.encode('utf-8'), bcrypt.gensalt())
+
+
+def _stored_hash(db_user) -> bytes:
+    """Returns the password hash of a users row, rejecting incomplete rows."""
+    if len(db_user["username"]) < 1 or len(db_user["password_hash"]) < 1:
+        raise HTTPException(status_code=400, detail="Invalid credentials")
+    password_hash = db_user["password_hash"]
+    return password_hash.encode('utf-8') if isinstance(password_hash, str) else password_hash
+
+
+def _user_from_row(db_user, password_hash: bytes) -> UserInDb:
+    return UserInDb(
+        id=db_user["id"],
+        username=db_user["username"],
+        password_hash=password_hash.decode(),
+        created_at=db_user["created_at"]
+    )
+
+
+async def authenticate_user_async(db_user, plain_pw):
+    """authenticate_user with the verification run on the password hashing pool.
 
     Args:
         db_user (dict): A dictionary containing user data from the database.
@@ -56,35 +185,57 @@ def authenticate_user(db_user, plain_pw):
 
     Raises:
         HTTPException: In case the credentials are invalid or missing.
+        HTTPException: 503 if the hashing pool is saturated.
 
     Returns:
         UserInDb: The authenticated user data wrapped in a UserInDb model.
     """
-    username = db_user["username"]
-    password_hash = db_user["password_hash"]
+    password_hash = _stored_hash(db_user)
+    if not await _run_hash("verify", bcrypt.checkpw, plain_pw.encode('utf-8'), password_hash):
+        raise HTTPException(status_code=401, detail="Invalid credentials")
+    return _user_from_row(db_user, password_hash)
 
-    if len(username) < 1 or len(password_hash) < 1:
-        raise HTTPException(status_code=400, detail="Invalid credentials")
 
-    if isinstance(password_hash, str):
-        password_hash = password_hash.encode('utf-8')
+def authenticate_user(db_user, plain_pw):
+    """Authenticates a user by checking the provided password against the stored hash.
+
+    Args:
+        db_user (dict): A dictionary containing user data from the database.
+        plain_pw (str): The plain-text password for veryfication.
+
+    Raises:
+        HTTPException: In case the credentials are invalid or missing.
+
+    Returns:
+        UserInDb: The authenticated user data wrapped in a UserInDb model.
+    """
+    password_hash = _stored_hash(db_user)
 
     if not bcrypt.checkpw(plain_pw.encode('utf-8'), password_hash):
         print("credentials invalid")
         raise HTTPException(status_code=401, detail="Invalid credentials")
     print("authenticate user complete")
-    return UserInDb(
-        id=db_user["id"],
-        username=username,
-        password_hash=password_hash.decode() if isinstance(
-            password_hash, bytes) else password_hash,
-        created_at=db_user["created_at"]
-    )
+    return _user_from_row(db_user, password_hash)
+
+
+def user_claims(user: UserInDb) -> dict:
+    """Returns the claims an access token needs to rebuild its user without the database.
+
+    Args:
+        user (UserInDb): The user.
+
+    Returns:
+        dict: sub (username), uid and created_at.
+    """
+    return {"sub": user.username, "uid": user.id, "created_at": user.created_at.isoformat()}
 
 
 def create_access_token(data: dict, expires_delta: timedelta | None = None):
     """Creates a JWT access token with an optional expiration.
 
+    Every token gets a unique token id (jti) and its issue time (iat), so it can be
+    revoked. Pass user_claims(user) as data to make it usable without a user lookup.
+
     Args:
         data (dict): The payload to encode into the token.
         expires_delta (timedelta | None, optional): The duration before the token expires. 
@@ -98,7 +249,7 @@ def create_access_token(data: dict, expires_delta: timedelta | None = None):
         expire = datetime.now() + expires_delta
     else:
         expire = datetime.now() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-    to_encode.update({"exp": expire})
+    to_encode.update({"exp": expire, "iat": time.time(), "jti": uuid.uuid4().hex})
     return Token(
         access_token=jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM),
         token_type="bearer"
@@ -117,7 +268,7 @@ def create_refresh_token(data: dict, expires_delta: timedelta | None = None):
     """
     to_encode = data.copy()
     expire = datetime.now() + (expires_delta or timedelta(days=7))
-    to_encode.update({"exp": expire})
+    to_encode.update({"exp": expire, "iat": time.time(), "jti": uuid.uuid4().hex})
     return Token(
         access_token=jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM),
         token_type="bearer"
@@ -156,6 +307,106 @@ def refresh_token_pair(refresh_token: str, db_conn) -> tuple[str, str, str]:
     return access_token, new_refresh_token, username
 
 
+async def get_user_cached(db_conn, username: str):
+    """Fetches a user through the user cache, reading the database only on a miss.
+
+    Args:
+        db_conn (aiomysql.Connection | None): The database connection of the request. If
+            None, a connection is taken from the pool on a miss.
+        username (str): The username.
+
+    Returns:
+        dict | None: The user entry (id, username, created_at), without the password hash.
+    """
+    user = await user_cache.get_user(username)
+    if user is None:
+        since = user_cache.generation()
+        if db_conn is None:
+            async with database_async_service.connection() as own_conn:
+                user = await database_async_service.get_user(own_conn, username)
+        else:
+            user = await database_async_service.get_user(db_conn, username)
+        if user is not None:
+            user = user_cache.cached_fields(user)
+            await user_cache.put_user(user, since)
+    return user
+
+
+async def _check_revocation(payload: dict):
+    """Reject a revoked token.
+
+    Raises:
+        HTTPException: 401 if the token was revoked.
+
+    Returns:
+        bool: True if the deny-list was checked, False if it could not be read.
+    """
+    try:
+        revoked = await token_denylist.is_revoked(payload)
+    except redis.exceptions.RedisError as e:
+        metrics.increment("auth.denylist_errors")
+        logger.warn(f"Token deny-list unavailable: {e}")
+        return False
+    if revoked:
+        metrics.increment("auth.revoked")
+        raise HTTPException(status_code=401, detail="Token revoked")
+    return True
+
+
+async def revoke_tokens(*tokens):
+    """Put tokens on the deny-list (logout). Invalid, expired and missing tokens are skipped.
+
+    Args:
+        *tokens (str | None): Encoded access or refresh tokens.
+    """
+    for token in tokens:
+        if not token:
+            continue
+        try:
+            payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        except JWTError:
+            continue
+        if "jti" not in payload:
+            continue
+        try:
+            await token_denylist.revoke_token(payload["jti"], payload["exp"])
+        except redis.exceptions.RedisError as e:
+            logger.error(f"Could not revoke token of {payload.get('sub')!r}: {e}")
+
+
+async def refresh_token_pair_async(refresh_token: str, db_conn) -> tuple[str, str, str]:
+    """refresh_token_pair for an asyncio database connection (database_async_service).
+
+    Args:
+        refresh_token (str): The JWT refresh token to verify.
+        db_conn (aiomysql.Connection): The database connection of the request.
+
+    Raises:
+        HTTPException: If the token is invalid or the user is not found.
+
+    Returns:
+        tuple[str, str, str]: A tuple containing (access_token, refresh_token, username).
+    """
+    try:
+        payload = jwt.decode(refresh_token, SECRET_KEY, algorithms=[ALGORITHM])
+        username = payload.get("sub")
+        if not username:
+            raise HTTPException(
+                status_code=401, detail="Invalid refresh token")
+    except JWTError as exc:
+        raise HTTPException(
+            status_code=401, detail="Invalid refresh token") from exc
+    await _check_revocation(payload)
+    db_user = await get_user_cached(db_conn, username)
+    if not db_user:
+        raise HTTPException(status_code=404, detail="User not found")
+
+    access_token = create_access_token(data=user_claims(UserInDb(**db_user)))
+    new_refresh_token = create_refresh_token(data={"sub": username})
+
+    return access_token, new_refresh_token, username
+
+
 def get_user_from_token(token: str, db_conn) -> UserInDb:
     """Parses a JWT access token to extract the user and return user data.
 
@@ -184,6 +435,44 @@ def get_user_from_token(token: str, db_conn) -> UserInDb:
         raise HTTPException(status_code=401, detail="Invalid token") from e
 
 
+async def get_user_from_token_async(token: str, db_conn=None) -> UserInDb:
+    """get_user_from_token for an asyncio database connection (database_async_service).
+
+    Tokens carrying user claims are answered from the claims after a deny-list check,
+    without touching the database.
+
+    Args:
+        token (str): The JWT access token.
+        db_conn (aiomysql.Connection, optional): The database connection of the request,
+            only used if the user has to be looked up. Defaults to a pooled connection.
+
+    Raises:
+        HTTPException: If the token is invalid or revoked, or the user does not exist.
+
+    Returns:
+        UserInDb: The user information loaded into the UserInDb model. Users built from
+            the claims have no password_hash.
+    """
+    try:
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    except jwt.JWTError as e:
+        raise HTTPException(status_code=401, detail="Invalid token") from e
+    username = payload.get("sub")
+    if username is None:
+        raise HTTPException(status_code=401, detail="Invalid token")
+
+    if await _check_revocation(payload) and "uid" in payload and "created_at" in payload:
+        metrics.increment("auth.stateless")
+        return UserInDb(id=payload["uid"], username=username,
+                        created_at=payload["created_at"])
+
+    metrics.increment("auth.lookups")
+    user = await get_user_cached(db_conn, username)
+    if user is None:
+        raise HTTPException(status_code=401, detail="User not found")
+    return UserInDb(**user)
+
+
 def check_credentials(username: str, password: str):
     """Checks whether the credentials provided are according to the password requirements
 
@@ -0,0 +1,419 @@
+"""
+database_async_service.py
+
+Asynchronous counterpart of database_service for the request handlers, built on aiomysql
+with its own asyncio connection pool. Pool checkout and queries are awaited instead of
+blocking the event loop, so one slow query no longer stalls every other request of the
+worker.
+
+The statements shared by both services are defined in database_service, and the results
+(dict rows, the same tuples and exceptions) match; the synchronous service stays in use for
+the CLI tools, the schema migrations, background jobs running in threads and streamed
+responses. The pool belongs to the event loop it was created in; called from another loop
+(e.g. by test clients), the old pool is closed and a new one is created.
+Sessions use the same time zone as those of database_service (SESSION_TIME_ZONE).
+
+Metrics:
+- mysql_async_pool.in_use / mysql_async_pool.idle (gauges): Connections checked out / free.
+- mysql_async_pool.wait_seconds (timing): Time a request waited for its connection.
+- mysql_async_pool.exhausted / mysql_async_pool.timeouts (counters): Checkouts that found
+  every connection busy / gave up after MYSQL_POOL_TIMEOUT (answered with 503).
+
+Environment Variables:
+- MYSQL_URL, MYSQL_PORT, MYSQL_USER, MYSQL_PASSWORD, MYSQL_DATABASE: See database_service.
+- MYSQL_POOL_TIMEOUT, MYSQL_POOL_MAX_LIFETIME: See database_service.
+- MYSQL_ASYNC_POOL_SIZE: Maximum connections of the asyncio pool. Defaults to 10.
+"""
+import asyncio
+from contextlib import asynccontextmanager
+import os
+import socket
+import time
+import aiomysql
+import redis
+from fastapi import HTTPException
+from app.services import leaderboard_service, token_denylist, user_cache
+from app.services.database_service import (
+    SESSION_TIME_ZONE, TOP_HIGHSCORES_QUERY, USER_DELETE, USER_HIGHSCORES_QUERY, USER_INSERT,
+    USER_SELECT, encode_highscore_cursor, highscore_query, new_highscore_time)
+from app.util import logger, metrics
+
+POOL = None
+POOL_LOOP = None
+logger = logger.get_logger(name="db_async")
+
+
+async def get_pool(port=None):
+    """Returns the asyncio connection pool, creating it on first use.
+
+    Args:
+        port (int, optional): Port of the MySQL server. Defaults to MYSQL_PORT or 3306.
+
+    Returns:
+        aiomysql.Pool: The pool.
+    """
+    global POOL, POOL_LOOP
+    loop = asyncio.get_running_loop()
+    if POOL is None or POOL_LOOP is not loop:
+        if POOL is not None:
+            _close_stale_pool(POOL, POOL_LOOP)
+        port = int(port) if port else int(os.getenv("MYSQL_PORT", "3306"))
+        POOL = await aiomysql.create_pool(
+            minsize=1,
+            maxsize=int(os.getenv("MYSQL_ASYNC_POOL_SIZE", "10")),
+            host=os.getenv("MYSQL_URL", "127.0.0.1"),
+            port=port,
+            user=os.getenv("MYSQL_USER", "trainer"),
+            password=os.getenv("MYSQL_PASSWORD", "pokeballs"),
+            db=os.getenv("MYSQL_DATABASE", "testdb"),
+            autocommit=False,
+            init_command=f"SET time_zone = '{SESSION_TIME_ZONE}'",
+            pool_recycle=int(float(os.getenv("MYSQL_POOL_MAX_LIFETIME", "3600")))
+        )
+        POOL_LOOP = loop
+        logger.info(msg="Async connection pool created.")
+    return POOL
+
+
+async def _close_pool(pool):
+    pool.close()
+    await pool.wait_closed()
+
+
+def _close_stale_pool(pool, loop):
+    """Close a pool that belongs to an event loop other than the current one.
+
+    If that loop still runs (in another thread), the pool is closed there. Otherwise its
+    connections cannot be closed through the loop any more; their sockets are shut down
+    directly and the file descriptors released when the transports are garbage collected.
+    """
+    if loop is not None and loop.is_running():
+        asyncio.run_coroutine_threadsafe(_close_pool(pool), loop)
+        return
+    pool.close()
+    for cnn in (*pool._free, *pool._used):
+        writer, cnn._writer, cnn._reader = cnn._writer, None, None
+        sock = writer.get_extra_info("socket") if writer is not None else None
+        if sock is not None:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+    pool._free.clear()
+    pool._used.clear()
+
+
+async def close_pool():
+    """Close the pool and all of its connections."""
+    global POOL, POOL_LOOP
+    if POOL is not None:
+        await _close_pool(POOL)
+    POOL = None
+    POOL_LOOP = None
+
+
+def _update_gauges(pool):
+    metrics.set_gauge("mysql_async_pool.in_use", pool.size - pool.freesize)
+    metrics.set_gauge("mysql_async_pool.idle", pool.freesize)
+
+
+async def get_db():
+    """FastAPI dependency providing one pooled connection per request.
+
+    FastAPI caches dependencies per request, so every dependency and route of a request
+    that asks for get_db shares the same connection instead of checking out its own. The
+    open transaction is committed once when the request succeeds and rolled back if it
+    fails; the connection goes back to the pool in either case. FastAPI runs this teardown
+    only after the response has been sent, so a streaming route depending on get_db holds
+    the connection for the whole stream; such routes take their connections themselves.
+
+    Raises:
+        HTTPException: 503 if no connection becomes free within MYSQL_POOL_TIMEOUT.
+
+    Yields:
+        aiomysql.Connection: The connection of the request.
+    """
+    pool = await get_pool()
+    start = time.monotonic()
+    if pool.freesize == 0 and pool.size >= pool.maxsize:
+        metrics.increment("mysql_async_pool.exhausted")
+    try:
+        cnn = await asyncio.wait_for(pool.acquire(), float(os.getenv("MYSQL_POOL_TIMEOUT", "5")))
+    except asyncio.TimeoutError as e:
+        metrics.increment("mysql_async_pool.timeouts")
+        raise HTTPException(status_code=503, detail="Database busy") from e
+    metrics.observe("mysql_async_pool.wait_seconds", time.monotonic() - start)
+    _update_gauges(pool)
+    try:
+        yield cnn
+        if cnn.get_transaction_status():
+            await cnn.commit()
+    except Exception:
+        await cnn.rollback()
+        raise
+    finally:
+        pool.release(cnn)
+        _update_gauges(pool)
+
+# get_db as an async context manager, for code outside of FastAPI dependencies.
+connection = asynccontextmanager(get_db)
+
+# --- USERS ---
+
+
+async def add_user(cnn, username, hashed_password):
+    """Adds a user to the database.
+
+    Args:
+        cnn (aiomysql.Connection): Database connection
+        username (str): Username to be added to Database.
+        hashed_password (str | bytes): Password to be added, hashed for security.
+
+    Raises:
+        ValueError: Raised, when <username> already exists
+    """
+    if not username.strip():
+        raise ValueError("Username cannot be empty or whitespace.")
+    if not hashed_password:
+        raise ValueError("Password cannot be empty.")
+    if isinstance(hashed_password, bytes):
+        hashed_password = hashed_password.decode()
+
+    logger.info(msg="Adding user "+username)
+    try:
+        async with cnn.cursor() as cursor:
+            await cursor.execute(USER_INSERT, (username, hashed_password))
+        await cnn.commit()
+    except aiomysql.IntegrityError as exc:
+        logger.error("Error while inserting into table: %s", exc)
+        await cnn.rollback()
+        raise ValueError("Username already exists.") from exc
+    await user_cache.invalidate(username)
+
+
+async def delete_user(cnn, username: str) -> bool:
+    """Deletes a user from the database.
+
+    Args:
+        cnn (aiomysql.Connection): Database connection
+        username (str): Username to be deleted.
+
+    Returns:
+        bool: True if a user was deleted, False if no such user found.
+    """
+    logger.info(f"Deleting user {username!r}")
+    try:
+        async with cnn.cursor() as cursor:
+            await cursor.execute(USER_DELETE, (username,))
+            affected_rows = cursor.rowcount
+        await cnn.commit()
+    except Exception as e:
+        logger.error(f"Failed to delete user {username!r}: {e}")
+        await cnn.rollback()
+        raise
+    await user_cache.invalidate(username)
+    if affected_rows > 0:
+        try:
+            await token_denylist.revoke_user(username)
+        except redis.exceptions.RedisError as e:
+            logger.error(f"Could not revoke the tokens of {username!r}: {e}")
+        try:
+            await leaderboard_service.remove_player(username)
+        except redis.exceptions.RedisError as e:
+            logger.error(f"Could not remove {username!r} from the leaderboard: {e}")
+    return affected_rows > 0
+
+
+async def get_user(cnn, username):
+    """Fetches a user from the database by username
+
+    Args:
+        cnn (aiomysql.Connection): Database connection
+        username (str): Username to be fetched
+
+    Raises:
+        HTTPException: 500 on a database error.
+
+    Returns:
+        dict | None: The user entry (username, password_hash, id, created_at)
+    """
+    try:
+        async with cnn.cursor(aiomysql.DictCursor) as cursor:
+            await cursor.execute(USER_SELECT, (username,))
+            return await cursor.fetchone()
+    except aiomysql.MySQLError as e:
+        logger.error("Error while fetching: %s", e)
+        raise HTTPException(status_code=500, detail="Database error.") from e
+
+# --- HIGHSCORES ---
+
+
+async def insert_highscore(cnn, user_id, username, score):
+    """Posts a new highscore for an already authenticated user in a single statement.
+
+    The user id is not looked up and the inserted row not read back: the achievement time
+    is set explicitly, so the result is built from the arguments and the id of the new row.
+
+    Args:
+        cnn (aiomysql.Connection): Database connection
+        user_id (int): Id of the user
+        username (str): Username, only used for the result
+        score (int): Achieved score
+
+    Raises:
+        HTTPException: 400 if the score is zero.
+        ValueError: User was not found in database
+
+    Returns:
+        result: The inserted highscore as (id, username, score, achieved_at)
+    """
+    achieved_at = new_highscore_time(score)
+    try:
+        async with cnn.cursor() as cursor:
+            await cursor.execute(
+                "INSERT INTO highscores (user_id, score, achieved_at) VALUES (%s, %s, %s)",
+                (user_id, score, achieved_at))
+            highscore_id = cursor.lastrowid
+        await cnn.commit()
+    except aiomysql.IntegrityError as e:
+        await cnn.rollback()
+        if e.args[0] == 1452:  # ER_NO_REFERENCED_ROW_2: the user_id foreign key failed
+            raise ValueError("User not found") from e
+        raise
+    except Exception as e:
+        logger.error("Error while adding highscore: %s", e)
+        await cnn.rollback()
+        raise
+    return highscore_id, username, score, achieved_at
+
+
+async def _fetch_all(cnn, query, params=(), error="Error while fetching"):
+    try:
+        async with cnn.cursor(aiomysql.DictCursor) as cursor:
+            await cursor.execute(query, params)
+            return await cursor.fetchall()
+    except Exception as e:
+        logger.error(error + ": %s", e)
+        await cnn.rollback()
+        raise
+
+
+async def get_highscores_page(cnn, limit=100, after=None):
+    """Get one page of highscores, best first.
+
+    Args:
+        cnn (aiomysql.Connection): Database connection
+        limit (int, optional): Page size. Defaults to 100.
+        after (tuple[int, int], optional): (score, id) of the last highscore of the previous
+            page, see database_service.decode_highscore_cursor. Defaults to the first page.
+
+    Returns:
+        tuple[list, str | None]: The highscores (id, username, score, achieved_at) and the
+            cursor of the next page, or None on the last page.
+    """
+    query, params = highscore_query(after)
+    highscores = list(await _fetch_all(cnn, query + " LIMIT %s", params + (limit + 1,)))
+    if len(highscores) <= limit:
+        return highscores, None
+    highscores = highscores[:limit]
+    last = highscores[-1]
+    return highscores, encode_highscore_cursor(last["score"], last["id"])
+
+
+async def get_user_highscores(cnn, username):
+    """Get the highscores from a certain user.
+
+    Args:
+        cnn (aiomysql.Connection): Database connection
+        username (str): The username whose highscores are to be fetched
+
+    Returns:
+        scores: A list of all highscores archieved by the user.
+    """
+    return list(await _fetch_all(
+        cnn, USER_HIGHSCORES_QUERY, (username,), "Error fetching user highscores"))
+
+
+async def get_top_highscores(cnn, limit=10):
+    """Returns the top highscores
+
+    Args:
+        cnn (aiomysql.Connection): Database connection
+        limit (int, optional): Number of highscores to be fetched. Defaults to 10.
+
+    Returns:
+        scores: List of highscores
+    """
+    return list(await _fetch_all(
+        cnn, TOP_HIGHSCORES_QUERY, (limit,), "Error fetching top highscores"))
+
+
+async def get_highscore_rank(cnn, highscore_id):
+    """Returns the 1-based rank of a highscore among all highscores (score DESC, id DESC).
+
+    This is the database fallback of leaderboard_service.get_rank; the count is a range
+    scan of idx_highscores_score_id.
+
+    Args:
+        cnn (aiomysql.Connection): Database connection
+        highscore_id (int): Id of the highscore.
+
+    Returns:
+        int | None: The rank, or None if there is no such highscore.
+    """
+    rows = await _fetch_all(cnn, """
+        SELECT (SELECT COUNT(*) FROM highscores h
+                WHERE h.score > me.score OR (h.score = me.score AND h.id > me.id)) + 1
+               AS highscore_rank
+        FROM highscores me
+        WHERE me.id = %s
+    """, (highscore_id,), "Error fetching highscore rank")
+    return rows[0]["highscore_rank"] if rows else None
+
+
+async def get_user_rank(cnn, username, around=2):
+    """Returns the best score and global rank of a player plus the players around them.
+
+    Players are ranked by their best score; players with the same best score share a rank.
+    This is the database fallback of the Redis player ranking (leaderboard_service), which
+    answers the same question without ranking every player.
+
+    Args:
+        cnn (aiomysql.Connection): Database connection
+        username (str): The player.
+        around (int, optional): Number of neighbours above and below. Defaults to 2.
+
+    Returns:
+        dict | None: username, best_score, rank, players and neighbours (dicts with rank,
+            username and score, best first), or None if the player has no highscore.
+    """
+    rows = await _fetch_all(cnn, """
+        WITH ranked AS (
+            SELECT u.username, MAX(h.score) AS score,
+                   RANK() OVER (ORDER BY MAX(h.score) DESC) AS player_rank,
+                   ROW_NUMBER() OVER (ORDER BY MAX(h.score) DESC, u.username) AS position
+            FROM highscores h
+            JOIN users u ON h.user_id = u.id
+            GROUP BY u.id, u.username
+        ),
+        me AS (SELECT position FROM ranked WHERE username = %s)
+        SELECT ranked.username, ranked.score, ranked.player_rank,
+               (SELECT COUNT(*) FROM ranked) AS players
+        FROM ranked, me
+        WHERE ranked.position BETWEEN me.position - %s AND me.position + %s
+        ORDER BY ranked.position
+    """, (username, around, around), "Error fetching user rank")
+
+    me = next((row for row in rows if row["username"] == username), None)
+    if me is None:
+        return None
+    return {
+        "username": username,
+        "best_score": me["score"],
+        "rank": me["player_rank"],
+        "players": me["players"],
+        "neighbours": [
+            {"rank": row["player_rank"], "username": row["username"], "score": row["score"]}
+            for row in rows
+        ]
+    }
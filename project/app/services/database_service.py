@@ -2,14 +2,41 @@
 Module database_service
 
 Contains the database connection functions.
+
+Pooled sessions use the time zone SESSION_TIME_ZONE (UTC), so TIMESTAMP columns are read
+and written as naive UTC, whether the value comes from the application
+(new_highscore_time) or from CURRENT_TIMESTAMP.
+
+Metrics:
+- mysql_pool.in_use / mysql_pool.idle (gauges): Connections checked out / waiting in the pool.
+- mysql_pool.wait_seconds (timing): Time a checkout waited for a connection.
+- mysql_pool.exhausted (counter): Checkouts that found every connection busy and had to wait.
+- mysql_pool.timeouts / mysql_pool.rejected (counters): Checkouts that gave up after
+  MYSQL_POOL_TIMEOUT / were refused because MYSQL_POOL_MAX_WAITERS were already waiting.
+- mysql_pool.recycled (counter): Connections replaced because they were too old or broken,
+  or discarded by their user.
+
+Environment Variables:
+- MYSQL_POOL_SIZE: Maximum connections of the pool. Defaults to 10.
+- MYSQL_POOL_TIMEOUT: Seconds a checkout waits for a free connection. Defaults to 5.
+- MYSQL_POOL_MAX_WAITERS: Checkouts allowed to wait at the same time. Defaults to 100.
+- MYSQL_POOL_MAX_LIFETIME: Seconds after which a connection is replaced. Defaults to 3600.
+- MYSQL_POOL_VALIDATE_IDLE: Connections idle for longer are pinged on checkout. Defaults to 30.
 """
 from fastapi import HTTPException
+import base64
+import binascii
+import datetime
+import threading
 import time
 import os
+from collections import deque
 import mysql.connector
+import redis
 from mysql.connector import Error, pooling
 from dotenv import load_dotenv
-from app.util import logger
+from app.services import leaderboard_service, token_denylist, user_cache
+from app.util import logger, metrics
 
 # --- ENVIRONMENT VARIABLES ---
 
@@ -18,9 +45,157 @@ load_dotenv()
 # --- META ---
 
 CONN_POOL = None
+SESSION_TIME_ZONE = "+00:00"
 logger = logger.get_logger(name="db_conn")
 
 
+class PooledConnection:
+    """A connection checked out of an InstrumentedConnectionPool. Behaves like the underlying
+    MySQL connection, except that close() returns it to the pool."""
+
+    def __init__(self, pool, cnx, created_at: float):
+        self._pool = pool
+        self._cnx = cnx
+        self._created_at = created_at
+
+    def __getattr__(self, name):
+        return getattr(self._cnx, name)
+
+    def close(self):
+        """Return the connection to the pool (at most once)."""
+        if self._cnx is not None:
+            cnx, self._cnx = self._cnx, None
+            self._pool.release(cnx, self._created_at)
+
+    def discard(self):
+        """Close the connection instead of returning it to the pool (at most once)."""
+        if self._cnx is not None:
+            cnx, self._cnx = self._cnx, None
+            self._pool.discard(cnx)
+
+
+class InstrumentedConnectionPool:
+    """MySQL connection pool with a bounded wait queue, connection validation and metrics.
+
+    Unlike MySQLConnectionPool, a checkout waits up to a timeout for a free connection instead
+    of failing at once when all of them are busy. Connections are opened lazily, pinged on
+    checkout if they were idle for a while and replaced once they exceed their lifetime.
+    """
+
+    def __init__(self, size: int, timeout: float, max_waiters: int, max_lifetime: float,
+                 validate_idle: float, **connect_kwargs):
+        self.size = size
+        self.timeout = timeout
+        self.max_waiters = max_waiters
+        self.max_lifetime = max_lifetime
+        self.validate_idle = validate_idle
+        self._connect_kwargs = connect_kwargs
+        self._condition = threading.Condition()
+        self._idle = deque()  # (connection, created_at, released_at), most recent last
+        self._open = 0
+        self._waiting = 0
+
+    def _update_gauges(self):
+        metrics.set_gauge("mysql_pool.in_use", self._open - len(self._idle))
+        metrics.set_gauge("mysql_pool.idle", len(self._idle))
+
+    def _connect(self):
+        return mysql.connector.connect(**self._connect_kwargs), time.monotonic()
+
+    def get_connection(self) -> PooledConnection:
+        """Check out a connection, waiting up to the pool timeout if all of them are busy.
+
+        Raises:
+            PoolError: If no connection became free in time or too many checkouts are waiting.
+
+        Returns:
+            PooledConnection: The connection; close() returns it to the pool.
+        """
+        start = time.monotonic()
+        with self._condition:
+            if not self._idle and self._open >= self.size:
+                if self._waiting >= self.max_waiters:
+                    metrics.increment("mysql_pool.rejected")
+                    raise pooling.PoolError("Connection pool queue is full")
+                metrics.increment("mysql_pool.exhausted")
+                self._waiting += 1
+                try:
+                    while not self._idle and self._open >= self.size:
+                        remaining = start + self.timeout - time.monotonic()
+                        if remaining <= 0:
+                            metrics.increment("mysql_pool.timeouts")
+                            raise pooling.PoolError(
+                                f"No connection available within {self.timeout}s")
+                        self._condition.wait(remaining)
+                finally:
+                    self._waiting -= 1
+            entry = self._idle.pop() if self._idle else None
+            if entry is None:
+                self._open += 1
+            self._update_gauges()
+        metrics.observe("mysql_pool.wait_seconds", time.monotonic() - start)
+
+        try:
+            if entry is None:
+                cnx, created_at = self._connect()
+            else:
+                cnx, created_at = self._validate(*entry)
+        except Exception:
+            with self._condition:
+                self._open -= 1
+                self._update_gauges()
+                self._condition.notify()
+            raise
+        return PooledConnection(self, cnx, created_at)
+
+    def _validate(self, cnx, created_at: float, released_at: float):
+        """Returns a usable connection for an idle one, replacing it if too old or broken."""
+        now = time.monotonic()
+        if now - created_at > self.max_lifetime:
+            healthy = False
+        elif now - released_at > self.validate_idle:
+            healthy = cnx.is_connected()
+        else:
+            healthy = True
+        if healthy:
+            return cnx, created_at
+        metrics.increment("mysql_pool.recycled")
+        try:
+            cnx.close()
+        except Error:
+            pass
+        return self._connect()
+
+    def release(self, cnx, created_at: float):
+        """Take back a connection; an unfinished transaction is rolled back first. A
+        connection failing that is discarded instead."""
+        try:
+            if cnx.unread_result:
+                cnx.consume_results()
+            if cnx.in_transaction:
+                cnx.rollback()
+        except Error:
+            self.discard(cnx)
+            return
+        with self._condition:
+            self._idle.append((cnx, created_at, time.monotonic()))
+            self._update_gauges()
+            self._condition.notify()
+
+    def discard(self, cnx):
+        """Close a checked out connection without taking it back and free its slot.
+
+        The socket is shut down without a QUIT, so nothing left to read on the connection
+        (e.g. the rest of an unbuffered result) has to be drained first.
+        """
+        metrics.increment("mysql_pool.recycled")
+        cnx.shutdown()
+        with self._condition:
+            self._open -= 1
+            self._update_gauges()
+            self._condition.notify()
+
+
 def get_pool(port=3306):
     """Create and return a global MySQL connection pool.
 
@@ -31,25 +206,30 @@ def get_pool(port=3306):
         port (int, optional): The port number for the MySQL server. Defaults to 3306.
 
     Returns:
-        MySQLConnectionPool: A pooled connection object to the MySQL database.
+        InstrumentedConnectionPool: A pooled connection object to the MySQL database.
 
     Environment Variables:
         MYSQL_URL (str): The hostname or IP of the MySQL server. Defaults to "127.0.0.1".
         MYSQL_USER (str): The username to authenticate with. Defaults to "trainer".
         MYSQL_PASSWORD (str): The password for the user. Defaults to "pokeballs".
         MYSQL_DATABASE (str): The database to connect to. Defaults to "testdb".
+        MYSQL_POOL_*: Sizing and timeouts of the pool, see the module docstring.
     """
     global CONN_POOL
     if CONN_POOL is None:
         logger.info(msg="Connection pool created.")
-        CONN_POOL = pooling.MySQLConnectionPool(
-            pool_name="pokedb_pool",
-            pool_size=10,
+        CONN_POOL = InstrumentedConnectionPool(
+            size=int(os.getenv("MYSQL_POOL_SIZE", "10")),
+            timeout=float(os.getenv("MYSQL_POOL_TIMEOUT", "5")),
+            max_waiters=int(os.getenv("MYSQL_POOL_MAX_WAITERS", "100")),
+            max_lifetime=float(os.getenv("MYSQL_POOL_MAX_LIFETIME", "3600")),
+            validate_idle=float(os.getenv("MYSQL_POOL_VALIDATE_IDLE", "30")),
             host=os.getenv("MYSQL_URL", "127.0.0.1"),
             port=port,
             user=os.getenv("MYSQL_USER", "trainer"),
             password=os.getenv("MYSQL_PASSWORD", "pokeballs"),
-            database=os.getenv("MYSQL_DATABASE", "testdb")
+            database=os.getenv("MYSQL_DATABASE", "testdb"),
+            time_zone=SESSION_TIME_ZONE
         )
     return CONN_POOL
 
@@ -118,8 +298,14 @@ def get_connection(port=None):
         logger.error("Unexpected error: %s", str(e), exc_info=True)
         raise e
 
+
 # --- USERS ---
 
+# The statements are shared with database_async_service.
+USER_INSERT = "INSERT INTO users (username, password_hash) VALUES (%s, %s)"
+USER_DELETE = "DELETE FROM users WHERE username = %s"
+USER_SELECT = "SELECT username, password_hash, id, created_at FROM users WHERE username = %s"
+
 
 def add_user(cnn, username, hashed_password):
     """Adds a user to the database.
@@ -140,14 +326,14 @@ def add_user(cnn, username, hashed_password):
     cursor = cnn.cursor(dictionary=True)
     try:
         logger.info(msg="Adding user "+username)
-        cursor.execute(
-            "INSERT INTO users (username, password_hash) VALUES (%s, %s)", (username, hashed_password))
+        cursor.execute(USER_INSERT, (username, hashed_password))
         cnn.commit()
     except mysql.connector.IntegrityError as exc:
         logger.error("Error while inserting into table: %s", exc)
         raise ValueError("Username already exists.") from exc
     finally:
         cursor.close()
+    user_cache.invalidate_sync(username)
 
 
 def delete_user(cnn, username: str) -> bool:
@@ -165,15 +351,24 @@ def delete_user(cnn, username: str) -> bool:
 
     try:
         with cnn.cursor(dictionary=True) as cursor:
-            cursor.execute(
-                "DELETE FROM users WHERE username = %s", (username,))
+            cursor.execute(USER_DELETE, (username,))
             affected_rows = cursor.rowcount
         cnn.commit()
-        return affected_rows > 0
     except Exception as e:
         logger.error(f"Failed to delete user {username!r}: {e}")
         cnn.rollback()
         raise
+    user_cache.invalidate_sync(username)
+    if affected_rows > 0:
+        try:
+            token_denylist.revoke_user_sync(username)
+        except redis.exceptions.RedisError as e:
+            logger.error(f"Could not revoke the tokens of {username!r}: {e}")
+        try:
+            leaderboard_service.remove_player_sync(username)
+        except redis.exceptions.RedisError as e:
+            logger.error(f"Could not remove {username!r} from the leaderboard: {e}")
+    return affected_rows > 0
 
 
 def get_user(cnn, username):
@@ -188,10 +383,7 @@ def get_user(cnn, username):
     cursor = cnn.cursor(dictionary=True)
     logger.info(msg="Fetching user "+username)
     try:
-        cursor.execute(
-            "SELECT username, password_hash, id, created_at FROM users WHERE username = %s", (
-                username,)
-        )
+        cursor.execute(USER_SELECT, (username,))
         user = cursor.fetchone()
         return user
     except mysql.connector.Error as e:
@@ -203,85 +395,173 @@ def get_user(cnn, username):
 # --- HIGHSCORES ---
 
 
-def add_highscore(cnn, username, score):
-    """Posts a new highscore
+def new_highscore_time(score):
+    """Check a submitted score and return the time it is achieved at.
 
     Args:
-        username (str): Username
         score (int): Achieved score
 
     Raises:
-        ValueError: User Was not found in database
-        e: Database error
+        HTTPException: 400 if the score is zero.
 
     Returns:
-        result: The inserted highscore
+        datetime.datetime: The current time as naive UTC in whole seconds, which is exactly
+            what the TIMESTAMP column stores in a SESSION_TIME_ZONE session.
     """
+    if score <= 0:
+        logger.error(msg="The score someone tried to submit is zero.")
+        raise HTTPException(
+            status_code=400, detail="Score must not be zero. You lazy pig.")
+    return datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None, microsecond=0)
 
-    cursor = cnn.cursor()
-    logger.info(msg="Adding highscore "+username+" with score: "+str(score))
-    try:
-        # Find user_id from username
-        if score <= 0:
-            logger.error(msg="The score someone tried to submit is zero.")
-            raise HTTPException(
-                status_code=400, detail="Score must not be zero. You lazy pig.")
-        cursor.execute("SELECT id FROM users WHERE username = %s", (username,))
-        result = cursor.fetchone()
-        if result is None:
-            raise ValueError("User not found")
-
-        user_id = result[0]
-
-        # Insert highscore using user_id
-        cursor.execute(
-            "INSERT INTO highscores (user_id, score) VALUES (%s, %s)", (user_id, score)
-        )
 
-        highscore_id = cursor.lastrowid
+HIGHSCORE_BATCH_INSERT = (
+    "INSERT INTO highscores (submission_id, user_id, score, achieved_at) "
+    "VALUES (%s, %s, %s, %s) ON DUPLICATE KEY UPDATE id = id"
+)
+ER_CHECK_CONSTRAINT_VIOLATED = 3819
 
-        # Fetch the inserted row
-        cursor.execute(
-            "SELECT h.id, u.username, h.score, h.achieved_at FROM highscores h JOIN users u ON h.user_id = u.id WHERE h.id = %s",
-            (highscore_id,)
-        )
-        result = cursor.fetchone()
+
+def _is_row_error(error) -> bool:
+    """True for errors caused by the data of a row, as opposed to the connection or server."""
+    return (isinstance(error, (mysql.connector.IntegrityError, mysql.connector.DataError))
+            or error.errno == ER_CHECK_CONSTRAINT_VIOLATED)
+
+
+def insert_highscore_batch(cnn, rows):
+    """Store a batch of queued highscores with one multi-row INSERT and one commit.
+
+    Every row carries a unique submission id; rows already stored (a batch written again
+    after a crash) are left as they are. If a row is rejected (e.g. its user was deleted,
+    or a value is out of range), the statement fails as a whole and the rows are inserted
+    one by one instead, logging and skipping the rejected ones.
+
+    Args:
+        rows (list[tuple]): (submission_id, user_id, score, achieved_at) per highscore
+
+    Raises:
+        e: Database error
+
+    Returns:
+        dict: submission id -> highscore id of every stored row of the batch
+    """
+    if not rows:
+        return {}
+    try:
+        with cnn.cursor() as cursor:
+            try:
+                # executemany turns this into a single multi-row INSERT
+                cursor.executemany(HIGHSCORE_BATCH_INSERT, rows)
+            except mysql.connector.Error as e:
+                if not _is_row_error(e):
+                    raise
+                logger.warn(f"Highscore batch rejected, inserting its rows one by one: {e}")
+                for row in rows:
+                    try:
+                        cursor.execute(HIGHSCORE_BATCH_INSERT, row)
+                    except mysql.connector.Error as row_error:
+                        if not _is_row_error(row_error):
+                            raise
+                        logger.error(f"Highscore {row[0]} rejected: {row_error}")
+            submission_ids = [row[0] for row in rows]
+            placeholders = ", ".join(["%s"] * len(submission_ids))
+            cursor.execute(
+                f"SELECT submission_id, id FROM highscores WHERE submission_id IN ({placeholders})",
+                submission_ids
+            )
+            stored = dict(cursor.fetchall())
         cnn.commit()
-        return result
+        return stored
     except Exception as e:
-        logger.error("Error while adding highscore: %s", e)
+        logger.error("Error while adding highscore batch: %s", e)
         cnn.rollback()
-        raise e
+        raise
 
-    finally:
-        cursor.close()
+
+# Keyset pagination: highscores are ordered by (score, id) descending and a page continues
+# strictly after the last row of the previous one, so every page is an index range scan
+# no matter how deep the client has paged. The leaderboard queries use STRAIGHT_JOIN so
+# that MySQL reads highscores first, along idx_highscores_score_id, instead of starting
+# from the (much smaller) users table and sorting all highscores. The highscore queries
+# are shared with database_async_service.
+HIGHSCORE_PAGE_QUERY = """
+    SELECT h.id, u.username, h.score, h.achieved_at FROM highscores h
+    STRAIGHT_JOIN users u ON h.user_id = u.id
+    {where}
+    ORDER BY h.score DESC, h.id DESC
+"""
+HIGHSCORE_AFTER = "WHERE h.score < %s OR (h.score = %s AND h.id < %s)"
+TOP_HIGHSCORES_QUERY = """
+    SELECT u.username, h.score, h.achieved_at FROM highscores h
+    STRAIGHT_JOIN users u ON h.user_id = u.id
+    ORDER BY h.score DESC, h.id DESC
+    LIMIT %s
+"""
+USER_HIGHSCORES_QUERY = """
+    SELECT h.score, u.username, h.achieved_at FROM highscores h
+    JOIN users u ON h.user_id = u.id
+    WHERE u.username = %s
+    ORDER BY h.score DESC
+"""
 
 
-def get_highscores(cnn):
-    """Get all stored highscores.
+def encode_highscore_cursor(score: int, highscore_id: int) -> str:
+    """Returns the opaque pagination token for the position after the given highscore."""
+    return base64.urlsafe_b64encode(f"{score}:{highscore_id}".encode()).decode().rstrip("=")
+
+
+def decode_highscore_cursor(token: str) -> tuple:
+    """Decode a pagination token of encode_highscore_cursor.
 
     Raises:
-        e: in case of db error
+        ValueError: If the token is malformed.
 
     Returns:
-        highscores: List of highscores
+        tuple[int, int]: (score, id) of the last highscore before the page.
     """
-
-    cursor = cnn.cursor(dictionary=True)
-    logger.info(msg="Fetching all highscores...")
     try:
-        cursor.execute(
-            "SELECT u.username, h.score, h.achieved_at FROM highscores h JOIN users u ON h.user_id = u.id ORDER BY h.score DESC",
-        )
-        highscores = cursor.fetchall()
-        return highscores
-    except Exception as e:
-        logger.error("Error while fetching: %s", e)
+        decoded = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)).decode()
+        score, highscore_id = decoded.split(":")
+        return int(score), int(highscore_id)
+    except (binascii.Error, UnicodeDecodeError, ValueError) as e:
+        raise ValueError("Invalid cursor") from e
 
-        cnn.rollback()
-        raise e
+
+def highscore_query(after):
+    """Returns the keyset query of the highscores after a position and its parameters."""
+    if after is None:
+        return HIGHSCORE_PAGE_QUERY.format(where=""), ()
+    score, highscore_id = after
+    return HIGHSCORE_PAGE_QUERY.format(where=HIGHSCORE_AFTER), (score, score, highscore_id)
+
+
+def iter_highscore_batches(cnn, after=None, batch_size=500):
+    """Yield all highscores after a position in batches, best first.
+
+    Rows are read from an unbuffered (server-side) cursor, so memory stays constant however
+    large the table is. The connection is busy until the generator is exhausted or closed.
+    Closing the generator early discards the connection: reading the rest of the result
+    just to reuse it could mean reading the whole table.
+
+    Args:
+        cnn (PooledConnection): Connection of the pool.
+        after (tuple[int, int], optional): (score, id) to continue after. Defaults to the start.
+        batch_size (int, optional): Rows fetched per round trip. Defaults to 500.
+
+    Yields:
+        list[dict]: Highscores (id, username, score, achieved_at).
+    """
+    query, params = highscore_query(after)
+    cursor = cnn.cursor(dictionary=True, buffered=False)
+    try:
+        cursor.execute(query, params)
+        while rows := cursor.fetchmany(batch_size):
+            yield rows
     finally:
-        cursor.close()
+        if cnn.unread_result:
+            cnn.discard()
+        else:
+            cursor.close()
 
 
 def get_user_highscores(cnn, username):
@@ -295,12 +575,7 @@ def get_user_highscores(cnn, username):
     """
     try:
         with cnn.cursor(dictionary=True) as cursor:
-            cursor.execute("""
-                SELECT h.score, u.username, h.achieved_at FROM highscores h
-                JOIN users u ON h.user_id = u.id
-                WHERE u.username = %s
-                ORDER BY h.score DESC
-            """, (username,))
+            cursor.execute(USER_HIGHSCORES_QUERY, (username,))
             return cursor.fetchall()
     except Exception as e:
         logger.error("Error fetching user highscores: %s", e)
@@ -320,14 +595,53 @@ def get_top_highscores(cnn, limit=10):
 
     try:
         with cnn.cursor(dictionary=True) as cursor:
+            cursor.execute(TOP_HIGHSCORES_QUERY, (limit,))
+            return cursor.fetchall()
+    except Exception as e:
+        logger.error("Error fetching top highscores: %s", e)
+        cnn.rollback()
+        raise
+
+
+def get_leaderboard_entries(cnn, limit):
+    """Returns the best highscores including their ids, used to (re)build the leaderboard.
+
+    Args:
+        limit (int): Maximum number of highscores to fetch.
+
+    Returns:
+        scores: List of (id, username, score, achieved_at) tuples, best first.
+    """
+    try:
+        with cnn.cursor() as cursor:
             cursor.execute("""
-                SELECT u.username, h.score, h.achieved_at FROM highscores h
-                JOIN users u ON h.user_id = u.id
-                ORDER BY h.score DESC
+                SELECT h.id, u.username, h.score, h.achieved_at FROM highscores h
+                STRAIGHT_JOIN users u ON h.user_id = u.id
+                ORDER BY h.score DESC, h.id DESC
                 LIMIT %s
             """, (limit,))
             return cursor.fetchall()
     except Exception as e:
-        logger.error("Error fetching top highscores: %s", e)
+        logger.error("Error fetching leaderboard entries: %s", e)
+        cnn.rollback()
+        raise
+
+
+def get_player_bests(cnn):
+    """Returns the best score of every player, used to (re)build the player ranking.
+
+    Returns:
+        scores: List of (username, best score) tuples.
+    """
+    try:
+        with cnn.cursor() as cursor:
+            cursor.execute("""
+                SELECT u.username, MAX(h.score) FROM highscores h
+                JOIN users u ON h.user_id = u.id
+                GROUP BY u.id, u.username
+            """)
+            return cursor.fetchall()
+    except Exception as e:
+        logger.error("Error fetching player bests: %s", e)
         cnn.rollback()
         raise
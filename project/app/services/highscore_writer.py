@@ -0,0 +1,230 @@
+"""
+highscore_writer.py
+
+Optional write-behind persistence of highscores. In write-behind mode a submission is
+acknowledged as soon as it is appended to a Redis stream (Redis persistence makes the
+queue durable). A background flusher reads the stream through a consumer group and stores
+the queued highscores in MySQL with one multi-row INSERT and one commit per batch,
+instead of one transaction per submission.
+
+An entry is only acknowledged (and removed from the stream) after its batch is committed.
+Entries of a flusher that died mid-batch are claimed by the next flusher after
+CLAIM_IDLE_MS; the unique submission id makes writing them a second time harmless.
+Highscores reach the Redis leaderboard once they are flushed.
+
+Metrics:
+- highscore_writer.batch_size (gauge): Rows in the last flushed batch.
+- highscore_writer.flush_lag_seconds (timing): Age of the oldest entry of each batch when
+  its batch is committed.
+- highscore_writer.flushed / highscore_writer.failures (counters): Rows stored / failed flushes.
+- highscore_writer.dropped (counter): Queued highscores MySQL rejected (e.g. of a deleted
+  user). They are logged and acknowledged, so they do not block the queue.
+
+Environment Variables:
+- HIGHSCORE_WRITE_MODE: "direct" (one INSERT per submission) or "write_behind".
+  Defaults to "direct".
+- HIGHSCORE_FLUSH_INTERVAL_MS: Maximum time a batch is collected. Defaults to 200.
+- HIGHSCORE_FLUSH_MAX_ROWS: Maximum rows per batch. Defaults to 500.
+"""
+import asyncio
+import datetime
+import os
+import socket
+import time
+import redis
+from app.services import leaderboard_service
+from app.services.database_service import (
+    get_connection, insert_highscore_batch, new_highscore_time)
+from app.services.redis_async_service import get_redis_client
+from app.util import metrics
+from app.util.logger import Logger, get_logger
+
+logger = get_logger("Highscore-Writer")
+
+STREAM_KEY = "highscores:pending"
+GROUP = "highscore-writers"
+CLAIM_IDLE_MS = 30000
+RETRY_DELAY = 1
+
+_FLUSHER = None
+
+
+def is_write_behind() -> bool:
+    """Returns True if highscores are written behind via the Redis stream."""
+    return os.getenv("HIGHSCORE_WRITE_MODE", "direct") == "write_behind"
+
+
+def get_flush_limits() -> tuple[int, int]:
+    """Returns the configured flush interval (ms) and maximum batch size.
+
+    Returns:
+        tuple[int, int]: (interval_ms, max_rows)
+    """
+    return (max(1, int(os.getenv("HIGHSCORE_FLUSH_INTERVAL_MS", "200"))),
+            max(1, int(os.getenv("HIGHSCORE_FLUSH_MAX_ROWS", "500"))))
+
+
+async def enqueue_highscore(user_id: int, username: str, score: int):
+    """Queue a highscore for the flusher.
+
+    Args:
+        user_id (int): Id of the user
+        username (str): Username
+        score (int): Achieved score
+
+    Raises:
+        HTTPException: 400 if the score is zero.
+
+    Returns:
+        tuple: (None, username, score, achieved_at), the id is assigned when flushed.
+    """
+    achieved_at = new_highscore_time(score)
+    await get_redis_client().xadd(STREAM_KEY, {
+        "user_id": user_id,
+        "username": username,
+        "score": score,
+        "achieved_at": achieved_at.isoformat()
+    })
+    return None, username, score, achieved_at
+
+
+def _decode_entry(entry_id: bytes, fields: dict) -> dict:
+    return {
+        "submission_id": entry_id.decode(),
+        "user_id": int(fields[b"user_id"]),
+        "username": fields[b"username"].decode(),
+        "score": int(fields[b"score"]),
+        "achieved_at": datetime.datetime.fromisoformat(fields[b"achieved_at"].decode())
+    }
+
+
+async def ensure_group(client):
+    """Create the stream and its consumer group unless they exist."""
+    try:
+        await client.xgroup_create(STREAM_KEY, GROUP, id="0", mkstream=True)
+    except redis.exceptions.ResponseError as e:
+        if "BUSYGROUP" not in str(e):
+            raise
+
+
+async def collect_batch(client, consumer: str) -> list:
+    """Collect up to max_rows entries, waiting at most the flush interval after the first one.
+
+    Entries left unacknowledged by a dead flusher are claimed first.
+
+    Returns:
+        list[tuple[bytes, dict]]: Stream entries (id, fields).
+    """
+    interval_ms, max_rows = get_flush_limits()
+    _, batch, *_ = await client.xautoclaim(
+        STREAM_KEY, GROUP, consumer, CLAIM_IDLE_MS, start_id="0-0", count=max_rows)
+    deadline = time.monotonic() + interval_ms / 1000 if batch else None
+    while len(batch) < max_rows:
+        if deadline is None:
+            block = interval_ms
+        else:
+            block = int((deadline - time.monotonic()) * 1000)
+            if block <= 0:
+                break
+        response = await client.xreadgroup(
+            GROUP, consumer, {STREAM_KEY: ">"}, count=max_rows - len(batch), block=block)
+        if response:
+            batch.extend(response[0][1])
+            if deadline is None:
+                deadline = time.monotonic() + interval_ms / 1000
+        elif deadline is None:
+            return batch
+    return batch
+
+
+async def flush(client, batch: list) -> int:
+    """Store a batch in MySQL, mirror it into the leaderboard and acknowledge it.
+
+    Args:
+        client (redis.asyncio.Redis): Redis client.
+        batch (list[tuple[bytes, dict]]): Stream entries.
+
+    Returns:
+        int: Number of highscores stored.
+    """
+    entries = [_decode_entry(entry_id, fields) for entry_id, fields in batch]
+    rows = [(e["submission_id"], e["user_id"], e["score"], e["achieved_at"]) for e in entries]
+
+    def write():
+        db_conn = get_connection()
+        try:
+            return insert_highscore_batch(db_conn, rows)
+        finally:
+            db_conn.close()
+
+    stored = await asyncio.to_thread(write)
+    oldest_ms = min(int(e["submission_id"].split("-")[0]) for e in entries)
+    metrics.observe("highscore_writer.flush_lag_seconds", max(0.0, time.time() - oldest_ms / 1000))
+    metrics.set_gauge("highscore_writer.batch_size", len(entries))
+    metrics.increment("highscore_writer.flushed", len(stored))
+    dropped = [e["submission_id"] for e in entries if e["submission_id"] not in stored]
+    if dropped:
+        metrics.increment("highscore_writer.dropped", len(dropped))
+        logger.error(f"Dropped {len(dropped)} of {len(rows)} queued highscores: {dropped}")
+
+    flushed = [e for e in entries if e["submission_id"] in stored]
+    results = await asyncio.gather(*(
+        leaderboard_service.add_entry(
+            stored[e["submission_id"]], e["username"], e["score"], e["achieved_at"])
+        for e in flushed), return_exceptions=True)
+    for e, result in zip(flushed, results):
+        if isinstance(result, redis.exceptions.RedisError):
+            logger.warn(f"Could not add highscore {stored[e['submission_id']]} "
+                        f"to the leaderboard: {result}")
+
+    ids = [entry_id for entry_id, _ in batch]
+    pipe = client.pipeline()
+    pipe.xack(STREAM_KEY, GROUP, *ids)
+    pipe.xdel(STREAM_KEY, *ids)
+    await pipe.execute()
+    return len(stored)
+
+
+async def _run_flusher(log: Logger):
+    """Flusher loop: collect a batch, store it, repeat. Failed batches stay pending and are
+    claimed again after CLAIM_IDLE_MS."""
+    consumer = f"{socket.gethostname()}-{os.getpid()}"
+    client = get_redis_client()
+    group_ready = False
+    while True:
+        try:
+            if not group_ready:
+                await ensure_group(client)
+                group_ready = True
+            batch = await collect_batch(client, consumer)
+            if batch:
+                await flush(client, batch)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            group_ready = False
+            metrics.increment("highscore_writer.failures")
+            log.warn(f"Highscore flush failed: {e}")
+            await asyncio.sleep(RETRY_DELAY)
+
+
+def start_writer(log: Logger = logger):
+    """Start the background flusher if write-behind mode is enabled. Must be called from
+    within the running event loop."""
+    global _FLUSHER
+    if not is_write_behind() or _FLUSHER is not None:
+        return
+    _FLUSHER = asyncio.create_task(_run_flusher(log))
+    log.info("Highscore write-behind flusher started.")
+
+
+async def stop_writer():
+    """Stop the background flusher. Queued highscores stay in the stream."""
+    global _FLUSHER
+    if _FLUSHER is not None:
+        _FLUSHER.cancel()
+        try:
+            await _FLUSHER
+        except asyncio.CancelledError:
+            pass
+    _FLUSHER = None
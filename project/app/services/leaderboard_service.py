@@ -0,0 +1,385 @@
+"""
+leaderboard_service.py
+
+Redis leaderboard mirrored from the MySQL highscores table. The best highscores are kept
+in a sorted set (member: highscore id, score: points) next to a hash with the display
+data of each entry, so top-N and rank queries cost O(log n) instead of a sorted scan
+of the highscores table. MySQL stays the source of truth: new highscores are added to
+both, and the leaderboard can be rebuilt from MySQL at any time.
+
+Members are the highscore ids zero-padded to a fixed width. Redis orders members with the
+same score by their bytes, so equal scores are ordered by id like in MySQL
+(score DESC, id DESC).
+
+A rebuild builds the new leaderboard under temporary keys and swaps them in. Highscores
+added while it runs are written to the temporary keys as well, so the swap does not drop
+them. Only one rebuild runs at a time.
+
+Deleting a user deletes their highscores in MySQL (ON DELETE CASCADE); delete_user (of
+both database services) removes the player from the leaderboard as well. Players removed
+while a rebuild runs are removed from its temporary keys again at the swap, in case the
+rebuild read them from MySQL before they were deleted.
+
+Keys:
+- leaderboard: Sorted set of highscore ids by score.
+- leaderboard:entries: Hash of highscore id -> msgpack [username, score, achieved_at].
+- leaderboard:players: Sorted set of usernames by their best score (player ranking).
+- leaderboard:ready: LEADERBOARD_VERSION once the leaderboard has been built. Readers fall
+  back to MySQL while it is missing or was built by an older version.
+- leaderboard:rebuilding: Set while a rebuild runs, expires after REBUILD_TIMEOUT seconds.
+- leaderboard:rebuild, leaderboard:entries:rebuild, leaderboard:players:rebuild: The
+  temporary keys of a rebuild.
+- leaderboard:removed: Hash of the players removed while a rebuild runs (username -> packed
+  username).
+
+Usage:
+    python -m app.services.leaderboard_service --rebuild
+
+Metrics:
+- leaderboard.hits / leaderboard.fallbacks (counters): Reads served from Redis / from MySQL.
+
+Environment Variables:
+- LEADERBOARD_MAX_ENTRIES: Number of highscores kept in the leaderboard. Defaults to 10000.
+"""
+import argparse
+import asyncio
+import datetime
+import os
+import msgpack
+from app.services import database_service, redis_service
+from app.services.redis_async_service import get_redis_client, close_redis_client
+from app.util import metrics
+from app.util.logger import get_logger
+
+logger = get_logger("Leaderboard")
+
+LEADERBOARD_KEY = "leaderboard"
+ENTRIES_KEY = "leaderboard:entries"
+PLAYERS_KEY = "leaderboard:players"
+READY_KEY = "leaderboard:ready"
+REBUILD_KEY = "leaderboard:rebuilding"
+REMOVED_KEY = "leaderboard:removed"
+TMP_KEYS = (f"{LEADERBOARD_KEY}:rebuild", f"{ENTRIES_KEY}:rebuild", f"{PLAYERS_KEY}:rebuild")
+LEADERBOARD_VERSION = "2"
+REBUILD_TIMEOUT = 600
+MEMBER_WIDTH = 20
+
+SCRIPTS = {}
+
+# KEYS: leaderboard, entries, players, rebuild marker, then the temporary leaderboard,
+# entries and players of a rebuild. ARGV: member, score, encoded entry, username,
+# maximum entries.
+ADD_LUA = """
+local member, score, entry, username = ARGV[1], ARGV[2], ARGV[3], ARGV[4]
+local targets = {1}
+if redis.call('EXISTS', KEYS[4]) == 1 then
+    targets = {1, 5}
+end
+for _, i in ipairs(targets) do
+    redis.call('ZADD', KEYS[i], score, member)
+    redis.call('HSET', KEYS[i + 1], member, entry)
+    redis.call('ZADD', KEYS[i + 2], 'GT', score, username)
+end
+local overflow = redis.call('ZCARD', KEYS[1]) - tonumber(ARGV[5])
+if overflow > 0 then
+    local evicted = redis.call('ZRANGE', KEYS[1], 0, overflow - 1)
+    redis.call('ZREM', KEYS[1], unpack(evicted))
+    redis.call('HDEL', KEYS[2], unpack(evicted))
+end
+"""
+
+# Removes all highscores of a player from a leaderboard, entries hash and players set.
+# Entries are msgpack arrays starting with the username, so an entry belongs to the player
+# if the packed username follows the one byte array header. Only used when users are
+# deleted, so scanning the entries hash is fine.
+REMOVE_PLAYER_FUNCTION = """
+local function remove_player(leaderboard, entries, players, username, packed)
+    local all = redis.call('HGETALL', entries)
+    local removed = 0
+    for i = 1, #all, 2 do
+        if string.sub(all[i + 1], 2, 1 + #packed) == packed then
+            redis.call('ZREM', leaderboard, all[i])
+            redis.call('HDEL', entries, all[i])
+            removed = removed + 1
+        end
+    end
+    redis.call('ZREM', players, username)
+    return removed
+end
+"""
+
+# KEYS: leaderboard, entries, players, rebuild marker, then the temporary leaderboard,
+# entries and players of a rebuild and the removed players hash. ARGV: username, packed
+# username, expiry of the removed players hash.
+REMOVE_LUA = REMOVE_PLAYER_FUNCTION + """
+local removed = remove_player(KEYS[1], KEYS[2], KEYS[3], ARGV[1], ARGV[2])
+if redis.call('EXISTS', KEYS[4]) == 1 then
+    remove_player(KEYS[5], KEYS[6], KEYS[7], ARGV[1], ARGV[2])
+    redis.call('HSET', KEYS[8], ARGV[1], ARGV[2])
+    redis.call('EXPIRE', KEYS[8], ARGV[3])
+end
+return removed
+"""
+
+# KEYS: pairs of (temporary key, live key) for the leaderboard, entries and players, then
+# the rebuild marker, the ready marker and the removed players hash. ARGV: leaderboard
+# version.
+SWAP_LUA = REMOVE_PLAYER_FUNCTION + """
+local removed = redis.call('HGETALL', KEYS[#KEYS])
+for i = 1, #removed, 2 do
+    remove_player(KEYS[1], KEYS[3], KEYS[5], removed[i], removed[i + 1])
+end
+for i = 1, #KEYS - 3, 2 do
+    if redis.call('EXISTS', KEYS[i]) == 1 then
+        redis.call('RENAME', KEYS[i], KEYS[i + 1])
+    else
+        redis.call('DEL', KEYS[i + 1])
+    end
+end
+redis.call('DEL', KEYS[#KEYS - 2], KEYS[#KEYS])
+redis.call('SET', KEYS[#KEYS - 1], ARGV[1])
+"""
+
+
+def get_max_entries() -> int:
+    """Returns the configured leaderboard size."""
+    return int(os.getenv("LEADERBOARD_MAX_ENTRIES", "10000"))
+
+
+def _member(highscore_id: int) -> str:
+    return str(highscore_id).zfill(MEMBER_WIDTH)
+
+
+def _remove_args(username: str) -> list:
+    return [username, msgpack.packb(username), REBUILD_TIMEOUT]
+
+
+def _get_script(client, source: str):
+    script = SCRIPTS.get(source)
+    if script is None or script.registered_client is not client:
+        script = SCRIPTS[source] = client.register_script(source)
+    return script
+
+
+def _encode_entry(username: str, score: int, achieved_at: datetime.datetime) -> bytes:
+    return msgpack.packb([username, score, achieved_at.isoformat()])
+
+
+def _decode_entry(blob: bytes) -> dict:
+    username, score, achieved_at = msgpack.unpackb(blob)
+    return {
+        "username": username,
+        "score": score,
+        "achieved_at": datetime.datetime.fromisoformat(achieved_at)
+    }
+
+
+async def is_ready() -> bool:
+    """Returns True if the leaderboard has been built and can serve reads."""
+    return await get_redis_client().get(READY_KEY) == LEADERBOARD_VERSION.encode()
+
+
+async def add_entry(highscore_id: int, username: str, score: int,
+                    achieved_at: datetime.datetime):
+    """Add a new highscore to the leaderboard and trim it to its maximum size.
+
+    One script call; while a rebuild runs, the highscore is added to its temporary keys too.
+
+    Args:
+        highscore_id (int): Id of the highscore row.
+        username (str): The player.
+        score (int): The achieved score.
+        achieved_at (datetime.datetime): When the score was achieved.
+    """
+    client = get_redis_client()
+    await _get_script(client, ADD_LUA)(
+        keys=[LEADERBOARD_KEY, ENTRIES_KEY, PLAYERS_KEY, REBUILD_KEY, *TMP_KEYS],
+        args=[_member(highscore_id), score, _encode_entry(username, score, achieved_at),
+              username, get_max_entries()])
+
+
+async def remove_player(username: str) -> int:
+    """Remove all highscores of a deleted player from the leaderboard and the player
+    ranking, including those of a rebuild in progress.
+
+    Args:
+        username (str): The player.
+
+    Returns:
+        int: Number of highscores removed from the leaderboard.
+    """
+    client = get_redis_client()
+    return await _get_script(client, REMOVE_LUA)(
+        keys=[LEADERBOARD_KEY, ENTRIES_KEY, PLAYERS_KEY, REBUILD_KEY, *TMP_KEYS, REMOVED_KEY],
+        args=_remove_args(username))
+
+
+def remove_player_sync(username: str) -> int:
+    """remove_player for synchronous callers (database_service).
+
+    Args:
+        username (str): The player.
+
+    Returns:
+        int: Number of highscores removed from the leaderboard.
+    """
+    client = redis_service.get_redis_client()
+    return _get_script(client, REMOVE_LUA)(
+        keys=[LEADERBOARD_KEY, ENTRIES_KEY, PLAYERS_KEY, REBUILD_KEY, *TMP_KEYS, REMOVED_KEY],
+        args=_remove_args(username))
+
+
+async def get_top(limit: int):
+    """Returns the top highscores from the leaderboard. Equal scores are ordered by id,
+    newest first, like in MySQL.
+
+    Args:
+        limit (int): Number of highscores.
+
+    Returns:
+        list[dict] | None: Entries with username, score and achieved_at, best first, or None
+            if the leaderboard cannot answer (not built yet, or limit beyond its size).
+    """
+    if limit > get_max_entries() or not await is_ready():
+        metrics.increment("leaderboard.fallbacks")
+        return None
+    client = get_redis_client()
+    ids = await client.zrevrange(LEADERBOARD_KEY, 0, limit - 1) if limit > 0 else []
+    blobs = await client.hmget(ENTRIES_KEY, ids) if ids else []
+    metrics.increment("leaderboard.hits")
+    return [_decode_entry(blob) for blob in blobs if blob is not None]
+
+
+async def get_rank(highscore_id: int):
+    """Returns the 1-based rank of a highscore.
+
+    Args:
+        highscore_id (int): Id of the highscore row.
+
+    Returns:
+        int | None: The rank, or None if the highscore is not on the leaderboard.
+    """
+    rank = await get_redis_client().zrevrank(LEADERBOARD_KEY, _member(highscore_id))
+    return rank + 1 if rank is not None else None
+
+
+async def get_player_rank(username: str, around: int = 2):
+    """Returns the best score and rank of a player plus the players directly around them.
+
+    Players are ranked by their best score; players with the same best score share a rank.
+    Every lookup is a handful of O(log n) sorted set operations.
+
+    Args:
+        username (str): The player.
+        around (int, optional): Number of neighbours above and below. Defaults to 2.
+
+    Returns:
+        dict | None: username, best_score, rank, players and neighbours (dicts with rank,
+            username and score, best first), or None if the player has no highscore.
+    """
+    client = get_redis_client()
+    pipe = client.pipeline()
+    pipe.zscore(PLAYERS_KEY, username)
+    pipe.zrevrank(PLAYERS_KEY, username)
+    pipe.zcard(PLAYERS_KEY)
+    best, position, players = await pipe.execute()
+    if best is None:
+        return None
+
+    window = await client.zrevrange(
+        PLAYERS_KEY, max(0, position - around), position + around, withscores=True)
+    scores = sorted({int(score) for _, score in window}, reverse=True)
+    pipe = client.pipeline()
+    for score in scores:
+        pipe.zcount(PLAYERS_KEY, f"({score}", "+inf")
+    ranks = {score: better + 1 for score, better in zip(scores, await pipe.execute())}
+    return {
+        "username": username,
+        "best_score": int(best),
+        "rank": ranks[int(best)],
+        "players": players,
+        "neighbours": [
+            {"rank": ranks[int(score)], "username": member.decode(), "score": int(score)}
+            for member, score in window
+        ]
+    }
+
+
+async def rebuild(cnn) -> int:
+    """Repopulate the leaderboard from MySQL.
+
+    The new leaderboard is built under temporary keys and swapped in atomically, so readers
+    never see a half-built leaderboard. Highscores added while the rebuild reads MySQL are
+    added to the temporary keys too (see add_entry) and survive the swap.
+
+    Args:
+        cnn: MySQL connection.
+
+    Returns:
+        int | None: Number of entries read from MySQL, or None if another rebuild is
+            already running.
+    """
+    client = get_redis_client()
+    if not await client.set(REBUILD_KEY, 1, nx=True, ex=REBUILD_TIMEOUT):
+        logger.info("Leaderboard rebuild already in progress, skipping")
+        return None
+    tmp_leaderboard, tmp_entries, tmp_players = TMP_KEYS
+    try:
+        # Left over by an aborted rebuild. Highscores added from here on are read below.
+        await client.delete(*TMP_KEYS, REMOVED_KEY)
+        rows = await asyncio.to_thread(
+            database_service.get_leaderboard_entries, cnn, get_max_entries())
+        bests = await asyncio.to_thread(database_service.get_player_bests, cnn)
+        pipe = client.pipeline()
+        if rows:
+            pipe.zadd(tmp_leaderboard, {_member(row[0]): row[2] for row in rows})
+            pipe.hset(tmp_entries, mapping={
+                _member(row[0]): _encode_entry(row[1], row[2], row[3]) for row in rows})
+        if bests:
+            pipe.zadd(tmp_players, {username: score for username, score in bests}, gt=True)
+        await _get_script(client, SWAP_LUA)(
+            keys=[tmp_leaderboard, LEADERBOARD_KEY, tmp_entries, ENTRIES_KEY,
+                  tmp_players, PLAYERS_KEY, REBUILD_KEY, READY_KEY, REMOVED_KEY],
+            args=[LEADERBOARD_VERSION], client=pipe)
+        await pipe.execute()
+    except Exception:
+        await client.delete(REBUILD_KEY, *TMP_KEYS, REMOVED_KEY)
+        raise
+    logger.info(f"Leaderboard rebuilt with {len(rows)} entries")
+    return len(rows)
+
+
+async def ensure_leaderboard():
+    """Build the leaderboard from MySQL unless it already exists. Failures are logged only,
+    reads fall back to MySQL in the meantime."""
+    db_conn = None
+    try:
+        if await is_ready():
+            return
+        db_conn = database_service.get_connection()
+        await rebuild(db_conn)
+    except Exception as e:
+        logger.warn(f"Could not build the leaderboard: {e}")
+    finally:
+        if db_conn:
+            db_conn.close()
+
+
+async def _rebuild_from_database():
+    db_conn = database_service.get_connection()
+    try:
+        await rebuild(db_conn)
+    finally:
+        db_conn.close()
+        await close_redis_client()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Manage the Redis highscore leaderboard.")
+    parser.add_argument("--rebuild", action="store_true",
+                        help="Repopulate the leaderboard from the MySQL highscores table")
+    args = parser.parse_args()
+    if args.rebuild:
+        asyncio.run(_rebuild_from_database())
+    else:
+        parser.print_help()
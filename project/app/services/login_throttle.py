@@ -0,0 +1,141 @@
+"""
+login_throttle.py
+
+Rate limiting of login attempts, so credential stuffing cannot burn the CPU that bcrypt
+needs for real players. Every attempt takes a token from two buckets, one per username
+and one per client IP, before the password is checked. An attempt is only let through if
+both buckets hold a token; otherwise it is answered with 429 and a Retry-After header.
+
+The buckets live in Redis and are updated by a Lua script that refills and takes from both
+in one atomic step, using the Redis server clock. All workers and nodes therefore share
+one budget per username and IP. If Redis is unavailable, attempts are let through (the
+password hashing pool still bounds the CPU spent on them).
+
+Keys:
+- throttle:login:user:<username> / throttle:login:ip:<ip>: Hash with the token level and the
+  time of its last update. Expires once the bucket would be full again.
+
+Metrics:
+- login_throttle.allowed / login_throttle.rejected (counters): Attempts let through / refused.
+- login_throttle.errors (counter): Attempts let through because Redis was unavailable.
+
+Environment Variables:
+- LOGIN_RATE_USER: Budget per username as "<attempts>/<seconds>": up to <attempts> in a
+  burst, refilled at that rate. "off" disables the bucket. Defaults to "10/60".
+- LOGIN_RATE_IP: Budget per client IP, same format. Defaults to "30/60".
+"""
+import math
+import os
+import redis
+from fastapi import HTTPException
+from app.services.redis_async_service import get_redis_client
+from app.util import metrics
+from app.util.logger import get_logger
+
+logger = get_logger("Login-Throttle")
+
+THROTTLE_SCRIPT = None
+
+# KEYS: buckets. ARGV: capacity and refill rate (tokens per ms) of each bucket.
+# Returns {allowed, milliseconds until every bucket holds a token again}.
+THROTTLE_LUA = """
+local time = redis.call('TIME')
+local now = tonumber(time[1]) * 1000 + math.floor(tonumber(time[2]) / 1000)
+local levels, wait = {}, 0
+for i = 1, #KEYS do
+    local capacity, rate = tonumber(ARGV[2 * i - 1]), tonumber(ARGV[2 * i])
+    local bucket = redis.call('HMGET', KEYS[i], 'tokens', 'ts')
+    local level = tonumber(bucket[1]) or capacity
+    local elapsed = math.max(0, now - (tonumber(bucket[2]) or now))
+    level = math.min(capacity, level + elapsed * rate)
+    if level < 1 then
+        wait = math.max(wait, math.ceil((1 - level) / rate))
+    end
+    levels[i] = level
+end
+for i = 1, #KEYS do
+    local capacity, rate = tonumber(ARGV[2 * i - 1]), tonumber(ARGV[2 * i])
+    local level = levels[i]
+    if wait == 0 then
+        level = level - 1
+    end
+    redis.call('HSET', KEYS[i], 'tokens', tostring(level), 'ts', now)
+    redis.call('PEXPIRE', KEYS[i], math.ceil((capacity - level) / rate) + 1000)
+end
+return {wait == 0 and 1 or 0, wait}
+"""
+
+
+def parse_rate(value: str):
+    """Parse a budget of the form "<attempts>/<seconds>".
+
+    Args:
+        value (str): The budget, or "off".
+
+    Raises:
+        ValueError: If the budget is malformed.
+
+    Returns:
+        tuple[int, float] | None: (capacity, tokens per millisecond), or None if disabled.
+    """
+    if value.strip().lower() == "off":
+        return None
+    attempts, _, seconds = value.partition("/")
+    capacity, period = int(attempts), float(seconds)
+    if capacity < 1 or period <= 0:
+        raise ValueError(f"Invalid login rate {value!r}")
+    return capacity, capacity / (period * 1000)
+
+
+def get_buckets(username: str, client_ip: str):
+    """Returns the buckets an attempt has to take a token from.
+
+    Args:
+        username (str): The username of the attempt.
+        client_ip (str): The client address of the attempt.
+
+    Returns:
+        list[tuple[str, int, float]]: (key, capacity, tokens per millisecond) per bucket.
+    """
+    buckets = []
+    for key, env, default in (
+            (f"throttle:login:user:{username.strip().lower()}", "LOGIN_RATE_USER", "10/60"),
+            (f"throttle:login:ip:{client_ip}", "LOGIN_RATE_IP", "30/60")):
+        rate = parse_rate(os.getenv(env, default))
+        if rate is not None:
+            buckets.append((key, *rate))
+    return buckets
+
+
+async def check_login_attempt(username: str, client_ip: str):
+    """Take a token for a login attempt from the buckets of its username and client IP.
+
+    Args:
+        username (str): The username of the attempt.
+        client_ip (str): The client address of the attempt.
+
+    Raises:
+        HTTPException: 429 with Retry-After if either budget is used up.
+    """
+    global THROTTLE_SCRIPT
+    buckets = get_buckets(username, client_ip)
+    if not buckets:
+        return
+    try:
+        client = get_redis_client()
+        if THROTTLE_SCRIPT is None or THROTTLE_SCRIPT.registered_client is not client:
+            THROTTLE_SCRIPT = client.register_script(THROTTLE_LUA)
+        allowed, wait_ms = await THROTTLE_SCRIPT(
+            keys=[key for key, _, _ in buckets],
+            args=[arg for _, capacity, rate in buckets for arg in (capacity, repr(rate))])
+    except redis.exceptions.RedisError as e:
+        metrics.increment("login_throttle.errors")
+        logger.warn(f"Login throttle unavailable, letting the attempt through: {e}")
+        return
+    if allowed:
+        metrics.increment("login_throttle.allowed")
+        return
+    metrics.increment("login_throttle.rejected")
+    logger.warn(f"Login attempt for {username!r} from {client_ip} throttled")
+    raise HTTPException(status_code=429, detail="Too many login attempts",
+                        headers={"Retry-After": str(max(1, math.ceil(wait_ms / 1000)))})
@@ -0,0 +1,181 @@
+"""
+migration_service.py
+
+Versioned schema migrations for the MySQL database. Migrations are SQL files in
+app/db_migrations named <version>_<description>.sql and are applied in version order.
+Every applied version is recorded in the schema_migrations table, so each migration runs
+exactly once per database. db_init/init.sql creates the initial schema; everything after
+that is a migration.
+
+The runner holds a MySQL named lock while it works, so several application instances
+starting at the same time do not apply the same migration twice.
+
+Usage:
+    python -m app.services.migration_service [--status]
+
+Environment Variables:
+- DB_MIGRATE_ON_STARTUP: Apply pending migrations when the application starts ("1"/"0").
+  Defaults to "1".
+"""
+import argparse
+import os
+import re
+from pathlib import Path
+from typing import NamedTuple
+from app.services.database_service import get_connection
+from app.util.logger import Logger, get_logger
+
+logger = get_logger("Migrations")
+
+MIGRATIONS_DIR = Path(__file__).resolve().parent.parent / "db_migrations"
+MIGRATION_FILE = re.compile(r"^(\d+)_(\w+)\.sql$")
+LOCK_NAME = "schema_migrations"
+LOCK_TIMEOUT = 60
+
+
+class Migration(NamedTuple):
+    """A single migration file."""
+    version: int
+    name: str
+    path: Path
+
+    def statements(self) -> list:
+        """Returns the SQL statements of the migration, comments stripped."""
+        lines = [line for line in self.path.read_text(encoding="utf-8").splitlines()
+                 if not line.strip().startswith("--")]
+        return [stmt.strip() for stmt in "\n".join(lines).split(";") if stmt.strip()]
+
+
+def get_migrations(directory=MIGRATIONS_DIR) -> list:
+    """Returns all migrations in a directory, ordered by version.
+
+    Args:
+        directory (Path, optional): Location of the migration files.
+
+    Raises:
+        ValueError: If two migrations share a version.
+
+    Returns:
+        list[Migration]: The migrations.
+    """
+    migrations = {}
+    for path in sorted(Path(directory).iterdir()):
+        match = MIGRATION_FILE.match(path.name)
+        if not match:
+            continue
+        version = int(match.group(1))
+        if version in migrations:
+            raise ValueError(f"Duplicate migration version {version}: {path.name}")
+        migrations[version] = Migration(version, match.group(2), path)
+    return [migrations[version] for version in sorted(migrations)]
+
+
+def ensure_migrations_table(cnn):
+    """Create the schema_migrations table if it does not exist yet."""
+    with cnn.cursor() as cursor:
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS schema_migrations (
+                version INT PRIMARY KEY,
+                name VARCHAR(255) NOT NULL,
+                applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+    cnn.commit()
+
+
+def get_applied_versions(cnn) -> set:
+    """Returns the versions of all migrations applied to the database."""
+    with cnn.cursor() as cursor:
+        cursor.execute("SELECT version FROM schema_migrations")
+        return {row[0] for row in cursor.fetchall()}
+
+
+def apply_migrations(cnn, directory=MIGRATIONS_DIR, log: Logger = logger) -> list:
+    """Apply all pending migrations in version order.
+
+    MySQL commits DDL statements implicitly, so a migration is recorded right after its
+    statements ran. A failing migration stops the run; the migrations before it stay applied.
+
+    Args:
+        cnn: MySQL connection.
+        directory (Path, optional): Location of the migration files.
+        log (Logger, optional): Logger for progress output.
+
+    Raises:
+        TimeoutError: If another instance holds the migration lock for too long.
+
+    Returns:
+        list[int]: Versions applied by this run.
+    """
+    ensure_migrations_table(cnn)
+    with cnn.cursor() as cursor:
+        cursor.execute("SELECT GET_LOCK(%s, %s)", (LOCK_NAME, LOCK_TIMEOUT))
+        if cursor.fetchone()[0] != 1:
+            raise TimeoutError("Could not acquire the schema migration lock")
+    try:
+        applied = get_applied_versions(cnn)
+        done = []
+        for migration in get_migrations(directory):
+            if migration.version in applied:
+                continue
+            log.info(f"Applying migration {migration.version:04d}_{migration.name}")
+            with cnn.cursor() as cursor:
+                for statement in migration.statements():
+                    cursor.execute(statement)
+                cursor.execute("INSERT INTO schema_migrations (version, name) VALUES (%s, %s)",
+                               (migration.version, migration.name))
+            cnn.commit()
+            done.append(migration.version)
+        return done
+    except Exception as e:
+        log.error("Migration failed: %s", e)
+        cnn.rollback()
+        raise
+    finally:
+        with cnn.cursor() as cursor:
+            cursor.execute("SELECT RELEASE_LOCK(%s)", (LOCK_NAME,))
+            cursor.fetchall()
+
+
+def migrate_on_startup() -> bool:
+    """Apply pending migrations unless disabled by DB_MIGRATE_ON_STARTUP. Failures are
+    logged and reported to the caller; the application keeps working on the current
+    schema unless it needs a newer one (write-behind highscores refuse to start).
+
+    Returns:
+        bool: False if the migrations could not be applied. With DB_MIGRATE_ON_STARTUP
+        disabled the schema is managed elsewhere and True is returned.
+    """
+    if os.getenv("DB_MIGRATE_ON_STARTUP", "1") != "1":
+        return True
+    db_conn = None
+    try:
+        db_conn = get_connection()
+        applied = apply_migrations(db_conn)
+        if applied:
+            logger.info(f"Applied {len(applied)} migration(s)")
+        return True
+    except Exception as e:
+        logger.warn(f"Could not apply the schema migrations: {e}")
+        return False
+    finally:
+        if db_conn:
+            db_conn.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Apply the database schema migrations.")
+    parser.add_argument("--status", action="store_true",
+                        help="List the migrations and whether they are applied")
+    args = parser.parse_args()
+    connection = get_connection()
+    try:
+        if args.status:
+            ensure_migrations_table(connection)
+            applied_versions = get_applied_versions(connection)
+            for item in get_migrations():
+                state = "applied" if item.version in applied_versions else "pending"
+                print(f"{item.version:04d}_{item.name}: {state}")
+        else:
+            print(f"Applied migrations: {apply_migrations(connection) or 'none'}")
+    finally:
+        connection.close()
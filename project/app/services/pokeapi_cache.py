@@ -0,0 +1,214 @@
+"""
+pokeapi_cache.py
+
+Process-safe on-disk cache for PokeAPI responses, replacing pokebase's shelve cache.
+Responses are stored in a SQLite database in WAL mode, which allows any number of
+concurrent readers next to a single writer, so several uvicorn workers can share one
+cache directory. Every write runs in its own transaction, and the least recently used
+entries are evicted once the configured size cap is exceeded. Reads only record their
+access time if the entry was not accessed for TOUCH_INTERVAL seconds, so most reads never
+take the writer lock; a read that cannot get it skips the update.
+
+All methods block on disk I/O; async callers run them in a worker thread.
+
+The cache is keyed by the resource path ("pokemon/25/"), the same key pokebase uses,
+so the pokebase API and the asynchronous client share their entries. Entries keep the
+time they were stored, so callers can decide when a response is stale.
+
+Metrics:
+- pokeapi_cache.hits / pokeapi_cache.misses / pokeapi_cache.evictions (counters)
+- pokeapi_cache.skipped_touches (counter): Access time updates skipped because the
+  database was locked.
+
+Environment Variables:
+- POKEMON_CACHE: Directory of the cache database. Defaults to "./cache".
+- POKEMON_CACHE_MAX_ENTRIES: Maximum number of cached responses. Defaults to 5000.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+import pokebase as pb
+from pokebase.common import cache_uri_build
+from dotenv import load_dotenv
+from app.util import metrics
+from app.util.logger import get_logger
+
+load_dotenv()
+
+CACHE = None
+CACHE_FILENAME = "pokeapi.sqlite3"
+TOUCH_INTERVAL = 60
+logger = get_logger("PokeAPI-Cache")
+
+
+class SQLiteCache:
+    """LRU-bounded response cache stored in a SQLite database in WAL mode.
+
+    Each thread gets its own connection, so the cache can be used from the event loop
+    and from worker threads alike.
+    """
+
+    def __init__(self, path: str, max_entries: int = 5000, touch_interval: float = TOUCH_INTERVAL):
+        self.path = path
+        self.max_entries = max_entries
+        self.touch_interval = touch_interval
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._connection() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS responses (
+                    key TEXT PRIMARY KEY,
+                    value TEXT NOT NULL,
+                    stored_at REAL NOT NULL,
+                    accessed_at REAL NOT NULL
+                )
+            """)
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_responses_accessed ON responses (accessed_at)")
+
+    def _connection(self) -> sqlite3.Connection:
+        """Returns the connection of the current thread, opening it on first use."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key: str):
+        """Look up a cached response and mark it as recently used.
+
+        Args:
+            key (str): Resource path, e.g. "pokemon/25/".
+
+        Returns:
+            dict | list | None: The cached response, or None on a miss.
+        """
+        entry = self.get_entry(key)
+        return entry[0] if entry else None
+
+    def get_entry(self, key: str):
+        """Like get(), but also returns when the response was stored.
+
+        Args:
+            key (str): Resource path, e.g. "pokemon/25/".
+
+        Returns:
+            tuple[dict | list, float] | None: (response, stored_at timestamp), or None on a miss.
+        """
+        conn = self._connection()
+        row = conn.execute(
+            "SELECT value, stored_at, accessed_at FROM responses WHERE key = ?",
+            (key,)).fetchone()
+        if row is None:
+            metrics.increment("pokeapi_cache.misses")
+            return None
+        now = time.time()
+        if now - row[2] >= self.touch_interval:
+            self._touch(conn, key, now)
+        metrics.increment("pokeapi_cache.hits")
+        return json.loads(row[0]), row[1]
+
+    def _touch(self, conn: sqlite3.Connection, key: str, now: float):
+        """Record an access for the LRU order. Best effort: gives up at once if another
+        connection holds the writer lock instead of waiting for the busy timeout."""
+        conn.execute("PRAGMA busy_timeout = 0")
+        try:
+            conn.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key))
+        except sqlite3.OperationalError:
+            metrics.increment("pokeapi_cache.skipped_touches")
+        finally:
+            conn.execute("PRAGMA busy_timeout = 10000")
+
+    def random_pokemon_id(self):
+        """Pick a random Pokémon whose pokemon and species resources are both cached.
+
+        Returns:
+            int | None: A Pokémon id, or None if no complete Pokémon is cached.
+        """
+        row = self._connection().execute("""
+            SELECT p.key FROM responses p
+            JOIN responses s ON s.key = 'pokemon-species/' || substr(p.key, 9)
+            WHERE p.key GLOB 'pokemon/[0-9]*'
+            ORDER BY RANDOM() LIMIT 1
+        """).fetchone()
+        return int(row[0].strip("/").split("/")[-1]) if row else None
+
+    def set(self, key: str, value):
+        """Store a response atomically and evict the least recently used entries if needed.
+
+        Args:
+            key (str): Resource path, e.g. "pokemon/25/".
+            value (dict | list): The decoded JSON response.
+        """
+        now = time.time()
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute(
+                "INSERT OR REPLACE INTO responses (key, value, stored_at, accessed_at) "
+                "VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value, separators=(",", ":")), now, now))
+            overflow = conn.execute(
+                "SELECT COUNT(*) FROM responses").fetchone()[0] - self.max_entries
+            if overflow > 0:
+                conn.execute(
+                    "DELETE FROM responses WHERE key IN "
+                    "(SELECT key FROM responses ORDER BY accessed_at LIMIT ?)", (overflow,))
+                metrics.increment("pokeapi_cache.evictions", overflow)
+            conn.execute("COMMIT")
+        except sqlite3.Error:
+            conn.execute("ROLLBACK")
+            raise
+
+    def stats(self) -> dict:
+        """Returns the hit/miss/eviction counters and the current number of entries."""
+        entries = self._connection().execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        return {
+            "entries": entries,
+            "max_entries": self.max_entries,
+            "hits": metrics.get_counter("pokeapi_cache.hits"),
+            "misses": metrics.get_counter("pokeapi_cache.misses"),
+            "evictions": metrics.get_counter("pokeapi_cache.evictions")
+        }
+
+
+def get_cache() -> SQLiteCache:
+    """Returns the shared cache, creating it inside POKEMON_CACHE on first use.
+
+    Returns:
+        SQLiteCache: The PokeAPI response cache.
+    """
+    global CACHE
+    if CACHE is None:
+        directory = os.getenv("POKEMON_CACHE") or "./cache"
+        CACHE = SQLiteCache(
+            os.path.join(directory, CACHE_FILENAME),
+            max_entries=int(os.getenv("POKEMON_CACHE_MAX_ENTRIES", "5000"))
+        )
+        logger.info(f"PokeAPI cache opened at {CACHE.path}")
+    return CACHE
+
+
+def _pokebase_load(endpoint, resource_id=None, subresource=None):
+    """pokebase-compatible load(): raises KeyError on a miss."""
+    data = get_cache().get(cache_uri_build(endpoint, resource_id, subresource))
+    if data is None:
+        raise KeyError("Resource not cached.")
+    return data
+
+
+def _pokebase_save(data, endpoint, resource_id=None, subresource=None):
+    """pokebase-compatible save(): empty responses are not stored."""
+    if data:
+        get_cache().set(cache_uri_build(endpoint, resource_id, subresource), data)
+
+
+def install_pokebase_cache():
+    """Route pokebase's response caching through the SQLite cache instead of shelve."""
+    get_cache()
+    pb.api.load = _pokebase_load
+    pb.api.save = _pokebase_save
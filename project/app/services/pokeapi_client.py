@@ -0,0 +1,187 @@
+"""
+pokeapi_client.py
+
+Asynchronous PokeAPI client. A single pooled keep-alive httpx.AsyncClient is shared for
+the lifetime of the application, so quiz routes can talk to PokeAPI without blocking the
+event loop and without opening a new connection for every request. Responses are kept in
+the shared on-disk cache (see pokeapi_cache), which is read and written in worker threads.
+A cache that cannot be read or written (e.g. locked) is treated like a miss.
+
+Upstream calls go through a circuit breaker. Once PokeAPI failed repeatedly, requests fail
+fast instead of waiting for timeouts. Cached responses older than POKEMON_CACHE_TTL are
+served stale and revalidated in the background whenever the breaker lets calls through.
+
+Metrics:
+- pokeapi_breaker.* (see app.util.circuit_breaker)
+- pokeapi.stale_serves / pokeapi.revalidations / pokeapi.revalidation_failures (counters)
+- pokeapi_cache.errors (counter): Cache reads or writes that failed.
+
+Environment Variables:
+- POKEAPI_URL: Base URL of the PokeAPI. Defaults to "https://pokeapi.co/api/v2".
+- POKEAPI_TIMEOUT: Timeout per request in seconds. Defaults to 5.
+- POKEAPI_MAX_CONNECTIONS: Size of the connection pool. Defaults to 20.
+- POKEAPI_BREAKER_THRESHOLD: Consecutive failures that open the breaker. Defaults to 5.
+- POKEAPI_BREAKER_RESET: Seconds the breaker stays open before probing. Defaults to 30.
+- POKEMON_CACHE_TTL: Seconds a cached response counts as fresh. Defaults to 604800 (7 days).
+"""
+import asyncio
+import os
+import sqlite3
+import time
+import httpx
+from dotenv import load_dotenv
+from app.services.pokeapi_cache import get_cache
+from app.util import metrics
+from app.util.circuit_breaker import CircuitBreaker
+from app.util.logger import get_logger
+
+load_dotenv()
+
+CLIENT = None
+BREAKER = CircuitBreaker(
+    "pokeapi_breaker",
+    failure_threshold=int(os.getenv("POKEAPI_BREAKER_THRESHOLD", "5")),
+    reset_timeout=float(os.getenv("POKEAPI_BREAKER_RESET", "30"))
+)
+_REVALIDATING = {}
+logger = get_logger("PokeAPI")
+
+
+def create_client() -> httpx.AsyncClient:
+    """Create a pooled HTTP client for the PokeAPI.
+
+    Returns:
+        httpx.AsyncClient: Client with keep-alive connections and the configured timeout.
+    """
+    max_connections = int(os.getenv("POKEAPI_MAX_CONNECTIONS", "20"))
+    return httpx.AsyncClient(
+        base_url=os.getenv("POKEAPI_URL", "https://pokeapi.co/api/v2"),
+        timeout=float(os.getenv("POKEAPI_TIMEOUT", "5")),
+        limits=httpx.Limits(max_connections=max_connections,
+                            max_keepalive_connections=max_connections)
+    )
+
+
+def get_client() -> httpx.AsyncClient:
+    """Returns the shared client, creating it on first use.
+
+    Returns:
+        httpx.AsyncClient: The application-wide PokeAPI client.
+    """
+    global CLIENT
+    if CLIENT is None or CLIENT.is_closed:
+        logger.info("Opening PokeAPI connection pool.")
+        CLIENT = create_client()
+    return CLIENT
+
+
+async def close_client():
+    """Close the shared client and all of its pooled connections."""
+    global CLIENT
+    if CLIENT is not None:
+        await CLIENT.aclose()
+        logger.info("PokeAPI connection pool closed.")
+    CLIENT = None
+
+
+def _is_upstream_failure(error: Exception) -> bool:
+    """Transport errors and 5xx answers count against the breaker, 4xx answers do not."""
+    if isinstance(error, httpx.HTTPStatusError):
+        return error.response.status_code >= 500
+    return isinstance(error, httpx.HTTPError)
+
+
+async def _fetch_upstream(key: str) -> dict:
+    """Request a resource from PokeAPI through the circuit breaker and cache it."""
+    async def request():
+        response = await get_client().get(f"/{key}")
+        response.raise_for_status()
+        return response.json()
+
+    data = await BREAKER.call(request, is_failure=_is_upstream_failure)
+    try:
+        await asyncio.to_thread(get_cache().set, key, data)
+    except sqlite3.Error as e:
+        metrics.increment("pokeapi_cache.errors")
+        logger.warn(f"Could not cache {key}: {e}")
+    return data
+
+
+async def _revalidate(key: str):
+    """Refresh a stale cache entry in the background."""
+    try:
+        await _fetch_upstream(key)
+        metrics.increment("pokeapi.revalidations")
+    except Exception as e:
+        metrics.increment("pokeapi.revalidation_failures")
+        logger.warn(f"Revalidation of {key} failed: {e}")
+    finally:
+        _REVALIDATING.pop(key, None)
+
+
+async def get_json(path: str) -> dict:
+    """Fetch a PokeAPI resource, answering from the response cache when possible.
+
+    Fresh cache entries are returned directly. Stale entries are returned as well, and a
+    background revalidation is started if the circuit breaker currently allows upstream
+    calls. Only cache misses wait for PokeAPI.
+
+    Args:
+        path (str): Resource path relative to the API base URL, e.g. "pokemon/1".
+
+    Raises:
+        httpx.HTTPError: If the request fails or PokeAPI answers with an error status.
+        CircuitOpenError: If the resource is not cached and PokeAPI is considered down.
+
+    Returns:
+        dict: The decoded JSON response.
+    """
+    key = f"{path.strip('/')}/"
+    try:
+        entry = await asyncio.to_thread(get_cache().get_entry, key)
+    except sqlite3.Error as e:
+        metrics.increment("pokeapi_cache.errors")
+        logger.warn(f"Could not read {key} from the cache: {e}")
+        entry = None
+    if entry is None:
+        return await _fetch_upstream(key)
+
+    data, stored_at = entry
+    if time.time() - stored_at > float(os.getenv("POKEMON_CACHE_TTL", "604800")):
+        metrics.increment("pokeapi.stale_serves")
+        if key not in _REVALIDATING and BREAKER.state != BREAKER.OPEN:
+            _REVALIDATING[key] = asyncio.create_task(_revalidate(key))
+    return data
+
+
+async def random_cached_pokemon_id():
+    """Returns the id of a random Pokémon that can be served completely from the cache.
+
+    Returns:
+        int | None: A Pokémon id, or None if nothing usable is cached.
+    """
+    try:
+        return await asyncio.to_thread(get_cache().random_pokemon_id)
+    except sqlite3.Error as e:
+        metrics.increment("pokeapi_cache.errors")
+        logger.warn(f"Could not read the cache: {e}")
+        return None
+
+
+async def fetch_pokemon_data(pokemon_id: int) -> tuple[dict, dict]:
+    """Fetch the pokemon and the pokemon-species resource of a Pokémon concurrently.
+
+    Within the National Dex range the species id equals the Pokémon id, so both
+    requests can be sent at the same time.
+
+    Args:
+        pokemon_id (int): National Dex id.
+
+    Returns:
+        tuple[dict, dict]: (pokemon, species) as returned by PokeAPI.
+    """
+    pokemon, species = await asyncio.gather(
+        get_json(f"pokemon/{pokemon_id}"),
+        get_json(f"pokemon-species/{pokemon_id}")
+    )
+    return pokemon, species
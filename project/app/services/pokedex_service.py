@@ -0,0 +1,236 @@
+"""
+pokedex_service.py
+
+Offline Pokédex snapshot store. Downloads every Pokémon of the National Dex once via the
+PokéBase API and stores the data the quiz needs (name, height, weight, stats, types and
+English Pokédex entries) in a compact, gzip-compressed JSON file. Once the snapshot is in
+place, quiz questions can be built without a single PokeAPI round trip.
+
+Snapshot layout (version 1):
+    {
+        "version": 1,
+        "stat_names": ["Hp", "Attack", ...],
+        "pokemon": [[id, name, height, weight, [stats...], [types...], [entries...]], ...]
+    }
+
+Usage:
+    python -m app.services.pokedex_service [--output PATH] [--min-id N] [--max-id N]
+
+Environment Variables:
+- POKEDEX_SNAPSHOT: Path of the snapshot file. Defaults to "<POKEMON_CACHE>/pokedex.json.gz".
+"""
+import argparse
+import gzip
+import json
+import os
+import re
+from typing import NamedTuple
+import pokebase as pb
+from dotenv import load_dotenv
+from app.models.quiz_info import STAT_NAMES
+from app.services.pokeapi_cache import install_pokebase_cache
+from app.util.logger import Logger, get_logger
+
+load_dotenv()
+
+SNAPSHOT_VERSION = 1
+MAX_POKEMON_ID = 1025
+
+SNAPSHOT = None
+SNAPSHOT_FAILED = None  # path of a snapshot that is missing or could not be loaded
+NAME_INDEX = None
+logger = get_logger("Pokedex")
+
+
+class PokedexEntry(NamedTuple):
+    """A single Pokémon as stored in the offline snapshot."""
+    pokemon_id: int
+    name: str
+    height: int
+    weight: int
+    stats: tuple
+    types: tuple
+    entries: tuple
+
+    def stats_dict(self) -> dict:
+        """Return the base stats keyed by their readable name, as used by QuizInfo."""
+        return dict(zip(STAT_NAMES, self.stats))
+
+
+def get_snapshot_path() -> str:
+    """Returns the location of the snapshot file.
+
+    Returns:
+        str: POKEDEX_SNAPSHOT if set, otherwise pokedex.json.gz inside the POKEMON_CACHE directory.
+    """
+    default = os.path.join(os.getenv("POKEMON_CACHE") or "./cache", "pokedex.json.gz")
+    return os.getenv("POKEDEX_SNAPSHOT", default)
+
+
+def normalize_flavor_text(text: str) -> str:
+    """Collapse the line breaks and form feeds PokeAPI keeps from the game cartridges.
+
+    Args:
+        text (str): Raw flavor text.
+
+    Returns:
+        str: The flavor text on a single line.
+    """
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def build_entry(pokemon) -> PokedexEntry:
+    """Convert a PokéBase Pokémon into a snapshot entry.
+
+    Args:
+        pokemon (pokebase.Pokemon): A Pokémon object returned by PokeBase.
+
+    Returns:
+        PokedexEntry: The compact representation of that Pokémon.
+    """
+    base_stats = {stat.stat.name.capitalize(): stat.base_stat for stat in pokemon.stats}
+    entries = []
+    for entry in pokemon.species.flavor_text_entries:
+        if entry.language.name != "en":
+            continue
+        text = normalize_flavor_text(entry.flavor_text)
+        if text not in entries:
+            entries.append(text)
+    return PokedexEntry(
+        pokemon_id=pokemon.id,
+        name=pokemon.name,
+        height=pokemon.height,
+        weight=pokemon.weight,
+        stats=tuple(base_stats.get(name, 0) for name in STAT_NAMES),
+        types=tuple(t.type.name.capitalize() for t in pokemon.types),
+        entries=tuple(entries)
+    )
+
+
+def write_snapshot(entries, path: str):
+    """Write the given entries to a snapshot file.
+
+    The file is written next to its destination first and then moved into place, so
+    readers never see a half-written snapshot.
+
+    Args:
+        entries (Iterable[PokedexEntry]): Entries to store.
+        path (str): Destination of the snapshot.
+    """
+    document = {
+        "version": SNAPSHOT_VERSION,
+        "stat_names": list(STAT_NAMES),
+        "pokemon": [
+            [e.pokemon_id, e.name, e.height, e.weight,
+             list(e.stats), list(e.types), list(e.entries)]
+            for e in sorted(entries, key=lambda e: e.pokemon_id)
+        ]
+    }
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with gzip.open(tmp_path, "wt", encoding="utf-8") as f:
+        json.dump(document, f, ensure_ascii=False, separators=(",", ":"))
+    os.replace(tmp_path, path)
+
+
+def read_snapshot(path: str) -> dict:
+    """Read a snapshot file into a lookup table.
+
+    Args:
+        path (str): Location of the snapshot.
+
+    Raises:
+        ValueError: If the snapshot was written with an unknown layout.
+
+    Returns:
+        dict[int, PokedexEntry]: All stored Pokémon keyed by their National Dex id.
+    """
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        document = json.load(f)
+    if document.get("version") != SNAPSHOT_VERSION:
+        raise ValueError(f"Unsupported snapshot version: {document.get('version')}")
+    return {
+        row[0]: PokedexEntry(row[0], row[1], row[2], row[3],
+                             tuple(row[4]), tuple(row[5]), tuple(row[6]))
+        for row in document["pokemon"]
+    }
+
+
+def get_snapshot():
+    """Return the in-process Pokédex table, loading it from disk on first use.
+
+    A missing or unreadable snapshot file is only checked once; the process then works
+    without a snapshot and picks up a snapshot written later after a restart.
+
+    Returns:
+        dict[int, PokedexEntry] | None: The snapshot, or None if no usable snapshot file exists.
+    """
+    global SNAPSHOT, SNAPSHOT_FAILED
+    if SNAPSHOT is None:
+        path = get_snapshot_path()
+        if path == SNAPSHOT_FAILED:
+            return None
+        if not os.path.exists(path):
+            SNAPSHOT_FAILED = path
+            return None
+        try:
+            SNAPSHOT = read_snapshot(path)
+            logger.info(f"Loaded {len(SNAPSHOT)} Pokémon from snapshot {path}")
+        except (OSError, ValueError, KeyError) as e:
+            logger.warn(f"Could not load Pokédex snapshot {path}: {e}")
+            SNAPSHOT_FAILED = path
+            return None
+    return SNAPSHOT
+
+
+def find_pokemon_id(name: str):
+    """Look up a Pokémon id by its (lowercase) name in the snapshot.
+
+    Args:
+        name (str): The Pokémon name, e.g. "bulbasaur".
+
+    Returns:
+        int | None: The id, or None if there is no snapshot or no Pokémon of that name.
+    """
+    global NAME_INDEX
+    snapshot = get_snapshot()
+    if not snapshot:
+        return None
+    if NAME_INDEX is None or NAME_INDEX[0] is not snapshot:
+        NAME_INDEX = (snapshot, {entry.name: pokemon_id for pokemon_id, entry in snapshot.items()})
+    return NAME_INDEX[1].get(name)
+
+
+def ingest_pokedex(path: str, min_id=1, max_id=MAX_POKEMON_ID, log: Logger = logger) -> int:
+    """Download all Pokémon in the given id range and store them as a snapshot.
+
+    Args:
+        path (str): Destination of the snapshot.
+        min_id (int, optional): First Pokémon id. Defaults to 1.
+        max_id (int, optional): Last Pokémon id. Defaults to 1025.
+        log (Logger, optional): Logger for progress output.
+
+    Returns:
+        int: Number of Pokémon written to the snapshot.
+    """
+    install_pokebase_cache()
+    entries = []
+    for pokemon_id in range(min_id, max_id + 1):
+        entries.append(build_entry(pb.pokemon(pokemon_id)))
+        if pokemon_id % 50 == 0 or pokemon_id == max_id:
+            log.info(f"Ingested {pokemon_id - min_id + 1}/{max_id - min_id + 1} Pokémon")
+    write_snapshot(entries, path)
+    log.info(f"Snapshot written to {path}")
+    return len(entries)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Download the Pokédex into a local snapshot file.")
+    parser.add_argument("--output", default=get_snapshot_path(),
+                        help="Snapshot destination (defaults to POKEDEX_SNAPSHOT)")
+    parser.add_argument("--min-id", type=int, default=1)
+    parser.add_argument("--max-id", type=int, default=MAX_POKEMON_ID)
+    args = parser.parse_args()
+    ingest_pokedex(args.output, args.min_id, args.max_id)
@@ -10,23 +10,38 @@ Main Features:
 - Extracts and formats stats, types, and English Pokédex entries.
 - Logs useful debug information via a custom logger.
 - Supports test mode via the USE_TEST_POKEMON environment variable.
+- Builds questions from the offline Pokédex snapshot (see pokedex_service) when available.
+- Provides fetch_pokemon_async, which uses the pooled asynchronous PokeAPI client.
+  Concurrent fetches of the same Pokémon are coalesced into a single upstream call, and
+  questions keep being served from the cache while PokeAPI is down.
 
 Environment Variables:
 - USE_TEST_POKEMON: If set to "1", a hardcoded test Pokémon (Bulbasaur) will be returned.
-- POKEMON_CACHE: Path for PokéBase API response caching (used by pokebase).
+- POKEMON_CACHE: Directory of the PokeAPI response cache (see pokeapi_cache).
+- POKEDEX_SNAPSHOT: Path of the offline Pokédex snapshot (used by pokedex_service).
 """
 import os
 import re
 import secrets
+import httpx
 import requests
 from fastapi import HTTPException
 import pokebase as pb
 from dotenv import load_dotenv
+from app.util import metrics
+from app.util.circuit_breaker import CircuitOpenError
 from app.util.logger import Logger
+from app.util.singleflight import SingleFlight
 from app.models.quiz_info import QuizInfo
+from app.services.pokedex_service import PokedexEntry, get_snapshot
+from app.services import pokeapi_client
+from app.services.pokeapi_cache import install_pokebase_cache
 
 load_dotenv()
-pb.cache.set_cache(os.getenv("POKEMON_CACHE"))
+install_pokebase_cache()
+
+# Coalesces concurrent fetches of the same Pokémon id (metrics: pokemon_fetch.*)
+POKEMON_FETCHES = SingleFlight("pokemon_fetch")
 
 
 def get_random_pokemon_id(min_id=1, max_id=1025):
@@ -56,9 +71,21 @@ def get_english_dex_entry(species, name):
         if entry.language.name == "en"
     ]
     entry = secrets.choice(english_entries) if english_entries else "No English entry found."
+    return mask_pokemon_name(entry, name)
+
+
+def mask_pokemon_name(entry, name):
+    """Replace every occurrence of the Pokémon's name in a Pokédex entry.
+
+    Args:
+        entry (str): The Pokédex flavor text.
+        name (str): The Pokémon's name.
+
+    Returns:
+        str: The flavor text with the name replaced by "[Pokémon]".
+    """
     pattern = re.compile(rf"\b{re.escape(name)}\b", re.IGNORECASE)
-    entry = pattern.sub("[Pokémon]", entry)
-    return entry
+    return pattern.sub("[Pokémon]", entry)
 
 
 def extract_stats(stats_data):
@@ -129,11 +156,40 @@ def get_test_pokemon() -> QuizInfo:
     )
 
 
+def quiz_info_from_snapshot(entry: PokedexEntry, entry_index: int | None = None) -> QuizInfo:
+    """Build a QuizInfo object from an offline Pokédex snapshot entry.
+
+    Args:
+        entry (PokedexEntry): The snapshot entry of the Pokémon.
+        entry_index (int | None, optional): Which flavor text to use. Defaults to a random one.
+
+    Returns:
+        QuizInfo: A structured object containing key quiz data about a Pokémon.
+    """
+    if not entry.entries:
+        entry_index, dex_entry = None, "No English entry found."
+    else:
+        if entry_index is None:
+            entry_index = secrets.randbelow(len(entry.entries))
+        dex_entry = entry.entries[entry_index]
+    return QuizInfo(
+        name=entry.name,
+        pokemon_id=entry.pokemon_id,
+        height=entry.height,
+        weight=entry.weight,
+        stats=entry.stats_dict(),
+        types=list(entry.types),
+        entry=mask_pokemon_name(dex_entry, entry.name),
+        entry_index=entry_index
+    )
+
+
 def fetch_pokemon(logger: Logger) -> QuizInfo:
     """Fetch a random Pokémon and return a QuizInfo object for use in quizzes.
 
     If the environment variable USE_TEST_POKEMON is set to "1", test data is returned
-    instead of querying the PokeBase API.
+    instead of querying the PokeBase API. If an offline Pokédex snapshot is available,
+    the question is built from it without touching the network.
 
     Args:
         logger (Logger): Custom application logger for detailed output.
@@ -146,8 +202,12 @@ def fetch_pokemon(logger: Logger) -> QuizInfo:
     """
     if os.getenv("USE_TEST_POKEMON") == "1":
         return get_test_pokemon()
+    pokemon_id = get_random_pokemon_id()
+    snapshot = get_snapshot()
+    if snapshot and pokemon_id in snapshot:
+        logger.info(msg=f"Name: {snapshot[pokemon_id].name} (snapshot)")
+        return quiz_info_from_snapshot(snapshot[pokemon_id])
     try:
-        pokemon_id = get_random_pokemon_id()
         pokemon = pb.pokemon(pokemon_id)
 
         log_pokemon_details(logger, pokemon)
@@ -170,3 +230,89 @@ def fetch_pokemon(logger: Logger) -> QuizInfo:
         logger.error(f"Failed to fetch Pokémon data: {e}")
         raise HTTPException(
             status_code=503, detail="External Pokémon API is unavailable.") from e
+
+
+def quiz_info_from_api(pokemon: dict, species: dict) -> QuizInfo:
+    """Build a QuizInfo object from raw PokeAPI JSON responses.
+
+    Args:
+        pokemon (dict): The response of the pokemon endpoint.
+        species (dict): The response of the pokemon-species endpoint.
+
+    Returns:
+        QuizInfo: A structured object containing key quiz data about a Pokémon.
+    """
+    english_entries = [
+        entry["flavor_text"] for entry in species["flavor_text_entries"]
+        if entry["language"]["name"] == "en"
+    ]
+    entry = secrets.choice(english_entries) if english_entries else "No English entry found."
+    return QuizInfo(
+        name=pokemon["name"],
+        pokemon_id=pokemon["id"],
+        height=pokemon["height"],
+        weight=pokemon["weight"],
+        stats={s["stat"]["name"].capitalize(): s["base_stat"] for s in pokemon["stats"]},
+        types=[t["type"]["name"].capitalize() for t in pokemon["types"]],
+        entry=mask_pokemon_name(entry, pokemon["name"])
+    )
+
+
+async def fetch_pokemon_data_or_cached(pokemon_id: int, logger: Logger) -> tuple[dict, dict]:
+    """Fetch the raw data of a Pokémon, falling back to any cached Pokémon on failure.
+
+    Args:
+        pokemon_id (int): The Pokémon that should be fetched.
+        logger (Logger): Custom application logger.
+
+    Raises:
+        CircuitOpenError | httpx.HTTPError: If the fetch failed and nothing usable is cached.
+
+    Returns:
+        tuple[dict, dict]: (pokemon, species) as returned by PokeAPI.
+    """
+    try:
+        return await POKEMON_FETCHES.do(
+            pokemon_id, lambda: pokeapi_client.fetch_pokemon_data(pokemon_id))
+    except (CircuitOpenError, httpx.HTTPError) as e:
+        fallback_id = await pokeapi_client.random_cached_pokemon_id()
+        if fallback_id is None:
+            raise
+        logger.warn(f"PokeAPI unavailable ({e}), serving cached Pokémon {fallback_id}")
+        metrics.increment("pokeapi.stale_serves")
+        return await pokeapi_client.fetch_pokemon_data(fallback_id)
+
+
+async def fetch_pokemon_async(logger: Logger) -> QuizInfo:
+    """Asynchronous counterpart of fetch_pokemon for use inside async routes.
+
+    Uses the same test data and snapshot shortcuts as fetch_pokemon. Otherwise the
+    pokemon and species resources are fetched concurrently through the pooled
+    PokeAPI client, so the event loop is never blocked. Callers asking for the same
+    Pokémon at the same time share one upstream fetch. If PokeAPI cannot be reached (or
+    its circuit breaker is open), a Pokémon that is already cached is served instead.
+
+    Args:
+        logger (Logger): Custom application logger for detailed output.
+
+    Returns:
+        QuizInfo: A structured object containing key quiz data about a Pokémon.
+
+    Raises:
+        HTTPException: If the external PokéAPI is unreachable or returns invalid data.
+    """
+    if os.getenv("USE_TEST_POKEMON") == "1":
+        return get_test_pokemon()
+    pokemon_id = get_random_pokemon_id()
+    snapshot = get_snapshot()
+    if snapshot and pokemon_id in snapshot:
+        logger.info(msg=f"Name: {snapshot[pokemon_id].name} (snapshot)")
+        return quiz_info_from_snapshot(snapshot[pokemon_id])
+    try:
+        pokemon, species = await fetch_pokemon_data_or_cached(pokemon_id, logger)
+        logger.info(msg=f"Name: {pokemon['name']}")
+        return quiz_info_from_api(pokemon, species)
+    except (CircuitOpenError, httpx.HTTPError, KeyError, ValueError) as e:
+        logger.error(f"Failed to fetch Pokémon data: {e}")
+        raise HTTPException(
+            status_code=503, detail="External Pokémon API is unavailable.") from e
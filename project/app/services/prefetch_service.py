@@ -0,0 +1,158 @@
+"""
+prefetch_service.py
+
+Keeps a bounded in-process buffer of ready-made quiz questions, so request handlers do
+not have to build a question inline. A background producer task refills the buffer up to
+the high watermark whenever it drops to the low watermark. If the buffer is empty, the
+caller falls back to fetching a question directly (counted as a miss).
+
+Metrics:
+- prefetch.depth (gauge): Questions currently buffered.
+- prefetch.refill_rate (gauge): Questions per second produced by the last refill.
+- prefetch.produced / prefetch.hits / prefetch.misses (counters)
+- prefetch.failures (counter): Refill runs that failed and were retried after a delay.
+- prefetch.refill_seconds (timing): Duration of each refill run.
+
+Environment Variables:
+- PREFETCH_LOW_WATERMARK: Refill is triggered at or below this depth. Defaults to 10.
+- PREFETCH_HIGH_WATERMARK: Buffer capacity. Defaults to 50, 0 disables prefetching.
+- PREFETCH_RETRY_DELAY: Seconds to wait after a failed refill. Defaults to 5.
+"""
+import asyncio
+import os
+import time
+from collections import deque
+from fastapi import HTTPException
+from app.models.quiz_info import QuizInfo
+from app.services.pokemon_service import fetch_pokemon_async
+from app.util import metrics
+from app.util.logger import Logger
+
+QUEUE = deque()
+_REFILL_EVENT = None
+_PRODUCER = None
+
+
+def get_watermarks() -> tuple[int, int]:
+    """Returns the configured low and high watermark of the buffer.
+
+    Returns:
+        tuple[int, int]: (low, high)
+    """
+    high = int(os.getenv("PREFETCH_HIGH_WATERMARK", "50"))
+    low = min(int(os.getenv("PREFETCH_LOW_WATERMARK", "10")), high)
+    return low, high
+
+
+def pop_question() -> QuizInfo | None:
+    """Take a ready question from the buffer in O(1).
+
+    Wakes up the producer if the buffer dropped to the low watermark.
+
+    Returns:
+        QuizInfo | None: A prefetched question, or None if the buffer is empty.
+    """
+    try:
+        question = QUEUE.popleft()
+        metrics.increment("prefetch.hits")
+    except IndexError:
+        question = None
+        metrics.increment("prefetch.misses")
+    metrics.set_gauge("prefetch.depth", len(QUEUE))
+
+    low, _ = get_watermarks()
+    if _REFILL_EVENT is not None and len(QUEUE) <= low:
+        _REFILL_EVENT.set()
+    return question
+
+
+async def next_question(logger: Logger) -> QuizInfo:
+    """Returns the next quiz question, preferring the prefetch buffer.
+
+    Args:
+        logger (Logger): Custom application logger, used for the direct fetch.
+
+    Returns:
+        QuizInfo: A question ready to be stored in the session.
+    """
+    question = pop_question()
+    if question is None:
+        question = await fetch_pokemon_async(logger)
+    return question
+
+
+async def refill(logger: Logger) -> int:
+    """Fill the buffer up to the high watermark.
+
+    Args:
+        logger (Logger): Custom application logger.
+
+    Returns:
+        int: Number of questions added.
+    """
+    _, high = get_watermarks()
+    start = time.perf_counter()
+    added = 0
+    while len(QUEUE) < high:
+        QUEUE.append(await fetch_pokemon_async(logger))
+        added += 1
+        metrics.increment("prefetch.produced")
+        metrics.set_gauge("prefetch.depth", len(QUEUE))
+    if added:
+        elapsed = time.perf_counter() - start
+        metrics.observe("prefetch.refill_seconds", elapsed)
+        metrics.set_gauge("prefetch.refill_rate", added / elapsed if elapsed else added)
+    return added
+
+
+async def _run_producer(logger: Logger):
+    """Producer loop: refill, then sleep until the buffer hits the low watermark again."""
+    delay = float(os.getenv("PREFETCH_RETRY_DELAY", "5"))
+    while True:
+        try:
+            await refill(logger)
+        except asyncio.CancelledError:
+            raise
+        except HTTPException as e:
+            metrics.increment("prefetch.failures")
+            logger.warn(f"Prefetch refill failed: {e.detail}")
+            await asyncio.sleep(delay)
+            continue
+        except Exception as e:
+            # Cache, Redis or payload errors must not end the producer for good.
+            metrics.increment("prefetch.failures")
+            logger.error(f"Prefetch refill failed unexpectedly: {e!r}")
+            await asyncio.sleep(delay)
+            continue
+        _REFILL_EVENT.clear()
+        await _REFILL_EVENT.wait()
+
+
+def start_prefetcher(logger: Logger):
+    """Start the background producer. Must be called from within the running event loop.
+
+    Args:
+        logger (Logger): Custom application logger.
+    """
+    global _REFILL_EVENT, _PRODUCER
+    _, high = get_watermarks()
+    if high <= 0 or _PRODUCER is not None:
+        return
+    _REFILL_EVENT = asyncio.Event()
+    _PRODUCER = asyncio.create_task(_run_producer(logger))
+    logger.info(f"Question prefetching started (capacity {high}).")
+
+
+async def stop_prefetcher():
+    """Stop the background producer and drop all buffered questions."""
+    global _REFILL_EVENT, _PRODUCER
+    if _PRODUCER is not None:
+        _PRODUCER.cancel()
+        try:
+            await _PRODUCER
+        except asyncio.CancelledError:
+            pass
+    _PRODUCER = None
+    _REFILL_EVENT = None
+    QUEUE.clear()
+    metrics.set_gauge("prefetch.depth", 0)
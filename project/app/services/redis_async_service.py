@@ -0,0 +1,333 @@
+"""Asynchronous Redis Service. The same quiz session store as redis_service, built on
+redis.asyncio, so the routers can talk to Redis without blocking the event loop.
+
+The session layout (a hash per session), the session modes and the guess script are
+defined in redis_service; this module performs the I/O. All calls share one client backed
+by a blocking connection pool, which is created in the application lifespan and closed on
+shutdown. The client belongs to the event loop it was created in; called from another
+loop (e.g. by test clients that run each request in a new loop), the old client is closed
+and a new one is created.
+
+Metrics:
+- redis_async_pool.in_use (gauge): Connections currently checked out.
+- redis_async_pool.wait_seconds (timing): Time spent waiting for a connection.
+
+Environment Variables:
+- REDIS_HOST, REDIS_PORT, REDIS_MAX_CONNECTIONS, REDIS_POOL_TIMEOUT, REDIS_SOCKET_TIMEOUT,
+  REDIS_HEALTH_CHECK_INTERVAL, QUIZ_SESSION_MODE: See redis_service.
+"""
+import asyncio
+import os
+import socket
+import time
+import redis
+import redis.asyncio as aioredis
+from app.services.pokedex_service import find_pokemon_id
+from app.services.redis_service import (
+    GUESS_LUA, SESSION_TTL, session_key, queue_state_write, legacy_state, decode_field,
+    state_from_hash)
+from app.util import metrics
+from app.util.logger import get_logger
+
+logger = get_logger("Redis-Async")
+
+CLIENT = None
+CLIENT_LOOP = None
+GUESS_SCRIPT = None
+
+
+class InstrumentedConnectionPool(aioredis.BlockingConnectionPool):
+    """Blocking asyncio connection pool that records utilization and wait time."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._in_use = 0
+
+    def _update_in_use(self, delta: int):
+        self._in_use += delta
+        metrics.set_gauge("redis_async_pool.in_use", self._in_use)
+
+    async def get_connection(self, *args, **kwargs):
+        start = time.perf_counter()
+        connection = await super().get_connection(*args, **kwargs)
+        metrics.observe("redis_async_pool.wait_seconds", time.perf_counter() - start)
+        self._update_in_use(1)
+        return connection
+
+    async def release(self, connection):
+        await super().release(connection)
+        self._update_in_use(-1)
+
+    def shutdown_sockets(self):
+        """Shut down the sockets of all connections and forget them, without an event loop.
+
+        For pools whose event loop has been closed, where disconnect() cannot run any more.
+        The file descriptors are released when their transports are garbage collected.
+        """
+        for connection in (*self._available_connections, *self._in_use_connections):
+            writer, connection._writer, connection._reader = connection._writer, None, None
+            sock = writer.get_extra_info("socket") if writer is not None else None
+            if sock is not None:
+                try:
+                    sock.shutdown(socket.SHUT_RDWR)
+                except OSError:
+                    pass
+        self.reset()
+
+
+def create_redis_client():
+    """Returns an asyncio redis client to connect to a redis container.
+
+    Returns:
+        redis.asyncio.Redis: Redis connector
+    """
+    host = os.getenv("REDIS_HOST", "redis")
+    port = int(os.getenv("REDIS_PORT", 6379))
+    socket_timeout = float(os.getenv("REDIS_SOCKET_TIMEOUT", "5"))
+    logger.info(f"Connecting to Redis at {host}:{port}")
+    pool = InstrumentedConnectionPool(
+        host=host,
+        port=port,
+        db=0,
+        decode_responses=False,
+        max_connections=int(os.getenv("REDIS_MAX_CONNECTIONS", "50")),
+        timeout=float(os.getenv("REDIS_POOL_TIMEOUT", "5")),
+        socket_timeout=socket_timeout,
+        socket_connect_timeout=socket_timeout,
+        health_check_interval=int(os.getenv("REDIS_HEALTH_CHECK_INTERVAL", "30"))
+    )
+    return aioredis.Redis(connection_pool=pool)
+
+
+def get_redis_client():
+    """Returns the shared asyncio redis client, creating it on first use.
+
+    Returns:
+        redis.asyncio.Redis: Redis client
+    """
+    global CLIENT, CLIENT_LOOP
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        loop = None
+    if CLIENT is None or (loop is not None and CLIENT_LOOP is not loop):
+        if CLIENT is not None:
+            _close_stale_client(CLIENT, CLIENT_LOOP)
+        CLIENT = create_redis_client()
+        CLIENT_LOOP = loop
+    return CLIENT
+
+
+async def _close_client(client):
+    await client.aclose()
+    await client.connection_pool.disconnect()
+
+
+def _close_stale_client(client, loop):
+    """Close a client that belongs to an event loop other than the current one.
+
+    If that loop still runs (in another thread), the client is closed there. Otherwise
+    its connections cannot be closed through the loop any more and are shut down directly.
+    """
+    if loop is not None and loop.is_running():
+        asyncio.run_coroutine_threadsafe(_close_client(client), loop)
+    else:
+        client.connection_pool.shutdown_sockets()
+
+
+async def close_redis_client():
+    """Close the shared client and disconnect all pooled connections."""
+    global CLIENT
+    if CLIENT is not None:
+        await _close_client(CLIENT)
+        CLIENT = None
+
+
+async def is_redis_healthy(retries=5, delay=1):
+    """Redis health Check, see redis_service.is_redis_healthy.
+
+    Args:
+        retries (int, optional): Number of retries. Defaults to 5.
+        delay (int, optional): Delay between each retry. Defaults to 1.
+
+    Returns:
+        bool: Returns True if the Health Check was successfull. False otherwise
+    """
+    client = get_redis_client()
+    for _ in range(retries):
+        try:
+            await client.ping()
+            return True
+        except (redis.exceptions.ConnectionError, redis.exceptions.TimeoutError) as e:
+            logger.warning(f"Redis not reachable: {e}")
+            await asyncio.sleep(delay)
+    return False
+
+
+async def _write_state(client, key: str, state: dict):
+    """Write the question (and the score, if given) of a state in one transaction."""
+    pipe = client.pipeline()
+    queue_state_write(pipe, key, state)
+    await pipe.execute()
+
+
+async def _migrate_legacy_state(client, key: str):
+    """Convert a session stored as a single string by an older version into a hash.
+
+    The string is read under WATCH and replaced in one transaction, so concurrent requests
+    of the session never see it missing; if one of them changed the key in between, the
+    conversion starts over (and finds nothing left to convert).
+    """
+    async with client.pipeline() as pipe:
+        while True:
+            try:
+                await pipe.watch(key)
+                if await pipe.type(key) != b"string":
+                    return
+                state = legacy_state(await pipe.get(key))
+                pipe.multi()
+                pipe.delete(key)
+                if state is not None:
+                    queue_state_write(pipe, key, state)
+                await pipe.execute()
+                return
+            except redis.exceptions.WatchError:
+                continue
+
+
+async def _hash_call(client, key: str, func):
+    """Await func(), converting a legacy string session into a hash first if needed."""
+    try:
+        return await func()
+    except redis.exceptions.ResponseError as e:
+        if "WRONGTYPE" not in str(e):
+            raise
+    await _migrate_legacy_state(client, key)
+    return await func()
+
+
+async def get_state(client_id: str, fields=None):
+    """Retrieve the current quiz state for a given client from Redis.
+
+    Args:
+        client_id (str): The unique identifier for the client.
+        fields (Iterable[str], optional): Only fetch these hash fields (e.g. ("score",)).
+            Defaults to the full state.
+
+    Returns:
+        dict | None: The quiz state as a dictionary if present, otherwise None. With fields,
+            a dictionary of the requested fields (None for missing ones).
+    """
+    client = get_redis_client()
+    key = session_key(client_id)
+    if fields:
+        fields = list(fields)
+        values = await _hash_call(client, key, lambda: client.hmget(key, fields))
+        if all(value is None for value in values):
+            return None
+        return {name: decode_field(name, value) for name, value in zip(fields, values)}
+    stored = await _hash_call(client, key, lambda: client.hgetall(key))
+    if not stored:
+        return None
+    return state_from_hash({name.decode(): value for name, value in stored.items()})
+
+
+async def set_state(client_id: str, pokemon: dict):
+    """Set or update the current quiz state for a given client in Redis.
+
+    The question fields are replaced. The score is only written if the state contains
+    one, so storing the next question keeps the current score.
+
+    Args:
+        client_id (str): The unique identifier for the client.
+        pokemon (dict): The current quiz data to store.
+    """
+    client = get_redis_client()
+    key = session_key(client_id)
+    await _hash_call(client, key, lambda: _write_state(client, key, pokemon))
+
+
+async def evaluate_guess(client_id: str, guess: str, points: int = 25):
+    """Check a guess against the stored answer and award points, atomically on the server.
+
+    The script is sent once and then called via EVALSHA.
+
+    Args:
+        client_id (str): The unique identifier for the client.
+        guess (str): The user's guess.
+        points (int, optional): Points for a correct guess. Defaults to 25.
+
+    Returns:
+        tuple[bool, int] | None: (correct, new score), or None if the client has no quiz state.
+    """
+    global GUESS_SCRIPT
+    client = get_redis_client()
+    if GUESS_SCRIPT is None or GUESS_SCRIPT.registered_client is not client:
+        GUESS_SCRIPT = client.register_script(GUESS_LUA)
+    guess = guess.strip().lower()
+    result = await GUESS_SCRIPT(keys=[session_key(client_id)],
+                                args=[guess, find_pokemon_id(guess) or 0, points, SESSION_TTL])
+    if result is None:
+        return None
+    return bool(result[0]), int(result[1])
+
+
+async def clear_state(client_id: str):
+    """Clear the quiz state for a given client from Redis.
+
+    Args:
+        client_id (str): The unique identifier for the client.
+    """
+    await get_redis_client().delete(session_key(client_id))
+
+
+async def get_score(session_id: str) -> int:
+    """Retrieve the current score for a given session from Redis.
+
+    Args:
+        session_id (str): The unique identifier for the session.
+
+    Returns:
+        int: The score value, or 0 if not found.
+    """
+    state = await get_state(session_id, ("score",))
+    return state["score"] or 0 if state else 0
+
+
+async def increment_score(session_id: str, value: int = 25) -> int:
+    """Increment the score for a given session in Redis.
+
+    Args:
+        session_id (str): The unique identifier for the session.
+        value (int, optional): Amount to increment the score by. Defaults to 25.
+
+    Returns:
+        int: The new score.
+    """
+    client = get_redis_client()
+    key = session_key(session_id)
+
+    async def increment():
+        pipe = client.pipeline()
+        pipe.hincrby(key, "score", value)
+        pipe.expire(key, SESSION_TTL)
+        return (await pipe.execute())[0]
+
+    return await _hash_call(client, key, increment)
+
+
+async def reset_score(session_id: str) -> bool:
+    """Reset the quiz score for a given session in Redis.
+
+    Args:
+        session_id (str): The unique identifier for the session.
+
+    Returns:
+        bool: True if the session exists, False otherwise.
+    """
+    client = get_redis_client()
+    key = session_key(session_id)
+    if not await client.exists(key):
+        return False
+    await _hash_call(client, key, lambda: client.hset(key, "score", 0))
+    return True
@@ -1,14 +1,154 @@
 """Redis Service. The connector to everything Redis-related. in this case Redis is used as a temp storage for 
-questions and user scores during their partitipation in a quiz
+questions and user scores during their partitipation in a quiz.
+
+Each quiz session is a hash "quiz:{session_id}" with the fields
+- question: The question in the compact binary encoding of app.models.quiz_info.
+- answer: The lowercase name of the Pokémon.
+- pokemon_id / entry_index: Reference into the Pokédex snapshot (minimal mode).
+- score: The current score, changed with HINCRBY.
+The question fields are written once per question; score-only operations touch only the
+score field. Reads can fetch just the fields a caller needs. Sessions stored as a
+single string by older versions are still read and converted on the next write.
+
+All calls share one client backed by a blocking connection pool. It is created on first
+use (or in the application lifespan) and closed again on shutdown. When every connection
+is in use, callers wait up to REDIS_POOL_TIMEOUT seconds for one to be released.
+
+In the "minimal" session mode only the Pokémon id and the index of the flavor text are
+stored for questions built from the Pokédex snapshot. Reads rehydrate the
+full question from the in-process snapshot. Questions that are not in the snapshot are
+stored in full.
+
+Guesses are evaluated atomically by a Lua script (GUESS_LUA): comparing the answer,
+adding the points and refreshing the TTL happen in a single round trip on the server,
+so concurrent submissions cannot overwrite each other's score.
+
+The session operations themselves (get_state, set_state, evaluate_guess, ...) live in
+redis_async_service and are built on the helpers of this module. The synchronous client
+here is used by the health check on startup and by synchronous callers such as
+database_service.
+
+Metrics:
+- redis_pool.in_use (gauge): Connections currently checked out.
+- redis_pool.wait_seconds (timing): Time spent waiting for a connection.
+
+Environment Variables:
+- REDIS_HOST: Hostname of the Redis server. Defaults to "redis".
+- REDIS_PORT: Port of the Redis server. Defaults to 6379.
+- REDIS_MAX_CONNECTIONS: Size of the connection pool. Defaults to 50.
+- REDIS_POOL_TIMEOUT: Seconds to wait for a free connection. Defaults to 5.
+- REDIS_SOCKET_TIMEOUT: Socket connect/read timeout in seconds. Defaults to 5.
+- REDIS_HEALTH_CHECK_INTERVAL: Seconds after which idle connections are pinged. Defaults to 30.
+- QUIZ_SESSION_MODE: "full" (default) or "minimal".
 """
-import json
 import os
+import threading
 import time
 import redis
+from app.models.quiz_info import encode_state, decode_state
+from app.services.pokedex_service import get_snapshot
+from app.services.pokemon_service import quiz_info_from_snapshot
+from app.util import metrics
 from app.util.logger import get_logger
 
 logger = get_logger("Redis")
 
+CLIENT = None
+SESSION_TTL = 1800
+QUESTION_FIELDS = ("question", "answer", "pokemon_id", "entry_index")
+
+# KEYS[1]: session key. ARGV: normalized guess, Pokémon id of the guess (0 if unknown),
+# points for a correct guess, session TTL.
+# Returns nil if there is no session, otherwise {correct (0/1), score}.
+GUESS_LUA = """
+local kind = redis.call('TYPE', KEYS[1])['ok']
+if kind == 'none' then
+    return false
+end
+local guess, guess_id = ARGV[1], tonumber(ARGV[2])
+local points, ttl = tonumber(ARGV[3]), ARGV[4]
+local correct, score
+if kind == 'hash' then
+    local answer = redis.call('HMGET', KEYS[1], 'answer', 'pokemon_id')
+    if not answer[1] and not answer[2] then
+        return false
+    end
+    if answer[1] then
+        correct = answer[1] == guess
+    else
+        correct = tonumber(answer[2]) == guess_id
+    end
+    if correct then
+        score = redis.call('HINCRBY', KEYS[1], 'score', points)
+    else
+        score = tonumber(redis.call('HGET', KEYS[1], 'score')) or 0
+    end
+    redis.call('EXPIRE', KEYS[1], ttl)
+    return {correct and 1 or 0, score}
+end
+-- sessions stored as a single string by older versions
+local blob = redis.call('GET', KEYS[1])
+if string.sub(blob, 1, 1) == '{' then
+    local state = cjson.decode(blob)
+    correct = type(state['name']) == 'string' and string.lower(state['name']) == guess
+    score = tonumber(state['score']) or 0
+    if correct then
+        score = score + points
+        state['score'] = score
+        blob = cjson.encode(state)
+    end
+else
+    local state = cmsgpack.unpack(blob)
+    local score_index
+    if state[1] == 1 then
+        correct = string.lower(state[2]) == guess
+        score_index = 9
+    elseif state[1] == 2 then
+        correct = state[2] == guess_id
+        score_index = 4
+    else
+        return redis.error_reply('unknown quiz state version')
+    end
+    score = state[score_index]
+    if correct then
+        score = score + points
+        state[score_index] = score
+        blob = cmsgpack.pack(state)
+    end
+end
+if correct then
+    redis.call('SET', KEYS[1], blob, 'EX', ttl)
+else
+    redis.call('EXPIRE', KEYS[1], ttl)
+end
+return {correct and 1 or 0, score}
+"""
+
+
+class InstrumentedConnectionPool(redis.BlockingConnectionPool):
+    """Blocking connection pool that records utilization and wait time."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._in_use = 0
+        self._in_use_lock = threading.Lock()
+
+    def _update_in_use(self, delta: int):
+        with self._in_use_lock:
+            self._in_use += delta
+            metrics.set_gauge("redis_pool.in_use", self._in_use)
+
+    def get_connection(self, *args, **kwargs):
+        start = time.perf_counter()
+        connection = super().get_connection(*args, **kwargs)
+        metrics.observe("redis_pool.wait_seconds", time.perf_counter() - start)
+        self._update_in_use(1)
+        return connection
+
+    def release(self, connection):
+        super().release(connection)
+        self._update_in_use(-1)
+
 
 def create_redis_client():
     """Returns a redis client to connect to a redis container.
@@ -18,22 +158,41 @@ def create_redis_client():
     """
     host = os.getenv("REDIS_HOST", "redis")
     port = int(os.getenv("REDIS_PORT", 6379))
+    socket_timeout = float(os.getenv("REDIS_SOCKET_TIMEOUT", "5"))
     logger.info(f"Connecting to Redis at {host}:{port}")
-    return redis.Redis(
+    pool = InstrumentedConnectionPool(
         host=host,
         port=port,
         db=0,
-        decode_responses=True
+        decode_responses=False,
+        max_connections=int(os.getenv("REDIS_MAX_CONNECTIONS", "50")),
+        timeout=float(os.getenv("REDIS_POOL_TIMEOUT", "5")),
+        socket_timeout=socket_timeout,
+        socket_connect_timeout=socket_timeout,
+        health_check_interval=int(os.getenv("REDIS_HEALTH_CHECK_INTERVAL", "30"))
     )
+    return redis.Redis(connection_pool=pool)
 
 
 def get_redis_client():
-    """ Returns a redis client. a wrapper function to build lazy initalization
+    """ Returns the shared redis client. a wrapper function to build lazy initalization
 
     Returns:
         Redis: Redis client
     """
-    return create_redis_client()
+    global CLIENT
+    if CLIENT is None:
+        CLIENT = create_redis_client()
+    return CLIENT
+
+
+def close_redis_client():
+    """Close the shared client and disconnect all pooled connections."""
+    global CLIENT
+    if CLIENT is not None:
+        CLIENT.close()
+        CLIENT.connection_pool.disconnect()
+        CLIENT = None
 
 
 def is_redis_healthy(retries=5, delay=1):
@@ -52,13 +211,13 @@ def is_redis_healthy(retries=5, delay=1):
         try:
             client.ping()
             return True
-        except redis.exceptions.ConnectionError as e:
+        except (redis.exceptions.ConnectionError, redis.exceptions.TimeoutError) as e:
             logger.warning(f"Redis not reachable: {e}")
             time.sleep(delay)
     return False
 
 
-def _key(client_id: str) -> str:
+def session_key(client_id: str) -> str:
     """Generate the Redis key for storing quiz state for a specific client.
 
     Args:
@@ -70,84 +229,104 @@ def _key(client_id: str) -> str:
     return f"quiz:{client_id}"
 
 
-def get_state(client_id: str):
-    """Retrieve the current quiz state for a given client from Redis.
+def get_session_mode() -> str:
+    """Returns the configured session mode ("full" or "minimal")."""
+    return os.getenv("QUIZ_SESSION_MODE", "full")
 
-    Args:
-        client_id (str): The unique identifier for the client.
-
-    Returns:
-        dict | None: The quiz state as a dictionary if present, otherwise None.
-    """
-    client = get_redis_client()
-    state = client.get(_key(client_id))
-    return json.loads(state) if state else None
 
+def question_fields(state: dict) -> dict:
+    """Hash fields describing the question of a state, referencing the snapshot where possible."""
+    if get_session_mode() == "minimal" and state.get("entry_index") is not None:
+        snapshot = get_snapshot()
+        if snapshot and state.get("pokemon_id") in snapshot:
+            return {"pokemon_id": state["pokemon_id"], "entry_index": state["entry_index"]}
+    fields = {
+        "question": encode_state(state),
+        "answer": state["name"].lower() if state.get("name") else None,
+        "pokemon_id": state.get("pokemon_id")
+    }
+    return {name: value for name, value in fields.items() if value is not None}
 
-def set_state(client_id: str, pokemon: dict):
-    """Set or update the current quiz state for a given client in Redis.
-
-    Args:
-        client_id (str): The unique identifier for the client.
-        pokemon (dict): The current quiz data to store.
-    """
-    client = get_redis_client()
-    client.setex(_key(client_id), 1800, json.dumps(pokemon))
 
+def queue_state_write(pipe, key: str, state: dict):
+    """Queue the writes of the question (and the score, if given) of a state on a pipeline.
 
-def clear_state(client_id: str):
-    """Clear the quiz state for a given client from Redis.
+    Works with synchronous and asyncio pipelines alike; the caller executes it.
 
     Args:
-        client_id (str): The unique identifier for the client.
+        pipe: The pipeline (a transaction).
+        key (str): The session key.
+        state (dict): The quiz state.
     """
-    client = get_redis_client()
-    client.delete(_key(client_id))
+    question = question_fields(state)
+    stale = [name for name in QUESTION_FIELDS if name not in question]
+    if stale:
+        pipe.hdel(key, *stale)
+    pipe.hset(key, mapping=question)
+    if "score" in state:
+        pipe.hset(key, "score", state["score"])
+    else:
+        pipe.hsetnx(key, "score", 0)
+    pipe.expire(key, SESSION_TTL)
 
 
-def _score_key(session_id: str) -> str:
-    """Generate the Redis key for storing quiz score for a specific session.
+def rehydrate(pokemon_id: int, entry_index: int):
+    """Rebuild the question of a minimal state from the Pokédex snapshot.
 
     Args:
-        session_id (str): The unique identifier for the session.
+        pokemon_id (int): The Pokémon of the question.
+        entry_index (int): Index of the flavor text in the snapshot entry.
 
     Returns:
-        str: The Redis key used to store the quiz score.
+        dict | None: The question, or None if the snapshot no longer has it.
     """
-    return f"quiz:{session_id}:score"
+    snapshot = get_snapshot()
+    entry = snapshot.get(pokemon_id) if snapshot else None
+    if entry is None or not 0 <= entry_index < len(entry.entries):
+        logger.warn(f"Cannot rehydrate question of Pokémon {pokemon_id}.")
+        return None
+    return quiz_info_from_snapshot(entry, entry_index).to_dict()
 
 
-def get_score(session_id: str) -> int:
-    """Retrieve the current score for a given session from Redis.
+def legacy_state(blob: bytes):
+    """Decode a session stored as a single string by an older version.
 
     Args:
-        session_id (str): The unique identifier for the session.
+        blob (bytes): The stored string, may be empty.
 
     Returns:
-        int: The score value, or 0 if not found.
-    """
-    client = get_redis_client()
-    score = client.get(_score_key(session_id))
-    return int(score) if score else 0
-
-
-def increment_score(session_id: str, value: int = 25):
-    """Increment the score for a given session in Redis.
-
-    Args:
-        session_id (str): The unique identifier for the session.
-        value (int, optional): Amount to increment the score by. Defaults to 25.
+        dict | None: The full quiz state, or None if there is none or it cannot be rehydrated.
     """
-    client = get_redis_client()
-    client.incrby(_score_key(session_id), value)
-    client.expire(_score_key(session_id), 1800)
-
-
-def reset_score(session_id: str):
-    """Reset the quiz score for a given session in Redis.
-
-    Args:
-        session_id (str): The unique identifier for the session.
-    """
-    client = get_redis_client()
-    client.delete(_score_key(session_id))
+    if not blob:
+        return None
+    state = decode_state(blob)
+    if "name" not in state:
+        question = rehydrate(state["pokemon_id"], state["entry_index"])
+        if question is None:
+            return None
+        state = dict(question, score=state["score"])
+    return state
+
+
+def decode_field(name: str, value: bytes):
+    """Convert a raw hash field into its Python value."""
+    if value is None:
+        return None
+    if name == "question":
+        return decode_state(value)
+    if name == "answer":
+        return value.decode()
+    return int(value)
+
+
+def state_from_hash(fields: dict):
+    """Build the full quiz state from all fields of a session hash."""
+    if "question" in fields:
+        state = decode_state(fields["question"])
+    elif "entry_index" in fields:
+        state = rehydrate(int(fields["pokemon_id"]), int(fields["entry_index"]))
+    else:
+        return None
+    if state is not None:
+        state["score"] = int(fields.get("score", 0))
+    return state
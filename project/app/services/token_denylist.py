@@ -0,0 +1,90 @@
+"""
+token_denylist.py
+
+Redis deny-list of revoked JWTs. Access tokens carry the claims of their user, so they are
+accepted without a database lookup; revocation is checked here instead, with one MGET
+per request.
+
+Two kinds of entries are kept, both expiring once the tokens they cover have expired:
+- Single tokens (logout), by their token id (jti).
+- All tokens of a user issued up to a point in time (deleted users), by username. Tokens
+  whose iat is not later than that point are revoked.
+
+Keys:
+- auth:denied:<jti>: Set for a revoked token, expires with the token.
+- auth:denied-user:<username>: Time of the revocation (seconds since the epoch), expires
+  after the refresh token lifetime.
+
+Metrics:
+- token_denylist.revoked_tokens / token_denylist.revoked_users (counters): Entries added.
+"""
+import time
+from app.services import redis_service
+from app.services.redis_async_service import get_redis_client
+from app.util import metrics
+from app.util.logger import get_logger
+
+logger = get_logger("Token-Denylist")
+
+USER_REVOCATION_TTL = 7 * 24 * 60 * 60  # refresh token lifetime
+
+
+def _token_key(jti: str) -> str:
+    return f"auth:denied:{jti}"
+
+
+def _user_key(username: str) -> str:
+    return f"auth:denied-user:{username.lower()}"
+
+
+async def revoke_token(jti: str, expires_at: float):
+    """Revoke a single token until it expires.
+
+    Args:
+        jti (str): Id of the token.
+        expires_at (float): Its exp claim (seconds since the epoch).
+    """
+    ttl = int(expires_at - time.time()) + 1
+    if ttl > 0:
+        await get_redis_client().set(_token_key(jti), 1, ex=ttl)
+        metrics.increment("token_denylist.revoked_tokens")
+
+
+async def revoke_user(username: str):
+    """Revoke all tokens issued to a user so far.
+
+    Args:
+        username (str): The user.
+    """
+    await get_redis_client().set(_user_key(username), repr(time.time()), ex=USER_REVOCATION_TTL)
+    metrics.increment("token_denylist.revoked_users")
+
+
+def revoke_user_sync(username: str):
+    """revoke_user for synchronous callers (database_service).
+
+    Args:
+        username (str): The user.
+    """
+    redis_service.get_redis_client().set(
+        _user_key(username), repr(time.time()), ex=USER_REVOCATION_TTL)
+    metrics.increment("token_denylist.revoked_users")
+
+
+async def is_revoked(payload: dict) -> bool:
+    """Check whether a decoded token has been revoked.
+
+    Args:
+        payload (dict): The claims of the token (sub, and jti and iat if present).
+
+    Raises:
+        RedisError: If the deny-list cannot be read.
+
+    Returns:
+        bool: True if the token or all tokens of its user were revoked.
+    """
+    token_entry, user_entry = await get_redis_client().mget(
+        _token_key(payload.get("jti", "")), _user_key(payload["sub"]))
+    if token_entry is not None:
+        return True
+    return user_entry is not None and float(payload.get("iat", 0)) <= float(user_entry)
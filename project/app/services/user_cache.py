@@ -0,0 +1,234 @@
+"""
+user_cache.py
+
+Cache of the users resolved from access tokens. Every authenticated request resolves the
+username of its token to the users row; this cache answers most of these lookups without
+a SELECT. Entries live in an in-process LRU cache with a TTL and can additionally be
+shared between workers through Redis.
+
+Only the id, username and created_at of a user are cached; password hashes stay in the
+database. add_user and delete_user (of both database services) invalidate the entry of
+their username in this process and in Redis. A row read from the database while an
+invalidation happens in this process is not cached. The in-process caches of other workers
+are not notified, they keep an entry for at most USER_CACHE_TTL seconds.
+
+Keys (Redis backend):
+- user:v2:<username>: msgpack [id, username, created_at], expires after USER_CACHE_TTL.
+
+Metrics:
+- user_cache.hits / user_cache.misses (counters): Lookups answered from the cache / left to
+  the database. Hits served from Redis are counted in user_cache.redis_hits as well.
+- user_cache.evictions (counter): Entries dropped because the cache was full.
+- user_cache.size / user_cache.hit_ratio (gauges): Entries in this process / share of hits.
+
+Environment Variables:
+- USER_CACHE_BACKEND: "memory" (in-process only), "redis" (in-process and Redis) or "off".
+  Defaults to "memory".
+- USER_CACHE_TTL: Seconds an entry is kept. Defaults to 60.
+- USER_CACHE_MAX_ENTRIES: Maximum entries of the in-process cache. Defaults to 10000.
+"""
+import datetime
+import os
+import threading
+import time
+from collections import OrderedDict
+import msgpack
+import redis
+from app.services import redis_service
+from app.services.redis_async_service import get_redis_client
+from app.util import metrics
+from app.util.logger import get_logger
+
+logger = get_logger("User-Cache")
+
+CACHE = None
+FIELDS = ("id", "username", "created_at")
+
+
+class UserCache:
+    """LRU-bounded in-process cache with a TTL per entry. Used from the event loop and,
+    through invalidate_sync, from threads, so every access holds a lock.
+
+    Every discard increments the generation. A caller reading a user from the database
+    notes the generation before and passes it to put(), which refuses the row if an
+    invalidation happened in between.
+    """
+
+    def __init__(self, ttl: float, max_entries: int):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # username -> (expires_at, user), most recent last
+        self._lock = threading.Lock()
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, username: str):
+        """Returns the cached user, or None on a miss or an expired entry."""
+        with self._lock:
+            entry = self._entries.get(username)
+            if entry is None:
+                return None
+            if entry[0] <= time.monotonic():
+                del self._entries[username]
+                return None
+            self._entries.move_to_end(username)
+            return entry[1]
+
+    def put(self, username: str, user: dict, generation: int | None = None) -> bool:
+        """Cache a user, evicting the least recently used entries beyond the size cap.
+
+        Returns:
+            bool: False if the entry was refused because the cache was invalidated after
+                the given generation.
+        """
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                return False
+            self._entries[username] = (time.monotonic() + self.ttl, user)
+            self._entries.move_to_end(username)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                metrics.increment("user_cache.evictions")
+            return True
+
+    def discard(self, username: str):
+        """Drop the entry of a username, if any."""
+        with self._lock:
+            self._entries.pop(username, None)
+            self.generation += 1
+
+    def record(self, hit: bool):
+        """Count a lookup and update the size and hit ratio gauges."""
+        with self._lock:
+            if hit:
+                self.hits += 1
+                metrics.increment("user_cache.hits")
+            else:
+                self.misses += 1
+                metrics.increment("user_cache.misses")
+            metrics.set_gauge("user_cache.size", len(self._entries))
+            metrics.set_gauge("user_cache.hit_ratio", self.hits / (self.hits + self.misses))
+
+
+def get_backend() -> str:
+    """Returns the configured backend: "memory", "redis" or "off"."""
+    return os.getenv("USER_CACHE_BACKEND", "memory")
+
+
+def get_cache() -> UserCache:
+    """Returns the in-process cache, creating it on first use."""
+    global CACHE
+    if CACHE is None:
+        CACHE = UserCache(ttl=float(os.getenv("USER_CACHE_TTL", "60")),
+                          max_entries=int(os.getenv("USER_CACHE_MAX_ENTRIES", "10000")))
+    return CACHE
+
+
+def _key(username: str) -> str:
+    return f"user:v2:{username}"
+
+
+def _encode_user(user: dict) -> bytes:
+    return msgpack.packb([user["id"], user["username"], user["created_at"].isoformat()])
+
+
+def _decode_user(blob: bytes) -> dict:
+    user_id, username, created_at = msgpack.unpackb(blob)
+    return {
+        "id": user_id,
+        "username": username,
+        "created_at": datetime.datetime.fromisoformat(created_at)
+    }
+
+
+def cached_fields(user: dict) -> dict:
+    """Returns the part of a users row that is cached (id, username, created_at)."""
+    return {field: user[field] for field in FIELDS}
+
+
+def generation() -> int:
+    """Returns the invalidation generation of the cache, to be passed to put_user by
+    callers reading a user from the database."""
+    return get_cache().generation
+
+
+async def get_user(username: str):
+    """Look up a user in the cache.
+
+    Args:
+        username (str): The username.
+
+    Returns:
+        dict | None: The user (id, username, created_at), or None if the caller has to read
+            it from the database (and should put_user() it afterwards).
+    """
+    backend = get_backend()
+    if backend == "off":
+        return None
+    cache = get_cache()
+    user = cache.get(username)
+    if user is None and backend == "redis":
+        since = cache.generation
+        try:
+            blob = await get_redis_client().get(_key(username))
+        except redis.exceptions.RedisError as e:
+            logger.warn(f"User cache unavailable: {e}")
+            blob = None
+        if blob is not None:
+            user = _decode_user(blob)
+            cache.put(username, user, since)
+            metrics.increment("user_cache.redis_hits")
+    cache.record(user is not None)
+    return user
+
+
+async def put_user(user: dict, since: int | None = None):
+    """Cache a users row read from the database.
+
+    Args:
+        user (dict): The row, with at least id, username and created_at.
+        since (int, optional): generation() before the row was read. If the cache was
+            invalidated since, the row may be stale and is not cached.
+    """
+    backend = get_backend()
+    if backend == "off":
+        return
+    cache = get_cache()
+    user = cached_fields(user)
+    if not cache.put(user["username"], user, since):
+        return
+    if backend == "redis":
+        try:
+            await get_redis_client().set(
+                _key(user["username"]), _encode_user(user), ex=max(1, int(cache.ttl)))
+        except redis.exceptions.RedisError as e:
+            logger.warn(f"Could not cache user {user['username']!r} in Redis: {e}")
+
+
+async def invalidate(username: str):
+    """Drop a user from the cache after it was added or deleted.
+
+    Args:
+        username (str): The username.
+    """
+    get_cache().discard(username)
+    if get_backend() == "redis":
+        try:
+            await get_redis_client().delete(_key(username))
+        except redis.exceptions.RedisError as e:
+            logger.warn(f"Could not invalidate user {username!r} in Redis: {e}")
+
+
+def invalidate_sync(username: str):
+    """invalidate for synchronous callers (database_service).
+
+    Args:
+        username (str): The username.
+    """
+    get_cache().discard(username)
+    if get_backend() == "redis":
+        try:
+            redis_service.get_redis_client().delete(_key(username))
+        except redis.exceptions.RedisError as e:
+            logger.warn(f"Could not invalidate user {username!r} in Redis: {e}")
@@ -0,0 +1,112 @@
+"""Module circuit_breaker: fail fast while an upstream service is down."""
+import time
+from app.util import metrics
+from app.util.logger import get_logger
+
+logger = get_logger("CircuitBreaker")
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling the upstream service while the breaker is open."""
+
+
+class CircuitBreaker:
+    """Classic three-state circuit breaker.
+
+    - closed: calls go through; consecutive failures are counted.
+    - open: after failure_threshold consecutive failures, calls fail immediately
+      with CircuitOpenError for reset_timeout seconds.
+    - half_open: afterwards a single probe call is let through. Success closes the
+      breaker, failure opens it again.
+
+    Metrics (prefixed with the given name):
+    - <name>.state (gauge): "closed", "open" or "half_open".
+    - <name>.transitions.<from>_to_<to> (counter)
+    - <name>.rejected (counter): Calls that failed fast.
+
+    Args:
+        name (str): Prefix of the recorded metrics.
+        failure_threshold (int, optional): Failures that open the breaker. Defaults to 5.
+        reset_timeout (float, optional): Seconds until a probe is allowed. Defaults to 30.
+    """
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, name: str, failure_threshold: int = 5, reset_timeout: float = 30):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = 0.0
+        self._state = self.CLOSED
+        self._probing = False
+        metrics.set_gauge(f"{name}.state", self._state)
+
+    @property
+    def state(self) -> str:
+        """Returns the current state, moving from open to half_open once the timeout passed."""
+        if self._state == self.OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+            self._transition(self.HALF_OPEN)
+        return self._state
+
+    def _transition(self, new_state: str):
+        metrics.increment(f"{self.name}.transitions.{self._state}_to_{new_state}")
+        metrics.set_gauge(f"{self.name}.state", new_state)
+        logger.warn(f"{self.name}: {self._state} -> {new_state}")
+        self._state = new_state
+        self._probing = False
+
+    def allow_request(self) -> bool:
+        """Returns True if a call may be sent upstream right now."""
+        state = self.state
+        if state == self.CLOSED:
+            return True
+        if state == self.HALF_OPEN and not self._probing:
+            self._probing = True
+            return True
+        return False
+
+    def record_success(self):
+        """Report a successful upstream call."""
+        self.failures = 0
+        if self._state != self.CLOSED:
+            self._transition(self.CLOSED)
+
+    def record_failure(self):
+        """Report a failed upstream call."""
+        self.failures += 1
+        if self._state == self.HALF_OPEN or (
+                self._state == self.CLOSED and self.failures >= self.failure_threshold):
+            self.opened_at = time.monotonic()
+            self._transition(self.OPEN)
+
+    async def call(self, func, is_failure=lambda e: True):
+        """Run func() through the breaker.
+
+        Args:
+            func (Callable[[], Awaitable]): Starts the upstream call.
+            is_failure (Callable[[Exception], bool], optional): Decides whether an exception
+                counts as an upstream failure (e.g. a 404 does not). Defaults to all.
+
+        Raises:
+            CircuitOpenError: If the breaker does not allow the call.
+
+        Returns:
+            any: The result of func().
+        """
+        if not self.allow_request():
+            metrics.increment(f"{self.name}.rejected")
+            raise CircuitOpenError(f"{self.name} is {self._state}")
+        try:
+            result = await func()
+        except Exception as e:
+            if is_failure(e):
+                self.record_failure()
+            else:
+                self.record_success()
+            raise
+        finally:
+            self._probing = False
+        self.record_success()
+        return result
@@ -0,0 +1,93 @@
+"""Module metrics: minimal in-process metrics registry.
+
+Services record counters, gauges and timings here; the values are exposed as JSON to
+logged in users via the /api/metrics route. The registry is per process, so every uvicorn
+worker reports its own numbers.
+"""
+import threading
+from collections import defaultdict
+
+_LOCK = threading.Lock()
+_COUNTERS = defaultdict(int)
+_GAUGES = {}
+_TIMINGS = {}
+
+# Upper bounds (in seconds) of the histogram buckets used by observe()
+TIMING_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+
+def increment(name: str, value: int = 1):
+    """Increase a counter.
+
+    Args:
+        name (str): Metric name.
+        value (int, optional): Amount to add. Defaults to 1.
+    """
+    with _LOCK:
+        _COUNTERS[name] += value
+
+
+def set_gauge(name: str, value):
+    """Set a gauge to the given value.
+
+    Args:
+        name (str): Metric name.
+        value (int | float): Current value.
+    """
+    with _LOCK:
+        _GAUGES[name] = value
+
+
+def observe(name: str, seconds: float):
+    """Record a duration into a histogram.
+
+    Args:
+        name (str): Metric name.
+        seconds (float): Measured duration in seconds.
+    """
+    with _LOCK:
+        timing = _TIMINGS.setdefault(
+            name, {"count": 0, "sum": 0.0, "max": 0.0, "buckets": [0] * (len(TIMING_BUCKETS) + 1)})
+        timing["count"] += 1
+        timing["sum"] += seconds
+        timing["max"] = max(timing["max"], seconds)
+        index = next((i for i, bound in enumerate(TIMING_BUCKETS) if seconds <= bound),
+                     len(TIMING_BUCKETS))
+        timing["buckets"][index] += 1
+
+
+def get_counter(name: str) -> int:
+    """Returns the current value of a counter (0 if it was never incremented)."""
+    with _LOCK:
+        return _COUNTERS.get(name, 0)
+
+
+def snapshot() -> dict:
+    """Returns a copy of all recorded metrics.
+
+    Returns:
+        dict: counters, gauges and timings (with bucket bounds as "le" labels).
+    """
+    with _LOCK:
+        labels = [str(bound) for bound in TIMING_BUCKETS] + ["+Inf"]
+        return {
+            "counters": dict(_COUNTERS),
+            "gauges": dict(_GAUGES),
+            "timings": {
+                name: {
+                    "count": t["count"],
+                    "sum": t["sum"],
+                    "max": t["max"],
+                    "buckets": dict(zip(labels, t["buckets"]))
+                }
+                for name, t in _TIMINGS.items()
+            }
+        }
+
+
+def reset():
+    """Clear all metrics. Intended for tests."""
+    with _LOCK:
+        _COUNTERS.clear()
+        _GAUGES.clear()
+        _TIMINGS.clear()
@@ -0,0 +1,65 @@
+"""Module singleflight: coalesces concurrent calls for the same key into one execution."""
+import asyncio
+from app.util import metrics
+
+
+class SingleFlight:
+    """Runs at most one call per key at a time. Callers that arrive while a call for
+    their key is in flight wait for it and receive the same result (or exception). If the
+    caller running the call is cancelled, a waiting caller takes over and runs it again.
+
+    Metrics (prefixed with the given name):
+    - <name>.executed: Calls that actually ran.
+    - <name>.coalesced: Calls that were answered by another caller's in-flight call.
+    - <name>.takeovers: Waiting calls that had to retry because the running call was cancelled.
+
+    Args:
+        name (str): Prefix of the recorded metrics.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._inflight = {}
+
+    def in_flight(self) -> int:
+        """Returns the number of keys currently being fetched."""
+        return len(self._inflight)
+
+    async def do(self, key, func):
+        """Run func() for the given key, or join the call that is already running.
+
+        Args:
+            key (Hashable): Identifies calls that can share a result.
+            func (Callable[[], Awaitable]): Starts the actual call.
+
+        Returns:
+            any: The result of the (shared) call.
+        """
+        while (future := self._inflight.get(key)) is not None:
+            metrics.increment(f"{self.name}.coalesced")
+            try:
+                return await asyncio.shield(future)
+            except asyncio.CancelledError:
+                # Only our own cancellation ends the wait. A cancelled leader makes the
+                # first waiter to get here the new leader, the others join its call.
+                if not future.cancelled() or asyncio.current_task().cancelling():
+                    raise
+                metrics.increment(f"{self.name}.takeovers")
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        metrics.increment(f"{self.name}.executed")
+        try:
+            result = await func()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()  # mark as retrieved if nobody else was waiting
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            del self._inflight[key]
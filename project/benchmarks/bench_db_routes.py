@@ -0,0 +1,107 @@
+"""
+Load benchmark of the database-bound routes: a leaderboard page (GET /api/highscores)
+and logins (POST /api/token).
+
+Both routes hit MySQL on every request. The script reports requests per second and
+latency percentiles per route and concurrency level. Run it once against a build before
+and once after a change to compare them (e.g. synchronous vs. asyncio database access).
+
+Logins are rate limited per username and per client IP (login_throttle), and every
+request of the benchmark comes from the same IP. Start the application with
+LOGIN_RATE_USER=off and LOGIN_RATE_IP=off for the login scenario; a throttled login
+aborts the run.
+
+Usage (from the project directory, with the application running):
+    LOGIN_RATE_USER=off LOGIN_RATE_IP=off python -m app.main
+    python -m benchmarks.bench_db_routes --url http://127.0.0.1:8000 \\
+        --concurrency 1 8 32 64 --requests 2000
+"""
+import argparse
+import asyncio
+import statistics
+import time
+import uuid
+import httpx
+
+PASSWORD = "benchmark-password"
+
+
+async def create_user(client: httpx.AsyncClient) -> tuple[str, dict]:
+    """Register a throwaway user and return its name and login cookies."""
+    username = f"bench_{uuid.uuid4().hex[:12]}"
+    response = await client.post("/api/register", json={"username": username, "password": PASSWORD})
+    response.raise_for_status()
+    response = await client.post("/api/token", data={"username": username, "password": PASSWORD})
+    response.raise_for_status()
+    return username, {"access_token": response.cookies["access_token"]}
+
+
+async def leaderboard(client: httpx.AsyncClient, _username: str, cookies: dict):
+    """One leaderboard page."""
+    response = await client.get("/api/highscores", params={"limit": 10}, cookies=cookies)
+    response.raise_for_status()
+
+
+async def login(client: httpx.AsyncClient, username: str, _cookies: dict):
+    """One login."""
+    response = await client.post("/api/token", data={"username": username, "password": PASSWORD})
+    if response.status_code == 429:
+        raise SystemExit("Login throttled: run the application with "
+                         "LOGIN_RATE_USER=off and LOGIN_RATE_IP=off")
+    response.raise_for_status()
+
+
+SCENARIOS = {"leaderboard": leaderboard, "login": login}
+
+
+async def virtual_user(client, scenario, username, cookies, requests: int, latencies: list):
+    """Run the scenario the given number of times."""
+    for _ in range(requests):
+        start = time.perf_counter()
+        await scenario(client, username, cookies)
+        latencies.append(time.perf_counter() - start)
+
+
+async def run_level(url: str, name: str, concurrency: int, requests: int) -> dict:
+    """Run one scenario at one concurrency level and return its throughput and latency."""
+    latencies = []
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=30) as client:
+        username, cookies = await create_user(client)
+        per_user = max(1, requests // concurrency)
+        start = time.perf_counter()
+        await asyncio.gather(*(virtual_user(client, SCENARIOS[name], username, cookies,
+                                            per_user, latencies)
+                               for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+    latencies.sort()
+    return {
+        "scenario": name,
+        "concurrency": concurrency,
+        "requests": len(latencies),
+        "rps": len(latencies) / elapsed,
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p99_ms": latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Benchmark the database-bound routes.")
+    parser.add_argument("--url", default="http://127.0.0.1:8000", help="Base URL of the app")
+    parser.add_argument("--scenarios", nargs="+", choices=list(SCENARIOS),
+                        default=list(SCENARIOS), help="Routes to benchmark")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32, 64],
+                        help="Concurrency levels to run")
+    parser.add_argument("--requests", type=int, default=2000, help="Requests per level")
+    args = parser.parse_args()
+
+    print(f"{'scenario':>12}{'conc.':>6}{'requests':>10}{'req/s':>10}{'p50 ms':>10}{'p99 ms':>10}")
+    for name in args.scenarios:
+        for concurrency in args.concurrency:
+            result = await run_level(args.url, name, concurrency, args.requests)
+            print(f"{result['scenario']:>12}{result['concurrency']:>6}{result['requests']:>10}"
+                  f"{result['rps']:>10.1f}{result['p50_ms']:>10.2f}{result['p99_ms']:>10.2f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,66 @@
+"""
+Load benchmark of the /api/quiz guess loop.
+
+Every virtual user starts its own quiz session and then keeps posting guesses. The
+script reports requests per second and latency percentiles for each concurrency level.
+Run it once against a build before and once after a change to compare them.
+
+Usage (from the project directory, with the application running):
+    python -m benchmarks.bench_quiz_loop --url http://127.0.0.1:8000 \\
+        --concurrency 1 8 32 64 --requests 2000
+"""
+import argparse
+import asyncio
+import statistics
+import time
+import httpx
+
+
+async def virtual_user(client: httpx.AsyncClient, requests: int, latencies: list):
+    """Start a quiz session and post the given number of guesses."""
+    response = await client.get("/api/start_quiz", follow_redirects=False)
+    cookies = {"quiz_session_id": response.cookies["quiz_session_id"]}
+    for _ in range(requests):
+        start = time.perf_counter()
+        response = await client.post("/api/quiz", data={"guess": "bulbasaur"}, cookies=cookies)
+        response.raise_for_status()
+        latencies.append(time.perf_counter() - start)
+
+
+async def run_level(url: str, concurrency: int, requests: int) -> dict:
+    """Run one concurrency level and return its throughput and latency figures."""
+    latencies = []
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=30) as client:
+        per_user = max(1, requests // concurrency)
+        start = time.perf_counter()
+        await asyncio.gather(*(virtual_user(client, per_user, latencies)
+                               for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+    latencies.sort()
+    return {
+        "concurrency": concurrency,
+        "requests": len(latencies),
+        "rps": len(latencies) / elapsed,
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p99_ms": latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Benchmark the /api/quiz guess loop.")
+    parser.add_argument("--url", default="http://127.0.0.1:8000", help="Base URL of the app")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32, 64],
+                        help="Concurrency levels to run")
+    parser.add_argument("--requests", type=int, default=2000, help="Guesses per level")
+    args = parser.parse_args()
+
+    print(f"{'conc.':>6}{'requests':>10}{'req/s':>10}{'p50 ms':>10}{'p99 ms':>10}")
+    for concurrency in args.concurrency:
+        result = await run_level(args.url, concurrency, args.requests)
+        print(f"{result['concurrency']:>6}{result['requests']:>10}{result['rps']:>10.1f}"
+              f"{result['p50_ms']:>10.2f}{result['p99_ms']:>10.2f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
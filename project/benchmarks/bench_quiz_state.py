@@ -0,0 +1,57 @@
+"""
+Benchmark of the quiz session state encoding.
+
+Compares the JSON state used before with the binary state stored in Redis now:
+bytes per session and time per encode/decode.
+
+Usage (from the project directory):
+    python -m benchmarks.bench_quiz_state [--number 100000]
+"""
+import argparse
+import json
+import timeit
+
+from app.models.quiz_info import QuizInfo, encode_state, decode_state
+
+
+def sample_state() -> dict:
+    """Returns a typical session state (Pokémon of the question plus score)."""
+    state = QuizInfo(
+        name="pikachu",
+        pokemon_id=25,
+        height=4,
+        weight=60,
+        stats={"Hp": 35, "Attack": 55, "Defense": 40,
+               "Special-attack": 50, "Special-defense": 50, "Speed": 90},
+        types=["Electric"],
+        entry="When several of these [Pokémon] gather, their electricity could build "
+              "and cause lightning storms."
+    ).to_dict()
+    state["score"] = 125
+    return state
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark quiz state encodings.")
+    parser.add_argument("--number", type=int, default=100000, help="Iterations per measurement")
+    args = parser.parse_args()
+
+    state = sample_state()
+    json_blob = json.dumps(state).encode()
+    binary_blob = encode_state(state)
+
+    rows = [
+        ("json", json_blob,
+         lambda: json.dumps(state).encode(), lambda: json.loads(json_blob)),
+        ("binary", binary_blob,
+         lambda: encode_state(state), lambda: decode_state(binary_blob)),
+    ]
+    print(f"{'format':<8}{'bytes':>8}{'encode µs':>12}{'decode µs':>12}")
+    for name, blob, encode, decode in rows:
+        encode_us = timeit.timeit(encode, number=args.number) / args.number * 1e6
+        decode_us = timeit.timeit(decode, number=args.number) / args.number * 1e6
+        print(f"{name:<8}{len(blob):>8}{encode_us:>12.2f}{decode_us:>12.2f}")
+
+
+if __name__ == "__main__":
+    main()
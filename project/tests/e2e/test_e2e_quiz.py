@@ -1,9 +1,10 @@
 """Quiz e2e tests"""
+import asyncio
 import pytest
 from unittest.mock import patch, MagicMock
 from fastapi.testclient import TestClient
 from app.models.quiz_info import QuizInfo
-from app.services.redis_service import set_state, get_state, clear_state
+from app.services.redis_async_service import set_state, get_state, clear_state
 
 
 @pytest.fixture
@@ -36,12 +37,12 @@ def mock_sessions():
 def test_wrong_guess(client, test_session_header):
     """Lets test a wrong guess"""
     # Arrange: same setup, but guessing wrong
-    set_state("test-session-1", {
+    asyncio.run(set_state("test-session-1", {
         "name": "Bulbasaur",
         "score": 0,
         "pokemon_id": 1,  # Still Bulbasaur
         "answered": False
-    })
+    }))
 
     response = client.post(
         "/api/quiz", data={"guess": "Charmander"}, headers=test_session_header)
@@ -55,12 +56,12 @@ def test_wrong_guess(client, test_session_header):
 def test_correct_guess(client, test_session_header):
     """Now test a correct guess."""
     # Arrange: simulate state with Bulbasaur as current Pokémon
-    set_state("test-session-1", {
+    asyncio.run(set_state("test-session-1", {
         "name": "Bulbasaur",
         "score": 0,
         "pokemon_id": 1,  # Bulbasaur
         "answered": False
-    })
+    }))
 
     # Act: guessing correctly
     response = client.post(
@@ -76,7 +77,7 @@ def test_correct_guess(client, test_session_header):
 def test_creates_new_session(client, test_session_header):
     """start a new session by starting a new guess"""
     # Arrange: clear any old state
-    clear_state("test-session-1")
+    asyncio.run(clear_state("test-session-1"))
 
     # Act: make a guess without existing state
     response = client.post(
@@ -84,7 +85,7 @@ def test_creates_new_session(client, test_session_header):
 
     # Assert: state should be created
     assert response.status_code == 200
-    state = get_state("test-session-1")
+    state = asyncio.run(get_state("test-session-1"))
     assert state is not None
     assert "score" in state
     assert "pokemon_id" in state
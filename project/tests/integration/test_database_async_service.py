@@ -0,0 +1,98 @@
+"""Integration Tests -> Async database service
+
+Runs the asyncio database service against the testcontainer database.
+"""
+import bcrypt
+import pytest
+import pytest_asyncio
+
+from app.services import database_async_service as db
+from app.services.database_service import (
+    decode_highscore_cursor, get_connection, iter_highscore_batches)
+
+
+@pytest_asyncio.fixture
+async def cnn(mysql_container):
+    """A connection of the asyncio pool, the pool is closed afterwards"""
+    pool = await db.get_pool(mysql_container.get_exposed_port(3306))
+    connection = await pool.acquire()
+    yield connection
+    pool.release(connection)
+    await db.close_pool()
+
+
+@pytest.mark.asyncio
+async def test_user_and_highscores(cnn):
+    """Users and highscores round-trip through the async service"""
+    hashed_pw = bcrypt.hashpw("secret".encode(), bcrypt.gensalt())
+    await db.add_user(cnn, "asyncuser", hashed_pw)
+    with pytest.raises(ValueError, match="Username already exists"):
+        await db.add_user(cnn, "asyncuser", hashed_pw)
+
+    user = await db.get_user(cnn, "asyncuser")
+    assert user["username"] == "asyncuser"
+    assert bcrypt.checkpw("secret".encode(), user["password_hash"].encode())
+
+    for score in (300, 200, 100):
+        inserted = await db.insert_highscore(cnn, user["id"], "asyncuser", score)
+        assert inserted[2] == score
+    assert [h["score"] for h in await db.get_user_highscores(cnn, "asyncuser")] == [300, 200, 100]
+    assert (await db.get_user_rank(cnn, "asyncuser"))["best_score"] == 300
+
+    page, cursor = await db.get_highscores_page(cnn, limit=1)
+    assert len(page) == 1
+    next_page, _ = await db.get_highscores_page(cnn, limit=1, after=decode_highscore_cursor(cursor))
+    assert next_page[0]["id"] != page[0]["id"]
+
+    assert await db.delete_user(cnn, "asyncuser") is True
+    assert await db.get_user(cnn, "asyncuser") is None
+
+
+@pytest.mark.asyncio
+async def test_insert_highscore_matches_stored_row(cnn):
+    """The highscore built by insert_highscore is exactly what was stored"""
+    hashed_pw = bcrypt.hashpw("secret".encode(), bcrypt.gensalt()).decode()
+    await db.add_user(cnn, "insertuser", hashed_pw)
+    user_id = (await db.get_user(cnn, "insertuser"))["id"]
+
+    inserted = await db.insert_highscore(cnn, user_id, "insertuser", 321)
+    stored = await db.get_user_highscores(cnn, "insertuser")
+    assert len(stored) == 1
+    assert (stored[0]["username"], stored[0]["score"], stored[0]["achieved_at"]) == inserted[1:]
+
+    with pytest.raises(ValueError, match="User not found"):
+        await db.insert_highscore(cnn, 10**9, "ghostuser", 321)
+
+    await db.delete_user(cnn, "insertuser")
+
+
+@pytest.mark.asyncio
+async def test_highscore_pages_and_stream(cnn, mysql_container):
+    """Keyset pages cover every highscore exactly once, in the same order as the stream"""
+    hashed_pw = bcrypt.hashpw("secret".encode(), bcrypt.gensalt()).decode()
+    await db.add_user(cnn, "pageuser", hashed_pw)
+    user_id = (await db.get_user(cnn, "pageuser"))["id"]
+    for score in (700, 700, 700, 650, 600):
+        await db.insert_highscore(cnn, user_id, "pageuser", score)
+
+    paged, after = [], None
+    while True:
+        page, cursor = await db.get_highscores_page(cnn, limit=2, after=after)
+        assert len(page) <= 2
+        paged.extend(page)
+        if cursor is None:
+            break
+        after = decode_highscore_cursor(cursor)
+    sync_conn = get_connection(mysql_container.get_exposed_port(3306))
+    streamed = [row for rows in iter_highscore_batches(sync_conn, batch_size=3) for row in rows]
+    sync_conn.close()
+
+    assert [row["id"] for row in paged] == [row["id"] for row in streamed]
+    assert len({row["id"] for row in paged}) == len(paged)
+    keys = [(row["score"], row["id"]) for row in paged]
+    assert keys == sorted(keys, reverse=True)
+    assert [await db.get_highscore_rank(cnn, row["id"]) for row in paged] == \
+        list(range(1, len(paged) + 1))
+    assert await db.get_highscore_rank(cnn, 10**9) is None
+
+    await db.delete_user(cnn, "pageuser")
@@ -8,6 +8,7 @@ import bcrypt
 from testcontainers.mysql import MySqlContainer
 import os
 import time
+import uuid
 import pytest
 import mysql.connector
 from app.services.database_service import *
@@ -105,35 +106,11 @@ async def test_long_username(mysql_container):
 
 # ====== HIGHSCORE
 
-@pytest.mark.asyncio
-async def test_add_and_fetch_highscore(mysql_container):
-    """Test add and fetch highcore"""
-    conn = get_connection(mysql_container.get_exposed_port(3306))
-
-    # Setup: create user
-    hashed_pw = bcrypt.hashpw("secret".encode(), bcrypt.gensalt()).decode()
-    add_user(conn, "highscore_user", hashed_pw)
-
-    # Insert highscore
-    score_data = add_highscore(conn, "highscore_user", 200)
-
-    # score_data is a tuple: (id, username, score, achieved_at)
-    assert score_data[1] == "highscore_user"  # username
-    assert score_data[2] == 200               # score
-
-    delete_user(conn, "highscore_user")
-    conn.close()
-
-
-@pytest.mark.asyncio
-async def test_add_highscore_user_not_found(mysql_container):
-    """Add highscore with unknown user"""
-    conn = get_connection(mysql_container.get_exposed_port(3306))
-
-    with pytest.raises(ValueError, match="User not found"):
-        add_highscore(conn, "ghost_user", 999)
-
-    conn.close()
+def store_highscores(conn, username, *scores):
+    """Store highscores of a user through the write-behind batch insert"""
+    user_id = get_user(conn, username)["id"]
+    insert_highscore_batch(
+        conn, [(uuid.uuid4().hex, user_id, score, new_highscore_time(score)) for score in scores])
 
 
 @pytest.mark.asyncio
@@ -144,8 +121,7 @@ async def test_get_user_highscores(mysql_container):
     hashed_pw = bcrypt.hashpw("secret".encode(), bcrypt.gensalt()).decode()
     add_user(conn, "score_fetcher", hashed_pw)
 
-    add_highscore(conn, "score_fetcher", 50)
-    add_highscore(conn, "score_fetcher", 150)
+    store_highscores(conn, "score_fetcher", 50, 150)
 
     scores = get_user_highscores(conn, "score_fetcher")
     assert len(scores) == 2
@@ -166,8 +142,8 @@ async def test_get_top_highscores(mysql_container):
     add_user(conn, "topuser2", hashed_pw)
 
     # Add highscores
-    add_highscore(conn, "topuser1", 999)
-    add_highscore(conn, "topuser2", 888)
+    store_highscores(conn, "topuser1", 999)
+    store_highscores(conn, "topuser2", 888)
 
     top_scores = get_top_highscores(conn)
     assert any(score["username"] == "topuser1" for score in top_scores)
@@ -178,18 +154,6 @@ async def test_get_top_highscores(mysql_container):
     conn.close()
 
 
-@pytest.mark.asyncio
-async def test_get_highscores_empty(mysql_container):
-    """This test does not make sense"""
-    conn = get_connection(mysql_container.get_exposed_port(3306))
-
-    highscores = get_highscores(conn)
-    assert isinstance(highscores, list)
-    assert len(highscores) == 2
-
-    conn.close()
-
-
 @pytest.mark.asyncio
 async def test_add_user_empty_username(mysql_container):
     """How'bout no username?"""
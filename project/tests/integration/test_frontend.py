@@ -1,5 +1,5 @@
 """Froentend integration tests"""
-from unittest.mock import patch
+from unittest.mock import AsyncMock, patch
 from fastapi.testclient import TestClient
 from app.main import app  # Adjust to your actual FastAPI app entrypoint
 from app.models.quiz_info import QuizInfo
@@ -45,7 +45,7 @@ def test_get_quiz_generates_new_session_and_sets_state(client):
 
     with patch("app.routes.quiz.get_state", return_value=None), \
          patch("app.routes.quiz.set_state") as mock_set_state, \
-         patch("app.routes.quiz.fetch_pokemon", return_value=fake_pokemon):
+         patch("app.routes.quiz.next_question", new_callable=AsyncMock, return_value=fake_pokemon):
 
         response = client.get("/quiz")
         assert response.status_code == 200
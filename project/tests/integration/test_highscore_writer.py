@@ -0,0 +1,73 @@
+"""Write-behind highscore persistence integration tests"""
+from unittest.mock import patch
+import pytest
+import pytest_asyncio
+
+from app.services import highscore_writer
+from app.services.redis_async_service import get_redis_client
+from app.util import metrics
+
+
+def fake_insert(_cnn, rows):
+    """Stores every row except those of user 99 (deleted)"""
+    return {row[0]: index + 100 for index, row in enumerate(rows) if row[1] != 99}
+
+
+@pytest_asyncio.fixture
+async def stream(monkeypatch):
+    """An empty highscore stream with its consumer group"""
+    monkeypatch.setenv("HIGHSCORE_FLUSH_INTERVAL_MS", "50")
+    monkeypatch.setenv("HIGHSCORE_FLUSH_MAX_ROWS", "3")
+    client = get_redis_client()
+    await client.delete(highscore_writer.STREAM_KEY)
+    await highscore_writer.ensure_group(client)
+    with patch("app.services.highscore_writer.get_connection"), \
+            patch("app.services.highscore_writer.insert_highscore_batch", side_effect=fake_insert), \
+            patch("app.services.leaderboard_service.add_entry") as add_entry:
+        yield client, add_entry
+    await client.delete(highscore_writer.STREAM_KEY)
+
+
+@pytest.mark.asyncio
+async def test_batches_are_flushed_and_acknowledged(stream):
+    """Queued highscores are flushed in batches of at most max_rows and leave the stream"""
+    client, add_entry = stream
+    metrics.reset()
+    for user_id in (1, 2, 99, 4):
+        await highscore_writer.enqueue_highscore(user_id, f"user{user_id}", 100)
+
+    batch = await highscore_writer.collect_batch(client, "test")
+    assert len(batch) == 3
+    assert await highscore_writer.flush(client, batch) == 2
+    assert add_entry.call_count == 2
+    assert metrics.get_counter("highscore_writer.dropped") == 1
+
+    batch = await highscore_writer.collect_batch(client, "test")
+    assert len(batch) == 1
+    await highscore_writer.flush(client, batch)
+    assert await client.xlen(highscore_writer.STREAM_KEY) == 0
+    assert await highscore_writer.collect_batch(client, "test") == []
+
+
+@pytest.mark.asyncio
+async def test_unacknowledged_entries_are_claimed(stream, monkeypatch):
+    """Entries of a flusher that died before acknowledging are picked up by another one"""
+    client, _ = stream
+    await highscore_writer.enqueue_highscore(1, "user1", 100)
+    assert len(await highscore_writer.collect_batch(client, "dead")) == 1
+
+    monkeypatch.setattr(highscore_writer, "CLAIM_IDLE_MS", 0)
+    batch = await highscore_writer.collect_batch(client, "alive")
+    assert len(batch) == 1
+    await highscore_writer.flush(client, batch)
+    assert await client.xpending(highscore_writer.STREAM_KEY, highscore_writer.GROUP) \
+        == {"pending": 0, "min": None, "max": None, "consumers": []}
+
+
+@pytest.mark.asyncio
+async def test_zero_score_is_rejected(stream):
+    """Zero scores are not queued"""
+    client, _ = stream
+    with pytest.raises(Exception, match="400"):
+        await highscore_writer.enqueue_highscore(1, "user1", 0)
+    assert await client.xlen(highscore_writer.STREAM_KEY) == 0
@@ -0,0 +1,145 @@
+"""Redis leaderboard integration tests"""
+import asyncio
+import datetime
+import threading
+from unittest.mock import patch
+import pytest
+import pytest_asyncio
+
+from app.services import leaderboard_service
+from app.services.redis_async_service import get_redis_client
+
+ACHIEVED_AT = datetime.datetime(2025, 5, 1, 12, 0)
+ROWS = [(5, "misty", 500, ACHIEVED_AT), (3, "brock", 300, ACHIEVED_AT),
+        (1, "ash", 100, ACHIEVED_AT)]
+BESTS = [("misty", 500), ("brock", 300), ("ash", 100)]
+KEYS = (leaderboard_service.LEADERBOARD_KEY, leaderboard_service.ENTRIES_KEY,
+        leaderboard_service.PLAYERS_KEY, leaderboard_service.READY_KEY,
+        leaderboard_service.REBUILD_KEY, leaderboard_service.REMOVED_KEY,
+        *leaderboard_service.TMP_KEYS)
+
+
+@pytest_asyncio.fixture
+async def leaderboard(monkeypatch):
+    """A leaderboard rebuilt from ROWS"""
+    monkeypatch.setenv("LEADERBOARD_MAX_ENTRIES", "3")
+    client = get_redis_client()
+    await client.delete(*KEYS)
+    with patch("app.services.database_service.get_leaderboard_entries", return_value=ROWS), \
+            patch("app.services.database_service.get_player_bests", return_value=BESTS):
+        await leaderboard_service.rebuild(None)
+    yield client
+    await client.delete(*KEYS)
+
+
+@pytest.mark.asyncio
+async def test_top_and_rank_after_rebuild(leaderboard):
+    """Top-N and ranks are served in score order"""
+    top = await leaderboard_service.get_top(2)
+    assert [entry["username"] for entry in top] == ["misty", "brock"]
+    assert top[0]["achieved_at"] == ACHIEVED_AT
+    assert await leaderboard_service.get_rank(1) == 3
+
+
+@pytest.mark.asyncio
+async def test_add_entry_trims_to_max_entries(leaderboard):
+    """New highscores are ranked and the lowest ones evicted beyond the cap"""
+    await leaderboard_service.add_entry(7, "gary", 400, ACHIEVED_AT)
+    assert await leaderboard_service.get_rank(7) == 2
+    assert await leaderboard_service.get_rank(1) is None
+    assert await leaderboard.hlen(leaderboard_service.ENTRIES_KEY) == 3
+
+
+@pytest.mark.asyncio
+async def test_not_ready_falls_back(leaderboard):
+    """Without a built leaderboard, or beyond its size, readers fall back to MySQL"""
+    assert await leaderboard_service.get_top(10) is None
+    await leaderboard.delete(leaderboard_service.READY_KEY)
+    assert await leaderboard_service.get_top(1) is None
+
+
+@pytest.mark.asyncio
+async def test_player_rank_with_neighbours(leaderboard):
+    """Players are ranked by their best score and see the players around them"""
+    await leaderboard_service.add_entry(8, "ash", 50, ACHIEVED_AT)
+    await leaderboard_service.add_entry(9, "gary", 300, ACHIEVED_AT)
+    result = await leaderboard_service.get_player_rank("ash", around=1)
+    assert result["best_score"] == 100
+    assert result["rank"] == 4
+    assert result["players"] == 4
+    assert [(p["rank"], p["username"]) for p in result["neighbours"]] == [(2, "brock"), (4, "ash")]
+    assert (await leaderboard_service.get_player_rank("gary"))["rank"] == 2
+    assert await leaderboard_service.get_player_rank("oak") is None
+
+
+@pytest.mark.asyncio
+async def test_equal_scores_are_ordered_by_id(leaderboard, monkeypatch):
+    """Ties are ordered by id, newest first, not by the id's string order"""
+    monkeypatch.setenv("LEADERBOARD_MAX_ENTRIES", "10")
+    await leaderboard_service.add_entry(9, "gary", 300, ACHIEVED_AT)
+    await leaderboard_service.add_entry(10, "oak", 300, ACHIEVED_AT)
+    top = await leaderboard_service.get_top(4)
+    assert [entry["username"] for entry in top] == ["misty", "oak", "gary", "brock"]
+    assert await leaderboard_service.get_rank(10) == 2
+
+
+@pytest.mark.asyncio
+async def test_entries_added_during_rebuild_are_kept(leaderboard):
+    """A highscore added while the rebuild reads MySQL survives the swap"""
+    reading, resume = threading.Event(), threading.Event()
+
+    def entries(cnn, limit):
+        reading.set()
+        resume.wait(5)
+        return ROWS
+
+    with patch("app.services.database_service.get_leaderboard_entries", side_effect=entries), \
+            patch("app.services.database_service.get_player_bests", return_value=BESTS):
+        rebuild = asyncio.create_task(leaderboard_service.rebuild(None))
+        await asyncio.to_thread(reading.wait, 5)
+        await leaderboard_service.add_entry(7, "gary", 400, ACHIEVED_AT)
+        assert await leaderboard_service.rebuild(None) is None
+        resume.set()
+        assert await rebuild == 3
+
+    assert await leaderboard_service.get_rank(7) == 2
+    assert (await leaderboard_service.get_player_rank("gary"))["rank"] == 2
+    assert not await leaderboard.exists(leaderboard_service.REBUILD_KEY)
+
+
+@pytest.mark.asyncio
+async def test_removed_player_leaves_leaderboard(leaderboard, monkeypatch):
+    """A deleted player's highscores and ranking are removed, the other players move up"""
+    monkeypatch.setenv("LEADERBOARD_MAX_ENTRIES", "10")
+    await leaderboard_service.add_entry(7, "brock", 250, ACHIEVED_AT)
+    assert await leaderboard_service.remove_player("brock") == 2
+
+    assert [entry["username"] for entry in await leaderboard_service.get_top(3)] == ["misty", "ash"]
+    assert await leaderboard_service.get_rank(3) is None
+    assert await leaderboard_service.get_rank(1) == 2
+    assert await leaderboard_service.get_player_rank("brock") is None
+    assert (await leaderboard_service.get_player_rank("ash"))["rank"] == 2
+
+
+@pytest.mark.asyncio
+async def test_player_removed_during_rebuild_stays_removed(leaderboard):
+    """A player deleted after the rebuild read MySQL does not come back with the swap"""
+    reading, resume = threading.Event(), threading.Event()
+
+    def entries(cnn, limit):
+        reading.set()
+        resume.wait(5)
+        return ROWS
+
+    with patch("app.services.database_service.get_leaderboard_entries", side_effect=entries), \
+            patch("app.services.database_service.get_player_bests", return_value=BESTS):
+        rebuild = asyncio.create_task(leaderboard_service.rebuild(None))
+        await asyncio.to_thread(reading.wait, 5)
+        await leaderboard_service.remove_player("brock")
+        resume.set()
+        await rebuild
+
+    assert await leaderboard_service.get_rank(3) is None
+    assert await leaderboard_service.get_player_rank("brock") is None
+    assert [entry["username"] for entry in await leaderboard_service.get_top(3)] == ["misty", "ash"]
+    assert not await leaderboard.exists(leaderboard_service.REMOVED_KEY)
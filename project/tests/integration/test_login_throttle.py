@@ -0,0 +1,44 @@
+"""Login throttle integration tests (token bucket script on Redis)"""
+from fastapi import HTTPException
+import pytest
+import pytest_asyncio
+
+from app.services import login_throttle
+from app.services.redis_async_service import get_redis_client
+
+KEYS = ("throttle:login:user:ash", "throttle:login:user:misty", "throttle:login:ip:10.0.0.1")
+
+
+@pytest_asyncio.fixture
+async def buckets(monkeypatch):
+    """Empty buckets with a budget of 3 attempts per username"""
+    monkeypatch.setenv("LOGIN_RATE_USER", "3/60")
+    monkeypatch.setenv("LOGIN_RATE_IP", "5/60")
+    client = get_redis_client()
+    await client.delete(*KEYS)
+    yield client
+    await client.delete(*KEYS)
+
+
+@pytest.mark.asyncio
+async def test_username_budget_is_enforced(buckets):
+    """Attempts beyond the username budget are rejected with a Retry-After"""
+    for _ in range(3):
+        await login_throttle.check_login_attempt("Ash", "10.0.0.1")
+    with pytest.raises(HTTPException) as excinfo:
+        await login_throttle.check_login_attempt("ash", "10.0.0.1")
+    assert excinfo.value.status_code == 429
+    assert int(excinfo.value.headers["Retry-After"]) >= 1
+    assert 0 < await buckets.pttl("throttle:login:user:ash") <= 61000
+
+
+@pytest.mark.asyncio
+async def test_ip_budget_spans_usernames(buckets):
+    """The IP budget is shared by all usernames tried from one address"""
+    for username in ("ash", "ash", "ash", "misty", "misty"):
+        await login_throttle.check_login_attempt(username, "10.0.0.1")
+    with pytest.raises(HTTPException):
+        await login_throttle.check_login_attempt("misty", "10.0.0.1")
+    # the rejected attempt took no token from the username bucket
+    tokens = float(await buckets.hget("throttle:login:user:misty", "tokens"))
+    assert 0.9 < tokens < 1.1
@@ -0,0 +1,74 @@
+"""Integration Tests -> Schema migrations
+
+Applies the shipped migrations to the testcontainer database and checks with EXPLAIN
+that the leaderboard queries read highscores along an index instead of sorting them.
+"""
+import pytest
+from app.services.database_service import (
+    get_connection, add_user, delete_user, HIGHSCORE_PAGE_QUERY, HIGHSCORE_AFTER)
+from app.services.migration_service import apply_migrations, get_applied_versions, get_migrations
+
+LEADERBOARD_INDEXES = {"idx_highscores_score_id", "idx_highscores_user_score"}
+
+
+@pytest.fixture
+def migrated(mysql_container):
+    """A migrated database holding enough highscores for the optimizer to prefer indexes"""
+    conn = get_connection(mysql_container.get_exposed_port(3306))
+    apply_migrations(conn)
+    add_user(conn, "explainuser", "hash")
+    with conn.cursor() as cursor:
+        cursor.execute("SELECT id FROM users WHERE username = %s", ("explainuser",))
+        user_id = cursor.fetchone()[0]
+        cursor.executemany("INSERT INTO highscores (user_id, score) VALUES (%s, %s)",
+                           [(user_id, score) for score in range(500)])
+        conn.commit()
+        cursor.execute("ANALYZE TABLE highscores, users")
+        cursor.fetchall()
+    yield conn
+    delete_user(conn, "explainuser")
+    conn.close()
+
+
+def explain(conn, query, params=()):
+    """Returns the EXPLAIN rows of a query"""
+    with conn.cursor(dictionary=True) as cursor:
+        cursor.execute("EXPLAIN " + query, params)
+        return cursor.fetchall()
+
+
+def assert_index_scan(plan):
+    """highscores is read along a leaderboard index and nothing is sorted"""
+    highscores = next(row for row in plan if row["table"] == "h")
+    assert highscores["key"] in LEADERBOARD_INDEXES, plan
+    assert not any("filesort" in (row["Extra"] or "") for row in plan), plan
+
+
+def test_migrations_are_recorded_once(migrated):
+    """All migrations are recorded, a second run applies nothing"""
+    assert get_applied_versions(migrated) == {m.version for m in get_migrations()}
+    assert apply_migrations(migrated) == []
+
+
+def test_top_highscores_use_index(migrated):
+    """Top-N and keyset pages are index scans"""
+    assert_index_scan(explain(migrated, HIGHSCORE_PAGE_QUERY.format(where="") + " LIMIT 10"))
+    assert_index_scan(explain(
+        migrated, HIGHSCORE_PAGE_QUERY.format(where=HIGHSCORE_AFTER) + " LIMIT 10",
+        (250, 250, 10**9)))
+    assert_index_scan(explain(migrated, """
+        SELECT u.username, h.score, h.achieved_at FROM highscores h
+        STRAIGHT_JOIN users u ON h.user_id = u.id
+        ORDER BY h.score DESC
+        LIMIT 10
+    """))
+
+
+def test_user_highscores_use_index(migrated):
+    """A player's highscores are read along (user_id, score)"""
+    assert_index_scan(explain(migrated, """
+        SELECT h.score, u.username, h.achieved_at FROM highscores h
+        JOIN users u ON h.user_id = u.id
+        WHERE u.username = %s
+        ORDER BY h.score DESC
+    """, ("explainuser",)))
@@ -1,8 +1,11 @@
 """Redis integration tests
 """
+import asyncio
+import json
 import pytest
+import pytest_asyncio
 
-import app.services.redis_service as redis_service
+import app.services.redis_async_service as redis_service
 
 
 @pytest.mark.usefixtures("redis_container")
@@ -12,57 +15,116 @@ class TestRedisIntegration:
 
     client_id = "test-client"
 
-    def setup_method(self):
+    @pytest_asyncio.fixture(autouse=True)
+    async def cleanup(self):
         """Cleanup"""
-        redis_service.clear_state(self.client_id)
-        redis_service.reset_score(self.client_id)
+        await redis_service.clear_state(self.client_id)
 
-    def test_set_and_get_state(self):
+    @pytest.mark.asyncio
+    async def test_set_and_get_state(self):
         """Test set and get state"""
-        sample_data = {"name": "pikachu", "pokemon_id": 25}
-        redis_service.set_state(self.client_id, sample_data)
-        state = redis_service.get_state(self.client_id)
+        sample_data = {"name": "pikachu", "pokemon_id": 25, "height": 4, "weight": 60,
+                       "stats": {"Hp": 35, "Speed": 90}, "types": ["Electric"],
+                       "entry": "[Pokémon] stores electricity.", "score": 0}
+        await redis_service.set_state(self.client_id, sample_data)
+        state = await redis_service.get_state(self.client_id)
         assert state == sample_data
 
-    def test_clear_state_removes_data(self):
+    @pytest.mark.asyncio
+    async def test_clear_state_removes_data(self):
         """Test if clear_stateremoves the data"""
-        redis_service.set_state(self.client_id, {"dummy": "data"})
-        redis_service.clear_state(self.client_id)
-        assert redis_service.get_state(self.client_id) is None
+        await redis_service.set_state(self.client_id, {"dummy": "data"})
+        await redis_service.clear_state(self.client_id)
+        assert await redis_service.get_state(self.client_id) is None
 
-    def test_increment_and_get_score(self):
+    @pytest.mark.asyncio
+    async def test_increment_and_get_score(self):
         """Test if increment does indeed increment the score by a set amount"""
-        initial_score = redis_service.get_score(self.client_id)
+        initial_score = await redis_service.get_score(self.client_id)
         assert initial_score == 0
 
-        redis_service.increment_score(self.client_id, 10)
-        score = redis_service.get_score(self.client_id)
+        await redis_service.increment_score(self.client_id, 10)
+        score = await redis_service.get_score(self.client_id)
         assert score == 10
 
-        redis_service.increment_score(self.client_id, 5)
-        score = redis_service.get_score(self.client_id)
+        await redis_service.increment_score(self.client_id, 5)
+        score = await redis_service.get_score(self.client_id)
         assert score == 15
 
-    def test_reset_score_deletes_score(self):
+    @pytest.mark.asyncio
+    async def test_reset_score_resets_score(self):
         """Test if reset_score does that."""
-        redis_service.increment_score(self.client_id, 20)
-        redis_service.reset_score(self.client_id)
-        assert redis_service.get_score(self.client_id) == 0
+        await redis_service.increment_score(self.client_id, 20)
+        await redis_service.reset_score(self.client_id)
+        assert await redis_service.get_score(self.client_id) == 0
 
-    def test_is_redis_healthy_true(self):
+    @pytest.mark.asyncio
+    async def test_is_redis_healthy_true(self):
         """Test if redis is reachable."""
-        assert redis_service.is_redis_healthy() is True
+        assert await redis_service.is_redis_healthy() is True
 
-    def test_state_expiry(self):
+    @pytest.mark.asyncio
+    async def test_state_expiry(self):
         """Test if TTL is present"""
         sample_data = {"name": "eevee"}
-        redis_service.set_state(self.client_id, sample_data)
-        ttl = redis_service.get_redis_client().ttl(f"quiz:{self.client_id}")
+        await redis_service.set_state(self.client_id, sample_data)
+        ttl = await redis_service.get_redis_client().ttl(f"quiz:{self.client_id}")
         assert ttl > 0 and ttl <= 1800  # TTL should be set to 1800 seconds or less
 
-    def test_score_expiry(self):
+    @pytest.mark.asyncio
+    async def test_score_expiry(self):
         """Test if score TTL is present"""
-        redis_service.increment_score(self.client_id, 10)
-        ttl = redis_service.get_redis_client().ttl(f"quiz:{self.client_id}:score")
+        await redis_service.increment_score(self.client_id, 10)
+        ttl = await redis_service.get_redis_client().ttl(f"quiz:{self.client_id}")
         assert ttl > 0 and ttl <= 1800
 
+    @pytest.mark.asyncio
+    async def test_evaluate_guess_awards_points(self):
+        """A correct guess adds points, a wrong one keeps the score"""
+        sample_data = {"name": "pikachu", "pokemon_id": 25, "height": 4, "weight": 60,
+                       "stats": {"Hp": 35}, "types": ["Electric"], "entry": "", "score": 0}
+        await redis_service.set_state(self.client_id, sample_data)
+        assert await redis_service.evaluate_guess(self.client_id, " Pikachu ") == (True, 25)
+        assert await redis_service.evaluate_guess(self.client_id, "raichu") == (False, 25)
+        assert await redis_service.get_state(self.client_id) == dict(sample_data, score=25)
+
+    @pytest.mark.asyncio
+    async def test_evaluate_guess_legacy_json_state(self):
+        """JSON states written by older versions are evaluated as well"""
+        await redis_service.get_redis_client().set(
+            f"quiz:{self.client_id}", json.dumps({"name": "eevee", "score": 50}))
+        assert await redis_service.evaluate_guess(self.client_id, "eevee") == (True, 75)
+
+    @pytest.mark.asyncio
+    async def test_concurrent_reads_convert_legacy_state_once(self):
+        """Concurrent requests of a legacy session all see it, converted into one hash"""
+        await redis_service.get_redis_client().set(
+            f"quiz:{self.client_id}", json.dumps({"name": "eevee", "score": 50}))
+        states = await asyncio.gather(*(redis_service.get_state(self.client_id)
+                                        for _ in range(10)))
+        assert all(state["name"] == "eevee" and state["score"] == 50 for state in states)
+        assert await redis_service.get_redis_client().type(f"quiz:{self.client_id}") == b"hash"
+
+    @pytest.mark.asyncio
+    async def test_evaluate_guess_without_state(self):
+        """No session, no evaluation"""
+        assert await redis_service.evaluate_guess(self.client_id, "eevee") is None
+
+    @pytest.mark.asyncio
+    async def test_concurrent_guesses_do_not_lose_updates(self):
+        """Every concurrent correct guess is counted"""
+        await redis_service.set_state(self.client_id, {"name": "eevee", "score": 0})
+        await asyncio.gather(*(redis_service.evaluate_guess(self.client_id, "eevee")
+                               for _ in range(40)))
+        assert (await redis_service.get_state(self.client_id))["score"] == 40 * 25
+
+    @pytest.mark.asyncio
+    async def test_next_question_keeps_score(self):
+        """Storing a new question leaves the score untouched"""
+        await redis_service.set_state(self.client_id,
+                                      {"name": "eevee", "pokemon_id": 133, "score": 0})
+        await redis_service.increment_score(self.client_id, 50)
+        await redis_service.set_state(self.client_id, {"name": "mew", "pokemon_id": 151})
+        state = await redis_service.get_state(self.client_id)
+        assert state["name"] == "mew"
+        assert state["score"] == 50
@@ -0,0 +1,46 @@
+"""Token deny-list integration tests"""
+import time
+from jose import jwt
+import pytest
+import pytest_asyncio
+
+from app.services import auth_service, token_denylist
+from app.services.redis_async_service import get_redis_client
+
+
+def _payload(username="denyuser"):
+    token = auth_service.create_access_token({"sub": username}).access_token
+    return jwt.get_unverified_claims(token)
+
+
+@pytest_asyncio.fixture
+async def denylist():
+    """Deny-list without entries for denyuser"""
+    client = get_redis_client()
+    await client.delete("auth:denied-user:denyuser")
+    yield client
+    await client.delete("auth:denied-user:denyuser")
+
+
+@pytest.mark.asyncio
+async def test_revoked_token_expires_with_token(denylist):
+    """A revoked token is denied until its own expiry, other tokens are not"""
+    payload, other = _payload(), _payload()
+    await token_denylist.revoke_token(payload["jti"], payload["exp"])
+
+    assert await token_denylist.is_revoked(payload) is True
+    assert await token_denylist.is_revoked(other) is False
+    ttl = await denylist.ttl(f"auth:denied:{payload['jti']}")
+    assert 0 < ttl <= payload["exp"] - time.time() + 1
+
+
+@pytest.mark.asyncio
+async def test_revoked_user_denies_earlier_tokens_only(denylist):
+    """Revoking a user denies the tokens issued before, not those issued after"""
+    before = _payload()
+    await token_denylist.revoke_user("DenyUser")
+    time.sleep(0.01)
+    after = _payload()
+
+    assert await token_denylist.is_revoked(before) is True
+    assert await token_denylist.is_revoked(after) is False
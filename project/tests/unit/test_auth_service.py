@@ -1,13 +1,17 @@
 """Auth service unit tests"""
-from unittest.mock import patch
+from unittest.mock import AsyncMock, patch
 from datetime import datetime, timedelta
 from jose import jwt
+from fastapi import HTTPException
 import bcrypt
 import pytest
+import redis
 
 import app.services.auth_service as auth
 import app.services.database_service as db
 from app.models.token import Token
+from app.models.user_in_db import UserInDb
+from app.util import metrics
 
 
 def test_check_credentials_valid():
@@ -121,3 +125,91 @@ def test_get_user_from_token_invalid(monkeypatch):
         auth.get_user_from_token(invalid_token, db_conn=None)
 
     assert "Invalid token" in str(excinfo.value)
+
+
+@pytest.mark.asyncio
+async def test_register_user_async_hashes_on_pool():
+    """The password is hashed on the hashing pool and the call is timed"""
+    metrics.reset()
+    hashed = await auth.register_user_async("validuser", "validpass123")
+    assert bcrypt.checkpw(b"validpass123", hashed)
+    assert metrics.snapshot()["timings"]["password_hash.hash_seconds"]["count"] == 1
+
+
+@pytest.mark.asyncio
+async def test_authenticate_user_async():
+    """Verification on the hashing pool accepts the right and rejects a wrong password"""
+    db_user = {
+        "id": 1,
+        "username": "user",
+        "password_hash": bcrypt.hashpw(b"validpass123", bcrypt.gensalt(4)).decode(),
+        "created_at": datetime.now()
+    }
+    user = await auth.authenticate_user_async(db_user, "validpass123")
+    assert user.username == "user"
+    with pytest.raises(HTTPException) as excinfo:
+        await auth.authenticate_user_async(db_user, "invalid")
+    assert excinfo.value.status_code == 401
+
+
+@pytest.mark.asyncio
+async def test_hashing_rejected_when_saturated(monkeypatch):
+    """Beyond the queue limit hashing is refused with 503 instead of queued"""
+    metrics.reset()
+    monkeypatch.setattr(auth, "_HASH_PENDING", 16)
+    with pytest.raises(HTTPException) as excinfo:
+        await auth.register_user_async("validuser", "validpass123")
+    assert excinfo.value.status_code == 503
+    assert metrics.get_counter("password_hash.rejected") == 1
+
+
+def _claims_token():
+    user = UserInDb(id=7, username="ashketchum", created_at=datetime(2025, 5, 1, 12, 0))
+    return auth.create_access_token(auth.user_claims(user)).access_token
+
+
+@pytest.mark.asyncio
+async def test_claims_token_needs_no_database():
+    """A token with user claims is resolved after the deny-list check only"""
+    with patch("app.services.database_async_service.get_user", new=AsyncMock()) as get_user, \
+            patch("app.services.token_denylist.is_revoked",
+                  new=AsyncMock(return_value=False)) as is_revoked:
+        user = await auth.get_user_from_token_async(_claims_token())
+    assert (user.id, user.username, user.password_hash) == (7, "ashketchum", None)
+    assert user.created_at == datetime(2025, 5, 1, 12, 0)
+    payload = is_revoked.call_args.args[0]
+    assert payload["jti"] and payload["iat"]
+    get_user.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_revoked_token_is_rejected():
+    """A token on the deny-list is rejected"""
+    with patch("app.services.token_denylist.is_revoked", new=AsyncMock(return_value=True)):
+        with pytest.raises(HTTPException) as excinfo:
+            await auth.get_user_from_token_async(_claims_token())
+    assert excinfo.value.status_code == 401
+
+
+@pytest.mark.asyncio
+async def test_unreadable_denylist_falls_back_to_lookup(monkeypatch):
+    """Without the deny-list the user is looked up, so deleted users stay locked out"""
+    monkeypatch.setenv("USER_CACHE_BACKEND", "off")
+    with patch("app.services.database_async_service.get_user",
+               new=AsyncMock(return_value=None)), \
+            patch("app.services.token_denylist.is_revoked",
+                  new=AsyncMock(side_effect=redis.exceptions.ConnectionError("down"))):
+        with pytest.raises(HTTPException) as excinfo:
+            await auth.get_user_from_token_async(_claims_token(), db_conn=object())
+    assert excinfo.value.detail == "User not found"
+
+
+@pytest.mark.asyncio
+async def test_revoke_tokens_skips_invalid_tokens():
+    """Logout revokes valid tokens by their id and ignores the rest"""
+    token = _claims_token()
+    jti = jwt.get_unverified_claims(token)["jti"]
+    with patch("app.services.token_denylist.revoke_token", new=AsyncMock()) as revoke_token:
+        await auth.revoke_tokens(token, None, "garbage")
+    revoke_token.assert_awaited_once()
+    assert revoke_token.call_args.args[0] == jti
@@ -0,0 +1,71 @@
+"""Circuit breaker unit tests"""
+import pytest
+
+from app.util import circuit_breaker
+from app.util.circuit_breaker import CircuitBreaker, CircuitOpenError
+from app.util import metrics
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Controllable monotonic clock"""
+    now = [0.0]
+    monkeypatch.setattr(circuit_breaker.time, "monotonic", lambda: now[0])
+    return now
+
+
+async def failing():
+    raise ConnectionError("upstream down")
+
+
+async def succeeding():
+    return "ok"
+
+
+@pytest.mark.asyncio
+async def test_opens_after_threshold_and_fails_fast(clock):
+    """After n failures the upstream is not called anymore"""
+    metrics.reset()
+    breaker = CircuitBreaker("test_breaker", failure_threshold=2, reset_timeout=10)
+    for _ in range(2):
+        with pytest.raises(ConnectionError):
+            await breaker.call(failing)
+    assert breaker.state == CircuitBreaker.OPEN
+
+    with pytest.raises(CircuitOpenError):
+        await breaker.call(succeeding)
+    assert metrics.get_counter("test_breaker.rejected") == 1
+    assert metrics.get_counter("test_breaker.transitions.closed_to_open") == 1
+
+
+@pytest.mark.asyncio
+async def test_half_open_probe_closes_on_success(clock):
+    """After the reset timeout one probe is allowed; success closes the breaker"""
+    breaker = CircuitBreaker("test_breaker", failure_threshold=1, reset_timeout=10)
+    with pytest.raises(ConnectionError):
+        await breaker.call(failing)
+    clock[0] = 11
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert await breaker.call(succeeding) == "ok"
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+@pytest.mark.asyncio
+async def test_half_open_probe_reopens_on_failure(clock):
+    """A failed probe opens the breaker again"""
+    breaker = CircuitBreaker("test_breaker", failure_threshold=1, reset_timeout=10)
+    with pytest.raises(ConnectionError):
+        await breaker.call(failing)
+    clock[0] = 11
+    with pytest.raises(ConnectionError):
+        await breaker.call(failing)
+    assert breaker.state == CircuitBreaker.OPEN
+
+
+@pytest.mark.asyncio
+async def test_ignored_errors_do_not_count(clock):
+    """Errors rejected by is_failure keep the breaker closed"""
+    breaker = CircuitBreaker("test_breaker", failure_threshold=1, reset_timeout=10)
+    with pytest.raises(ConnectionError):
+        await breaker.call(failing, is_failure=lambda e: False)
+    assert breaker.state == CircuitBreaker.CLOSED
@@ -0,0 +1,249 @@
+"""Async database service unit tests (aiomysql mocked)"""
+import asyncio
+import socket
+import threading
+from unittest.mock import AsyncMock, MagicMock
+import aiomysql
+import pytest
+
+from app.services import database_async_service as db
+from app.services.database_service import decode_highscore_cursor
+
+
+def mock_connection():
+    """An aiomysql connection whose cursors are one shared mock"""
+    cnn = MagicMock()
+    cnn.commit = AsyncMock()
+    cnn.rollback = AsyncMock()
+    cursor = MagicMock()
+    cursor.execute = AsyncMock()
+    cursor.fetchone = AsyncMock()
+    cursor.fetchall = AsyncMock()
+    cnn.cursor.return_value.__aenter__ = AsyncMock(return_value=cursor)
+    cnn.cursor.return_value.__aexit__ = AsyncMock(return_value=False)
+    return cnn, cursor
+
+
+@pytest.mark.asyncio
+async def test_get_user():
+    """Users are fetched as dicts"""
+    cnn, cursor = mock_connection()
+    cursor.fetchone.return_value = {"username": "ash", "id": 1}
+
+    assert await db.get_user(cnn, "ash") == {"username": "ash", "id": 1}
+    cnn.cursor.assert_called_once_with(aiomysql.DictCursor)
+    assert cursor.execute.call_args[0][1] == ("ash",)
+
+
+@pytest.mark.asyncio
+async def test_add_user_duplicate():
+    """An existing username is reported as ValueError"""
+    cnn, cursor = mock_connection()
+    cursor.execute.side_effect = aiomysql.IntegrityError(1062, "Duplicate entry")
+
+    with pytest.raises(ValueError, match="Username already exists"):
+        await db.add_user(cnn, "ash", b"hash")
+    cnn.rollback.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_delete_user_removes_player_from_leaderboard(monkeypatch):
+    """A deleted user's tokens are revoked and their highscores leave the leaderboard"""
+    cnn, cursor = mock_connection()
+    cursor.rowcount = 1
+    remove_player = AsyncMock(side_effect=db.redis.exceptions.ConnectionError("down"))
+    monkeypatch.setattr(db.token_denylist, "revoke_user", AsyncMock())
+    monkeypatch.setattr(db.leaderboard_service, "remove_player", remove_player)
+    monkeypatch.setattr(db.user_cache, "invalidate", AsyncMock())
+
+    assert await db.delete_user(cnn, "ash") is True
+    remove_player.assert_awaited_once_with("ash")
+
+
+@pytest.mark.asyncio
+async def test_delete_unknown_user_leaves_leaderboard(monkeypatch):
+    """Nothing is removed from the leaderboard if no user was deleted"""
+    cnn, cursor = mock_connection()
+    cursor.rowcount = 0
+    remove_player = AsyncMock()
+    monkeypatch.setattr(db.leaderboard_service, "remove_player", remove_player)
+    monkeypatch.setattr(db.user_cache, "invalidate", AsyncMock())
+
+    assert await db.delete_user(cnn, "ghost") is False
+    remove_player.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_insert_highscore():
+    """A highscore is one INSERT, built from lastrowid"""
+    cnn, cursor = mock_connection()
+    cursor.lastrowid = 42
+
+    highscore_id, username, score, _ = await db.insert_highscore(cnn, 1, "ash", 100)
+
+    assert (highscore_id, username, score) == (42, "ash", 100)
+    cursor.execute.assert_awaited_once()
+    cnn.commit.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_insert_highscore_unknown_user():
+    """A failing user_id foreign key means the user does not exist (anymore)"""
+    cnn, cursor = mock_connection()
+    cursor.execute.side_effect = aiomysql.IntegrityError(1452, "Cannot add or update")
+
+    with pytest.raises(ValueError, match="User not found"):
+        await db.insert_highscore(cnn, 99, "ghost", 100)
+
+
+@pytest.mark.asyncio
+async def test_get_highscores_page():
+    """Pages continue after the cursor and return the next cursor if more rows exist"""
+    cnn, cursor = mock_connection()
+    cursor.fetchall.return_value = (
+        {"id": 7, "username": "a", "score": 300, "achieved_at": None},
+        {"id": 5, "username": "b", "score": 300, "achieved_at": None},
+        {"id": 9, "username": "c", "score": 200, "achieved_at": None},
+    )
+
+    page, cursor_token = await db.get_highscores_page(cnn, limit=2, after=(400, 3))
+
+    assert [row["id"] for row in page] == [7, 5]
+    assert decode_highscore_cursor(cursor_token) == (300, 5)
+    assert cursor.execute.call_args[0][1] == (400, 400, 3, 3)
+
+
+@pytest.mark.asyncio
+async def test_get_highscores_last_page():
+    """The last page has no next cursor"""
+    cnn, cursor = mock_connection()
+    cursor.fetchall.return_value = ({"id": 1, "username": "a", "score": 100, "achieved_at": None},)
+
+    assert await db.get_highscores_page(cnn, limit=2) == (list(cursor.fetchall.return_value), None)
+
+
+@pytest.mark.asyncio
+async def test_get_user_rank():
+    """The player rank comes with the players around them"""
+    cnn, cursor = mock_connection()
+    cursor.fetchall.return_value = (
+        {"username": "user1", "score": 300, "player_rank": 1, "players": 3},
+        {"username": "user2", "score": 300, "player_rank": 1, "players": 3},
+        {"username": "user3", "score": 100, "player_rank": 3, "players": 3},
+    )
+
+    result = await db.get_user_rank(cnn, "user2", around=1)
+
+    assert (result["best_score"], result["rank"], result["players"]) == (300, 1, 3)
+    assert [row["username"] for row in result["neighbours"]] == ["user1", "user2", "user3"]
+    assert cursor.execute.call_args[0][1] == ("user2", 1, 1)
+
+
+@pytest.mark.asyncio
+async def test_get_user_rank_without_highscore():
+    """Players without a highscore have no rank"""
+    cnn, cursor = mock_connection()
+    cursor.fetchall.return_value = ()
+
+    assert await db.get_user_rank(cnn, "ghostuser") is None
+
+
+@pytest.mark.asyncio
+async def test_get_highscore_rank():
+    """The rank of a highscore counts the highscores ordered before it"""
+    cnn, cursor = mock_connection()
+    cursor.fetchall.return_value = ({"highscore_rank": 4},)
+
+    assert await db.get_highscore_rank(cnn, 7) == 4
+    assert cursor.execute.call_args[0][1] == (7,)
+
+    cursor.fetchall.return_value = ()
+    assert await db.get_highscore_rank(cnn, 99) is None
+
+
+@pytest.mark.asyncio
+async def test_pool_sessions_use_utc(monkeypatch):
+    """Pooled connections switch to the UTC session time zone when they connect"""
+    create_pool = AsyncMock()
+    monkeypatch.setattr(db.aiomysql, "create_pool", create_pool)
+    monkeypatch.setattr(db, "POOL", None)
+    monkeypatch.setattr(db, "POOL_LOOP", None)
+    await db.get_pool()
+    assert create_pool.call_args.kwargs["init_command"] == "SET time_zone = '+00:00'"
+
+
+@pytest.mark.asyncio
+async def test_get_db_commits_and_releases(monkeypatch):
+    """The request connection is committed once and released to the pool"""
+    cnn, _ = mock_connection()
+    cnn.get_transaction_status.return_value = True
+    pool = MagicMock()
+    pool.acquire = AsyncMock(return_value=cnn)
+    monkeypatch.setattr(db, "get_pool", AsyncMock(return_value=pool))
+
+    dependency = db.get_db()
+    assert await dependency.__anext__() is cnn
+    with pytest.raises(StopAsyncIteration):
+        await dependency.__anext__()
+
+    cnn.commit.assert_awaited_once()
+    pool.release.assert_called_once_with(cnn)
+
+
+@pytest.mark.asyncio
+async def test_get_db_rolls_back_on_error(monkeypatch):
+    """A failing request rolls back and still releases the connection"""
+    cnn, _ = mock_connection()
+    pool = MagicMock()
+    pool.acquire = AsyncMock(return_value=cnn)
+    monkeypatch.setattr(db, "get_pool", AsyncMock(return_value=pool))
+
+    dependency = db.get_db()
+    await dependency.__anext__()
+    with pytest.raises(ValueError):
+        await dependency.athrow(ValueError("request failed"))
+
+    cnn.rollback.assert_awaited_once()
+    cnn.commit.assert_not_awaited()
+    pool.release.assert_called_once_with(cnn)
+
+
+@pytest.mark.asyncio
+async def test_stale_pool_is_closed_in_its_running_loop(monkeypatch):
+    """A pool whose loop still runs in another thread is closed there"""
+    stale = MagicMock(wait_closed=AsyncMock())
+    loop = asyncio.new_event_loop()
+    monkeypatch.setattr(db.aiomysql, "create_pool", AsyncMock())
+    monkeypatch.setattr(db, "POOL", stale)
+    monkeypatch.setattr(db, "POOL_LOOP", loop)
+    thread = threading.Thread(target=loop.run_forever)
+    thread.start()
+    try:
+        assert await db.get_pool() is not stale
+        await asyncio.sleep(0.05)
+    finally:
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join()
+        loop.close()
+
+    stale.close.assert_called_once()
+    stale.wait_closed.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_stale_pool_of_closed_loop_is_shut_down(monkeypatch):
+    """The connections of a pool whose loop is gone are shut down and forgotten"""
+    loop = asyncio.new_event_loop()
+    loop.close()
+    cnn = MagicMock()
+    sock = cnn._writer.get_extra_info.return_value
+    stale = MagicMock(_free=[cnn], _used=set())
+    monkeypatch.setattr(db.aiomysql, "create_pool", AsyncMock())
+    monkeypatch.setattr(db, "POOL", stale)
+    monkeypatch.setattr(db, "POOL_LOOP", loop)
+
+    assert await db.get_pool() is not stale
+    stale.close.assert_called_once()
+    sock.shutdown.assert_called_once_with(socket.SHUT_RDWR)
+    assert cnn._writer is None
+    assert stale._free == []
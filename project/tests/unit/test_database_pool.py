@@ -0,0 +1,208 @@
+"""Instrumented MySQL connection pool unit tests (connections mocked)"""
+import threading
+from unittest.mock import patch, MagicMock
+import pytest
+from mysql.connector import Error, pooling
+
+from app.services import database_service
+from app.services.database_service import InstrumentedConnectionPool
+from app.util import metrics
+
+
+def make_pool(**kwargs):
+    options = {"size": 2, "timeout": 0.05, "max_waiters": 10,
+               "max_lifetime": 3600, "validate_idle": 30}
+    options.update(kwargs)
+    return InstrumentedConnectionPool(host="db", **options)
+
+
+def fake_connection(**kwargs):
+    cnx = MagicMock()
+    cnx.unread_result = False
+    cnx.in_transaction = False
+    return cnx
+
+
+@pytest.fixture(autouse=True)
+def clean_metrics():
+    metrics.reset()
+    yield
+    metrics.reset()
+
+
+@patch("app.services.database_service.mysql.connector.connect")
+def test_connection_is_reused(mock_connect):
+    """A released connection is handed out again instead of opening a new one"""
+    mock_connect.side_effect = fake_connection
+    pool = make_pool()
+
+    first = pool.get_connection()
+    raw = first._cnx
+    first.close()
+    second = pool.get_connection()
+
+    assert second._cnx is raw
+    mock_connect.assert_called_once_with(host="db")
+    assert metrics.snapshot()["gauges"] == {"mysql_pool.in_use": 1, "mysql_pool.idle": 0}
+
+
+@patch("app.services.database_service.mysql.connector.connect")
+def test_close_twice_releases_once(mock_connect):
+    """Closing a checked out connection again does not put it back twice"""
+    mock_connect.side_effect = fake_connection
+    pool = make_pool()
+
+    cnn = pool.get_connection()
+    cnn.close()
+    cnn.close()
+
+    assert len(pool._idle) == 1
+
+
+@patch("app.services.database_service.mysql.connector.connect")
+def test_checkout_times_out_when_exhausted(mock_connect):
+    """A checkout waits for the timeout and then raises PoolError"""
+    mock_connect.side_effect = fake_connection
+    pool = make_pool(size=1)
+    pool.get_connection()
+
+    with pytest.raises(pooling.PoolError):
+        pool.get_connection()
+
+    assert metrics.get_counter("mysql_pool.exhausted") == 1
+    assert metrics.get_counter("mysql_pool.timeouts") == 1
+
+
+@patch("app.services.database_service.mysql.connector.connect")
+def test_waiting_checkout_gets_released_connection(mock_connect):
+    """A waiting checkout is woken up by a release"""
+    mock_connect.side_effect = fake_connection
+    pool = make_pool(size=1, timeout=5)
+    held = pool.get_connection()
+    raw = held._cnx
+
+    timer = threading.Timer(0.05, held.close)
+    timer.start()
+    cnn = pool.get_connection()
+    timer.join()
+
+    assert cnn._cnx is raw
+    assert metrics.snapshot()["timings"]["mysql_pool.wait_seconds"]["count"] == 2
+
+
+@patch("app.services.database_service.mysql.connector.connect")
+def test_checkout_rejected_when_queue_full(mock_connect):
+    """No further checkouts wait once the waiter limit is reached"""
+    mock_connect.side_effect = fake_connection
+    pool = make_pool(size=1, max_waiters=0)
+    pool.get_connection()
+
+    with pytest.raises(pooling.PoolError):
+        pool.get_connection()
+
+    assert metrics.get_counter("mysql_pool.rejected") == 1
+
+
+@patch("app.services.database_service.mysql.connector.connect")
+def test_old_connection_is_recycled(mock_connect):
+    """Connections beyond their lifetime are closed and replaced on checkout"""
+    mock_connect.side_effect = fake_connection
+    pool = make_pool(max_lifetime=0)
+
+    first = pool.get_connection()
+    raw = first._cnx
+    first.close()
+    second = pool.get_connection()
+
+    assert second._cnx is not raw
+    raw.close.assert_called_once()
+    assert metrics.get_counter("mysql_pool.recycled") == 1
+
+
+@patch("app.services.database_service.mysql.connector.connect")
+def test_idle_connection_is_validated(mock_connect):
+    """Connections idle for too long are pinged and replaced if the ping fails"""
+    mock_connect.side_effect = fake_connection
+    pool = make_pool(validate_idle=0)
+
+    first = pool.get_connection()
+    raw = first._cnx
+    raw.is_connected.return_value = False
+    first.close()
+    second = pool.get_connection()
+
+    raw.is_connected.assert_called_once()
+    assert second._cnx is not raw
+
+
+@patch("app.services.database_service.mysql.connector.connect")
+def test_release_rolls_back_open_transaction(mock_connect):
+    """A transaction left open by its user is rolled back when the connection returns"""
+    mock_connect.side_effect = fake_connection
+    pool = make_pool()
+
+    cnn = pool.get_connection()
+    raw = cnn._cnx
+    raw.in_transaction = True
+    cnn.close()
+
+    raw.rollback.assert_called_once()
+    assert len(pool._idle) == 1
+
+
+@patch("app.services.database_service.mysql.connector.connect")
+def test_broken_connection_is_dropped_on_release(mock_connect):
+    """A connection failing its rollback is closed instead of being returned to the pool"""
+    mock_connect.side_effect = fake_connection
+    pool = make_pool(size=1)
+
+    cnn = pool.get_connection()
+    raw = cnn._cnx
+    raw.in_transaction = True
+    raw.rollback.side_effect = Error("Lost connection")
+    cnn.close()
+
+    raw.shutdown.assert_called_once()
+    assert len(pool._idle) == 0
+    assert metrics.get_counter("mysql_pool.recycled") == 1
+    assert pool.get_connection() is not None
+    assert mock_connect.call_count == 2
+
+
+@patch("app.services.database_service.mysql.connector.connect")
+def test_discarded_connection_frees_slot(mock_connect):
+    """A discarded connection is shut down instead of being drained and returned"""
+    mock_connect.side_effect = fake_connection
+    pool = make_pool(size=1)
+
+    cnn = pool.get_connection()
+    raw = cnn._cnx
+    raw.unread_result = True
+    cnn.discard()
+    cnn.close()
+
+    raw.shutdown.assert_called_once()
+    raw.consume_results.assert_not_called()
+    assert len(pool._idle) == 0
+    assert pool.get_connection()._cnx is not raw
+    assert metrics.get_counter("mysql_pool.recycled") == 1
+
+
+@patch("app.services.database_service.mysql.connector.connect")
+def test_failed_connect_frees_slot(mock_connect):
+    """A failing connect does not leak a slot of the pool"""
+    mock_connect.side_effect = Error("Unable to connect")
+    pool = make_pool(size=1)
+
+    with pytest.raises(Error):
+        pool.get_connection()
+
+    mock_connect.side_effect = fake_connection
+    assert pool.get_connection() is not None
+
+
+def test_pool_sessions_use_utc(monkeypatch):
+    """Pooled connections are opened with the UTC session time zone"""
+    monkeypatch.setattr(database_service, "CONN_POOL", None)
+    pool = database_service.get_pool()
+    assert pool._connect_kwargs["time_zone"] == "+00:00"
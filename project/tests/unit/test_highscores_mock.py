@@ -1,78 +1,32 @@
 """Database service highscore related unit tests."""
+import datetime
 from unittest.mock import patch, MagicMock
+import mysql.connector
 import pytest
+from fastapi import HTTPException
 
 from app.services.database_service import (
-    add_highscore,
-    get_highscores,
+    TOP_HIGHSCORES_QUERY,
+    insert_highscore_batch,
     get_user_highscores,
-    get_top_highscores
+    get_top_highscores,
+    iter_highscore_batches,
+    new_highscore_time,
+    encode_highscore_cursor,
+    decode_highscore_cursor
 )
 
 
-@patch("app.services.database_service.get_connection")
-def test_add_highscore_success(mock_get_connection):
-    """Check if you can add a highscore"""
-    mock_conn = MagicMock()
-    mock_cursor = MagicMock()
-    mock_get_connection.return_value = mock_conn
-    mock_conn.cursor.return_value = mock_cursor
-
-    # Mock SELECT user ID
-    mock_cursor.fetchone.side_effect = [
-        (1,),  # Result of SELECT id FROM users
-        {"id": 42, "username": "testuser", "score": 100, "achieved_at": "2025-06-02"}
-    ]
-
-    mock_cursor.lastrowid = 42
-
-    result = add_highscore(mock_conn, "testuser", 100)
-
-    assert result["score"] == 100
-    mock_cursor.execute.assert_any_call(
-        "SELECT id FROM users WHERE username = %s", ("testuser",))
-    mock_cursor.execute.assert_any_call(
-        "INSERT INTO highscores (user_id, score) VALUES (%s, %s)", (1, 100)
-    )
-    mock_conn.commit.assert_called_once()
-    mock_cursor.close.assert_called()
-
-
-@patch("app.services.database_service.get_connection")
-def test_add_highscore_user_not_found(mock_get_connection):
-    """Check if you can not add a highscore if no user by the provided name was found."""
-    mock_conn = MagicMock()
-    mock_cursor = MagicMock()
-    mock_get_connection.return_value = mock_conn
-    mock_conn.cursor.return_value = mock_cursor
-
-    mock_cursor.fetchone.return_value = None  # Simulate user not found
-
-    with pytest.raises(ValueError, match="User not found"):
-        add_highscore(mock_conn, "ghostuser", 100)
-
-    mock_conn.rollback.assert_called_once()
-    mock_cursor.close.assert_called()
-
-
-@patch("app.services.database_service.get_connection")
-def test_get_highscores(mock_get_connection):
-    """Check get highscores"""
-    mock_conn = MagicMock()
-    mock_cursor = MagicMock()
-    mock_get_connection.return_value = mock_conn
-    mock_conn.cursor.return_value = mock_cursor
-
-    mock_cursor.fetchall.return_value = [
-        {"username": "user1", "score": 200, "achieved_at": "2025-06-02"},
-        {"username": "user2", "score": 150, "achieved_at": "2025-06-01"},
-    ]
+def test_new_highscore_time():
+    """Zero scores are refused, accepted ones get the current time as naive UTC seconds"""
+    with pytest.raises(HTTPException) as exc_info:
+        new_highscore_time(0)
+    assert exc_info.value.status_code == 400
 
-    result = get_highscores(mock_conn)
-    assert len(result) == 2
-    assert result[0]["score"] == 200
-    mock_cursor.execute.assert_called_once()
-    mock_cursor.close.assert_called()
+    achieved_at = new_highscore_time(100)
+    assert achieved_at.tzinfo is None and achieved_at.microsecond == 0
+    now = datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+    assert abs((now - achieved_at).total_seconds()) < 5
 
 
 @patch("app.services.database_service.get_connection")
@@ -125,11 +79,81 @@ def test_get_top_highscores(mock_get_connection):
     assert result[1]["username"] == "user2"
 
     mock_conn.cursor.assert_called_once_with(dictionary=True)
-    mock_cursor.execute.assert_called_once_with(
-        """
-                SELECT u.username, h.score, h.achieved_at FROM highscores h
-                JOIN users u ON h.user_id = u.id
-                ORDER BY h.score DESC
-                LIMIT %s
-            """, (2,)
-    )
+    mock_cursor.execute.assert_called_once_with(TOP_HIGHSCORES_QUERY, (2,))
+
+
+def test_highscore_cursor_roundtrip():
+    """Pagination cursors decode to the (score, id) they were made from"""
+    assert decode_highscore_cursor(encode_highscore_cursor(1200, 42)) == (1200, 42)
+    with pytest.raises(ValueError):
+        decode_highscore_cursor("not a cursor")
+
+
+def test_iter_highscore_batches_discards_connection_when_closed_early():
+    """An abandoned stream drops its connection instead of reading the rest of the table"""
+    mock_conn = MagicMock()
+    mock_cursor = mock_conn.cursor.return_value
+    mock_cursor.fetchmany.return_value = [{"id": 1}]
+    mock_conn.unread_result = True
+
+    batches = iter_highscore_batches(mock_conn, batch_size=1)
+    assert next(batches) == [{"id": 1}]
+    batches.close()
+
+    mock_conn.discard.assert_called_once()
+    mock_conn.consume_results.assert_not_called()
+
+
+def test_iter_highscore_batches_closes_cursor_when_exhausted():
+    """A fully read stream keeps its connection"""
+    mock_conn = MagicMock()
+    mock_cursor = mock_conn.cursor.return_value
+    mock_cursor.fetchmany.side_effect = [[{"id": 1}], []]
+    mock_conn.unread_result = False
+
+    assert list(iter_highscore_batches(mock_conn)) == [[{"id": 1}]]
+    mock_cursor.close.assert_called_once()
+    mock_conn.discard.assert_not_called()
+
+
+def test_insert_highscore_batch():
+    """A batch is one multi-row INSERT, one lookup of the new ids and one commit"""
+    mock_conn = MagicMock()
+    mock_cursor = mock_conn.cursor.return_value.__enter__.return_value
+    mock_cursor.fetchall.return_value = [("1-0", 10), ("1-1", 11)]
+    rows = [("1-0", 1, 100, "2025-06-01"), ("1-1", 2, 200, "2025-06-01")]
+
+    assert insert_highscore_batch(mock_conn, rows) == {"1-0": 10, "1-1": 11}
+    mock_cursor.executemany.assert_called_once()
+    assert mock_cursor.executemany.call_args[0][1] == rows
+    assert mock_cursor.execute.call_args[0][1] == ["1-0", "1-1"]
+    mock_conn.commit.assert_called_once()
+    assert insert_highscore_batch(mock_conn, []) == {}
+
+
+def test_insert_highscore_batch_skips_rejected_rows():
+    """A batch with a rejected row is stored row by row without that row"""
+    mock_conn = MagicMock()
+    mock_cursor = mock_conn.cursor.return_value.__enter__.return_value
+    mock_cursor.executemany.side_effect = mysql.connector.IntegrityError(errno=1452)
+    mock_cursor.execute.side_effect = [
+        None, mysql.connector.IntegrityError(errno=1452), None]
+    mock_cursor.fetchall.return_value = [("1-0", 10)]
+    rows = [("1-0", 1, 100, "2025-06-01"), ("1-1", 99, 200, "2025-06-01")]
+
+    assert insert_highscore_batch(mock_conn, rows) == {"1-0": 10}
+    assert "ON DUPLICATE KEY UPDATE id = id" in mock_cursor.executemany.call_args[0][0]
+    assert [call.args[1] for call in mock_cursor.execute.call_args_list[:2]] == rows
+    mock_conn.commit.assert_called_once()
+
+
+def test_insert_highscore_batch_fails_on_connection_errors():
+    """Errors that are not caused by a row fail the whole batch"""
+    mock_conn = MagicMock()
+    mock_cursor = mock_conn.cursor.return_value.__enter__.return_value
+    mock_cursor.executemany.side_effect = mysql.connector.OperationalError(errno=2013)
+
+    with pytest.raises(mysql.connector.OperationalError):
+        insert_highscore_batch(mock_conn, [("1-0", 1, 100, "2025-06-01")])
+    mock_cursor.execute.assert_not_called()
+    mock_conn.rollback.assert_called_once()
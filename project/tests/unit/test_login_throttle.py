@@ -0,0 +1,67 @@
+"""Login throttle unit tests (redis mocked)"""
+from unittest.mock import AsyncMock, MagicMock
+from fastapi import HTTPException
+import pytest
+import redis
+
+from app.services import login_throttle
+from app.util import metrics
+
+
+@pytest.fixture
+def mock_script(monkeypatch):
+    """Throttle script replaced by a mock"""
+    client = MagicMock()
+    script = AsyncMock(return_value=[1, 0])
+    script.registered_client = client
+    client.register_script.return_value = script
+    monkeypatch.setattr(login_throttle, "get_redis_client", lambda: client)
+    monkeypatch.setattr(login_throttle, "THROTTLE_SCRIPT", None)
+    metrics.reset()
+    return script
+
+
+def test_parse_rate():
+    """Budgets are parsed into capacity and tokens per millisecond"""
+    assert login_throttle.parse_rate("10/60") == (10, 10 / 60000)
+    assert login_throttle.parse_rate("off") is None
+    with pytest.raises(ValueError):
+        login_throttle.parse_rate("0/60")
+
+
+def test_get_buckets_skips_disabled(monkeypatch):
+    """Disabled budgets take no bucket, usernames are case-insensitive"""
+    monkeypatch.setenv("LOGIN_RATE_IP", "off")
+    buckets = login_throttle.get_buckets("AshKetchum", "10.0.0.1")
+    assert [key for key, _, _ in buckets] == ["throttle:login:user:ashketchum"]
+
+
+@pytest.mark.asyncio
+async def test_attempt_allowed(mock_script, monkeypatch):
+    """Both buckets are passed to the script and an allowed attempt passes"""
+    monkeypatch.delenv("LOGIN_RATE_USER", raising=False)
+    monkeypatch.delenv("LOGIN_RATE_IP", raising=False)
+    await login_throttle.check_login_attempt("ash", "10.0.0.1")
+    kwargs = mock_script.call_args.kwargs
+    assert kwargs["keys"] == ["throttle:login:user:ash", "throttle:login:ip:10.0.0.1"]
+    assert kwargs["args"][0] == 10 and kwargs["args"][2] == 30
+    assert metrics.get_counter("login_throttle.allowed") == 1
+
+
+@pytest.mark.asyncio
+async def test_attempt_rejected_with_retry_after(mock_script):
+    """A used up budget is answered with 429 and the time until the next token"""
+    mock_script.return_value = [0, 4200]
+    with pytest.raises(HTTPException) as excinfo:
+        await login_throttle.check_login_attempt("ash", "10.0.0.1")
+    assert excinfo.value.status_code == 429
+    assert excinfo.value.headers["Retry-After"] == "5"
+    assert metrics.get_counter("login_throttle.rejected") == 1
+
+
+@pytest.mark.asyncio
+async def test_redis_failure_lets_attempt_through(mock_script):
+    """Without Redis the attempt is let through and counted"""
+    mock_script.side_effect = redis.exceptions.ConnectionError("down")
+    await login_throttle.check_login_attempt("ash", "10.0.0.1")
+    assert metrics.get_counter("login_throttle.errors") == 1
@@ -0,0 +1,116 @@
+"""Schema migration runner unit tests."""
+from unittest.mock import MagicMock, patch
+import pytest
+
+from app.services.migration_service import apply_migrations, get_migrations, migrate_on_startup
+
+
+@pytest.fixture
+def migrations_dir(tmp_path):
+    """A directory with two migrations and an unrelated file"""
+    (tmp_path / "0002_second.sql").write_text(
+        "-- comment; with a semicolon\nALTER TABLE a ADD INDEX b (c);\nALTER TABLE d ADD INDEX e (f);\n")
+    (tmp_path / "0001_first.sql").write_text("CREATE TABLE a (c INT);")
+    (tmp_path / "README.md").write_text("not a migration")
+    return tmp_path
+
+
+def mock_connection(applied):
+    """A connection whose schema_migrations table holds the given versions"""
+    mock_conn = MagicMock()
+    mock_cursor = mock_conn.cursor.return_value.__enter__.return_value
+    mock_cursor.fetchone.return_value = (1,)  # GET_LOCK
+    mock_cursor.fetchall.return_value = [(version,) for version in applied]
+    return mock_conn, mock_cursor
+
+
+def test_get_migrations_in_version_order(migrations_dir):
+    """Migrations are ordered by version and split into statements"""
+    migrations = get_migrations(migrations_dir)
+    assert [(m.version, m.name) for m in migrations] == [(1, "first"), (2, "second")]
+    assert migrations[1].statements() == [
+        "ALTER TABLE a ADD INDEX b (c)", "ALTER TABLE d ADD INDEX e (f)"]
+
+
+def test_duplicate_versions_are_rejected(migrations_dir):
+    """Two migrations with the same version are an error"""
+    (migrations_dir / "0002_other.sql").write_text("SELECT 1;")
+    with pytest.raises(ValueError, match="Duplicate migration version 2"):
+        get_migrations(migrations_dir)
+
+
+def test_apply_only_pending_migrations(migrations_dir):
+    """Applied versions are skipped, pending ones run and are recorded"""
+    mock_conn, mock_cursor = mock_connection(applied=[1])
+
+    assert apply_migrations(mock_conn, migrations_dir) == [2]
+
+    executed = [call.args[0] for call in mock_cursor.execute.call_args_list]
+    assert "CREATE TABLE a (c INT)" not in executed
+    assert "ALTER TABLE a ADD INDEX b (c)" in executed
+    mock_cursor.execute.assert_any_call(
+        "INSERT INTO schema_migrations (version, name) VALUES (%s, %s)", (2, "second"))
+    assert executed[-1] == "SELECT RELEASE_LOCK(%s)"
+
+
+def test_lock_timeout(migrations_dir):
+    """Without the migration lock nothing is applied"""
+    mock_conn, mock_cursor = mock_connection(applied=[])
+    mock_cursor.fetchone.return_value = (0,)
+
+    with pytest.raises(TimeoutError):
+        apply_migrations(mock_conn, migrations_dir)
+    assert mock_conn.commit.call_count == 1  # schema_migrations table only
+
+
+def test_failure_is_logged_to_given_logger(migrations_dir):
+    """A failing migration is rolled back, reported to the caller's logger and re-raised"""
+    mock_conn, mock_cursor = mock_connection(applied=[1])
+    log = MagicMock()
+
+    def execute(statement, *args):
+        if statement.startswith("ALTER"):
+            raise RuntimeError("boom")
+
+    mock_cursor.execute.side_effect = execute
+
+    with pytest.raises(RuntimeError):
+        apply_migrations(mock_conn, migrations_dir, log)
+    log.error.assert_called_once()
+    mock_conn.rollback.assert_called_once()
+
+
+def test_shipped_migrations():
+    """The migrations shipped with the application are well-formed"""
+    migrations = get_migrations()
+    assert [m.version for m in migrations] == list(range(1, len(migrations) + 1))
+    assert all(m.statements() for m in migrations)
+
+
+@patch("app.services.migration_service.apply_migrations", return_value=[3])
+@patch("app.services.migration_service.get_connection")
+def test_migrate_on_startup_reports_success(mock_get_connection, _mock_apply, monkeypatch):
+    """Applied migrations are reported and the connection is closed"""
+    monkeypatch.delenv("DB_MIGRATE_ON_STARTUP", raising=False)
+
+    assert migrate_on_startup() is True
+    mock_get_connection.return_value.close.assert_called_once()
+
+
+@patch("app.services.migration_service.apply_migrations", side_effect=RuntimeError("boom"))
+@patch("app.services.migration_service.get_connection")
+def test_migrate_on_startup_reports_failure(mock_get_connection, _mock_apply, monkeypatch):
+    """A failed migration does not raise, but is reported to the caller"""
+    monkeypatch.delenv("DB_MIGRATE_ON_STARTUP", raising=False)
+
+    assert migrate_on_startup() is False
+    mock_get_connection.return_value.close.assert_called_once()
+
+
+@patch("app.services.migration_service.get_connection")
+def test_migrate_on_startup_disabled(mock_get_connection, monkeypatch):
+    """With migrations disabled the database is not touched"""
+    monkeypatch.setenv("DB_MIGRATE_ON_STARTUP", "0")
+
+    assert migrate_on_startup() is True
+    mock_get_connection.assert_not_called()
@@ -0,0 +1,72 @@
+"""PokeAPI SQLite cache unit tests"""
+import sqlite3
+import pytest
+
+from app.services import pokeapi_cache
+from app.util import metrics
+
+
+@pytest.fixture
+def cache(tmp_path):
+    """A small cache in a temporary directory"""
+    metrics.reset()
+    return pokeapi_cache.SQLiteCache(str(tmp_path / "pokeapi.sqlite3"), max_entries=2)
+
+
+def test_get_and_set(cache):
+    """Stored responses come back, misses are None"""
+    assert cache.get("pokemon/1/") is None
+    cache.set("pokemon/1/", {"name": "bulbasaur"})
+    assert cache.get("pokemon/1/") == {"name": "bulbasaur"}
+    stats = cache.stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+    assert stats["entries"] == 1
+
+
+def test_uses_wal_mode(cache):
+    """The database runs in WAL mode so readers do not block the writer"""
+    conn = sqlite3.connect(cache.path)
+    assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    conn.close()
+
+
+def test_evicts_least_recently_used(cache, monkeypatch):
+    """Once the cap is exceeded, the least recently used entry goes"""
+    clock = iter(range(100))
+    monkeypatch.setattr(pokeapi_cache.time, "time", lambda: next(clock))
+    cache.touch_interval = 0
+    cache.set("pokemon/1/", {"id": 1})
+    cache.set("pokemon/2/", {"id": 2})
+    cache.get("pokemon/1/")  # 2 is now the oldest
+    cache.set("pokemon/3/", {"id": 3})
+
+    assert cache.get("pokemon/2/") is None
+    assert cache.get("pokemon/1/") == {"id": 1}
+    assert cache.get("pokemon/3/") == {"id": 3}
+    assert cache.stats()["evictions"] == 1
+
+
+def test_recent_access_is_not_rewritten(cache, monkeypatch):
+    """Reads within the touch interval do not write, and a locked database skips the write"""
+    monkeypatch.setattr(pokeapi_cache.time, "time", lambda: 1000)
+    cache.set("pokemon/1/", {"id": 1})
+    other = sqlite3.connect(cache.path, isolation_level=None)
+    other.execute("BEGIN IMMEDIATE")  # holds the writer lock
+    try:
+        assert cache.get("pokemon/1/") == {"id": 1}
+        monkeypatch.setattr(pokeapi_cache.time, "time", lambda: 1000 + cache.touch_interval)
+        assert cache.get("pokemon/1/") == {"id": 1}
+    finally:
+        other.execute("ROLLBACK")
+        other.close()
+    assert metrics.get_counter("pokeapi_cache.skipped_touches") == 1
+
+
+def test_pokebase_adapter(cache, monkeypatch):
+    """pokebase load/save go through the SQLite cache"""
+    monkeypatch.setattr(pokeapi_cache, "CACHE", cache)
+    pokeapi_cache._pokebase_save({"name": "ivysaur"}, "pokemon", 2)
+    assert pokeapi_cache._pokebase_load("pokemon", 2) == {"name": "ivysaur"}
+    with pytest.raises(KeyError):
+        pokeapi_cache._pokebase_load("pokemon", 3)
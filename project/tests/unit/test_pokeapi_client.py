@@ -0,0 +1,123 @@
+"""Async PokeAPI client unit tests (HTTP mocked via httpx.MockTransport)"""
+import asyncio
+from unittest.mock import MagicMock, patch
+import httpx
+import pytest
+from fastapi import HTTPException
+
+from app.services import pokeapi_cache, pokeapi_client, pokemon_service
+from app.util import metrics
+from app.util.circuit_breaker import CircuitBreaker
+from app.util.logger import Logger
+
+POKEMON = {
+    "id": 25, "name": "pikachu", "height": 4, "weight": 60,
+    "stats": [{"base_stat": 35, "stat": {"name": "hp"}},
+              {"base_stat": 55, "stat": {"name": "attack"}}],
+    "types": [{"slot": 1, "type": {"name": "electric"}}]
+}
+SPECIES = {
+    "flavor_text_entries": [
+        {"flavor_text": "When several of these Pikachu gather, their electricity could build.",
+         "language": {"name": "en"}},
+        {"flavor_text": "Il arrive que Pikachu s'électrocute.", "language": {"name": "fr"}}
+    ]
+}
+
+
+@pytest.fixture
+def mock_pokeapi(monkeypatch, tmp_path):
+    """Replace the shared client with one answering from memory and use an empty cache"""
+    requested = []
+
+    def handler(request: httpx.Request):
+        requested.append(request.url.path)
+        if request.url.path == "/api/v2/pokemon/25/":
+            return httpx.Response(200, json=POKEMON)
+        if request.url.path == "/api/v2/pokemon-species/25/":
+            return httpx.Response(200, json=SPECIES)
+        return httpx.Response(404)
+
+    client = httpx.AsyncClient(transport=httpx.MockTransport(handler),
+                               base_url="https://pokeapi.co/api/v2")
+    monkeypatch.setattr(pokeapi_client, "CLIENT", client)
+    monkeypatch.setattr(pokeapi_cache, "CACHE",
+                        pokeapi_cache.SQLiteCache(str(tmp_path / "pokeapi.sqlite3")))
+    monkeypatch.setattr(pokeapi_client, "BREAKER",
+                        CircuitBreaker("pokeapi_breaker", failure_threshold=1))
+    monkeypatch.setenv("USE_TEST_POKEMON", "0")
+    metrics.reset()
+    yield requested
+    pokeapi_client.CLIENT = None
+
+
+@pytest.mark.asyncio
+async def test_fetch_pokemon_data_requests_both_resources(mock_pokeapi):
+    """pokemon and species are both fetched"""
+    pokemon, species = await pokeapi_client.fetch_pokemon_data(25)
+    assert pokemon["name"] == "pikachu"
+    assert "flavor_text_entries" in species
+    assert sorted(mock_pokeapi) == ["/api/v2/pokemon-species/25/", "/api/v2/pokemon/25/"]
+
+
+@pytest.mark.asyncio
+async def test_get_json_answers_from_cache(mock_pokeapi):
+    """The second request for a resource does not reach PokeAPI"""
+    await pokeapi_client.get_json("pokemon/25")
+    await pokeapi_client.get_json("pokemon/25")
+    assert mock_pokeapi == ["/api/v2/pokemon/25/"]
+
+
+@pytest.mark.asyncio
+@patch("app.services.pokemon_service.get_snapshot", return_value=None)
+@patch("app.services.pokemon_service.get_random_pokemon_id", return_value=25)
+async def test_fetch_pokemon_async_builds_quiz_info(mock_id, mock_snapshot, mock_pokeapi):
+    """The async fetch returns the same QuizInfo the sync one would"""
+    result = await pokemon_service.fetch_pokemon_async(MagicMock(spec=Logger))
+    assert result.name == "pikachu"
+    assert result.stats == {"Hp": 35, "Attack": 55}
+    assert result.types == ["Electric"]
+    assert "[Pokémon]" in result.entry
+    assert "Pikachu" not in result.entry
+
+
+@pytest.mark.asyncio
+@patch("app.services.pokemon_service.get_snapshot", return_value=None)
+@patch("app.services.pokemon_service.get_random_pokemon_id", return_value=9999)
+async def test_fetch_pokemon_async_upstream_error(mock_id, mock_snapshot, mock_pokeapi):
+    """Upstream errors turn into a 503"""
+    with pytest.raises(HTTPException) as excinfo:
+        await pokemon_service.fetch_pokemon_async(MagicMock(spec=Logger))
+    assert excinfo.value.status_code == 503
+
+
+@pytest.mark.asyncio
+async def test_stale_entry_is_served_and_revalidated(mock_pokeapi, monkeypatch):
+    """A stale response is returned immediately and refreshed in the background"""
+    await pokeapi_client.get_json("pokemon/25")
+    monkeypatch.setenv("POKEMON_CACHE_TTL", "-1")
+
+    data = await pokeapi_client.get_json("pokemon/25")
+    assert data["name"] == "pikachu"
+    await asyncio.gather(*pokeapi_client._REVALIDATING.values())
+
+    assert mock_pokeapi == ["/api/v2/pokemon/25/", "/api/v2/pokemon/25/"]
+    assert metrics.get_counter("pokeapi.stale_serves") == 1
+    assert metrics.get_counter("pokeapi.revalidations") == 1
+
+
+@pytest.mark.asyncio
+@patch("app.services.pokemon_service.get_snapshot", return_value=None)
+@patch("app.services.pokemon_service.get_random_pokemon_id", return_value=150)
+async def test_open_breaker_serves_cached_pokemon(mock_id, mock_snapshot, mock_pokeapi):
+    """While PokeAPI is down, questions come from the cache without upstream calls"""
+    await pokeapi_client.fetch_pokemon_data(25)
+    pokeapi_client.BREAKER.record_failure()
+    assert pokeapi_client.BREAKER.state == CircuitBreaker.OPEN
+    mock_pokeapi.clear()
+
+    result = await pokemon_service.fetch_pokemon_async(MagicMock(spec=Logger))
+
+    assert result.name == "pikachu"
+    assert mock_pokeapi == []
+    assert metrics.get_counter("pokeapi.stale_serves") == 1
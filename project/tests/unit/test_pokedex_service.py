@@ -0,0 +1,98 @@
+"""Pokedex snapshot service unit tests"""
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+import pytest
+
+from app.services import pokedex_service, pokemon_service
+from app.models.quiz_info import QuizInfo
+from app.util.logger import Logger
+
+
+def make_pokebase_pokemon():
+    """A PokeBase-like bulbasaur"""
+    stats = [
+        SimpleNamespace(stat=SimpleNamespace(name=name), base_stat=value)
+        for name, value in [("hp", 45), ("attack", 49), ("defense", 49),
+                            ("special-attack", 65), ("special-defense", 65), ("speed", 45)]
+    ]
+    flavor_texts = [
+        SimpleNamespace(language=SimpleNamespace(name="en"),
+                        flavor_text="A strange seed was\nplanted on its\x0cback at birth."),
+        SimpleNamespace(language=SimpleNamespace(name="en"),
+                        flavor_text="A strange seed was planted on its back at birth."),
+        SimpleNamespace(language=SimpleNamespace(name="de"),
+                        flavor_text="Dieses Pokémon trägt einen Samen auf dem Rücken."),
+    ]
+    return SimpleNamespace(
+        id=1, name="bulbasaur", height=7, weight=69, stats=stats,
+        types=[SimpleNamespace(type=SimpleNamespace(name="grass")),
+               SimpleNamespace(type=SimpleNamespace(name="poison"))],
+        species=SimpleNamespace(flavor_text_entries=flavor_texts)
+    )
+
+
+@pytest.fixture
+def snapshot_file(tmp_path, monkeypatch):
+    """Writes a one-pokemon snapshot and points the service at it"""
+    path = tmp_path / "pokedex.json.gz"
+    pokedex_service.write_snapshot([pokedex_service.build_entry(make_pokebase_pokemon())], path)
+    monkeypatch.setenv("POKEDEX_SNAPSHOT", str(path))
+    monkeypatch.setattr(pokedex_service, "SNAPSHOT", None)
+    monkeypatch.setattr(pokedex_service, "SNAPSHOT_FAILED", None)
+    yield path
+    pokedex_service.SNAPSHOT = None
+
+
+def test_build_entry_keeps_unique_english_entries():
+    """Only english entries are kept, duplicates after whitespace cleanup are dropped"""
+    entry = pokedex_service.build_entry(make_pokebase_pokemon())
+    assert entry.name == "bulbasaur"
+    assert entry.types == ("Grass", "Poison")
+    assert entry.entries == ("A strange seed was planted on its back at birth.",)
+    assert entry.stats_dict()["Special-attack"] == 65
+
+
+def test_snapshot_round_trip(snapshot_file):
+    """What is written can be read again"""
+    snapshot = pokedex_service.read_snapshot(snapshot_file)
+    assert list(snapshot) == [1]
+    assert snapshot[1] == pokedex_service.build_entry(make_pokebase_pokemon())
+
+
+def test_get_snapshot_missing_file(tmp_path, monkeypatch):
+    """No snapshot file means no snapshot"""
+    monkeypatch.setenv("POKEDEX_SNAPSHOT", str(tmp_path / "missing.json.gz"))
+    monkeypatch.setattr(pokedex_service, "SNAPSHOT", None)
+    monkeypatch.setattr(pokedex_service, "SNAPSHOT_FAILED", None)
+    assert pokedex_service.get_snapshot() is None
+    with patch("app.services.pokedex_service.os.path.exists") as mock_exists:
+        assert pokedex_service.get_snapshot() is None
+    mock_exists.assert_not_called()
+
+
+def test_get_snapshot_corrupt_file_is_read_once(tmp_path, monkeypatch):
+    """A snapshot that fails to load is not read again on every question"""
+    path = tmp_path / "pokedex.json.gz"
+    path.write_bytes(b"not gzip")
+    monkeypatch.setenv("POKEDEX_SNAPSHOT", str(path))
+    monkeypatch.setattr(pokedex_service, "SNAPSHOT", None)
+    monkeypatch.setattr(pokedex_service, "SNAPSHOT_FAILED", None)
+    with patch("app.services.pokedex_service.read_snapshot",
+               side_effect=pokedex_service.read_snapshot) as mock_read:
+        assert pokedex_service.get_snapshot() is None
+        assert pokedex_service.get_snapshot() is None
+    mock_read.assert_called_once()
+
+
+@patch("app.services.pokemon_service.pb.pokemon")
+@patch("app.services.pokemon_service.get_random_pokemon_id", return_value=1)
+def test_fetch_pokemon_uses_snapshot(mock_random_id, mock_pb_pokemon, snapshot_file, monkeypatch):
+    """fetch_pokemon must not call the API if the pokemon is in the snapshot"""
+    monkeypatch.setenv("USE_TEST_POKEMON", "0")
+    result = pokemon_service.fetch_pokemon(MagicMock(spec=Logger))
+
+    assert isinstance(result, QuizInfo)
+    assert result.name == "bulbasaur"
+    assert result.stats["Hp"] == 45
+    assert result.types == ["Grass", "Poison"]
+    mock_pb_pokemon.assert_not_called()
@@ -0,0 +1,76 @@
+"""Prefetch service unit tests"""
+import asyncio
+from unittest.mock import AsyncMock, MagicMock, patch
+import pytest
+
+from app.services import prefetch_service
+from app.services.pokemon_service import get_test_pokemon
+from app.util import metrics
+from app.util.logger import Logger
+
+
+@pytest.fixture(autouse=True)
+def empty_queue(monkeypatch):
+    """Every test starts with an empty buffer and clean metrics"""
+    monkeypatch.setenv("PREFETCH_LOW_WATERMARK", "1")
+    monkeypatch.setenv("PREFETCH_HIGH_WATERMARK", "3")
+    prefetch_service.QUEUE.clear()
+    metrics.reset()
+    yield
+    prefetch_service.QUEUE.clear()
+
+
+@pytest.mark.asyncio
+@patch("app.services.prefetch_service.fetch_pokemon_async", new_callable=AsyncMock,
+       side_effect=lambda logger: get_test_pokemon())
+async def test_refill_fills_up_to_high_watermark(mock_fetch):
+    """Refill stops at the high watermark"""
+    added = await prefetch_service.refill(MagicMock(spec=Logger))
+    assert added == 3
+    assert len(prefetch_service.QUEUE) == 3
+    assert metrics.snapshot()["gauges"]["prefetch.depth"] == 3
+
+    assert await prefetch_service.refill(MagicMock(spec=Logger)) == 0
+    assert mock_fetch.call_count == 3
+
+
+@pytest.mark.asyncio
+@patch("app.services.prefetch_service.fetch_pokemon_async", new_callable=AsyncMock)
+async def test_next_question_pops_from_buffer(mock_fetch):
+    """A buffered question is served without fetching"""
+    prefetch_service.QUEUE.append(get_test_pokemon())
+    question = await prefetch_service.next_question(MagicMock(spec=Logger))
+    assert question.name == "bulbasaur"
+    mock_fetch.assert_not_called()
+    assert metrics.get_counter("prefetch.hits") == 1
+
+
+@pytest.mark.asyncio
+@patch("app.services.prefetch_service.fetch_pokemon_async", new_callable=AsyncMock,
+       return_value=get_test_pokemon())
+async def test_next_question_falls_back_on_miss(mock_fetch):
+    """An empty buffer falls back to a direct fetch and counts a miss"""
+    question = await prefetch_service.next_question(MagicMock(spec=Logger))
+    assert question.name == "bulbasaur"
+    mock_fetch.assert_awaited_once()
+    assert metrics.get_counter("prefetch.misses") == 1
+
+
+@pytest.mark.asyncio
+async def test_producer_survives_unexpected_errors(monkeypatch):
+    """Errors other than HTTPException are logged and the refill is retried"""
+    monkeypatch.setenv("PREFETCH_RETRY_DELAY", "0")
+    monkeypatch.setattr(prefetch_service, "_REFILL_EVENT", asyncio.Event())
+    refill = AsyncMock(side_effect=[RuntimeError("database is locked"), 3])
+    monkeypatch.setattr(prefetch_service, "refill", refill)
+    logger = MagicMock(spec=Logger)
+
+    producer = asyncio.create_task(prefetch_service._run_producer(logger))
+    while refill.await_count < 2:
+        await asyncio.sleep(0)
+    producer.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await producer
+
+    logger.error.assert_called_once()
+    assert metrics.get_counter("prefetch.failures") == 1
@@ -1,5 +1,5 @@
 import pytest
-from unittest.mock import MagicMock, patch
+from unittest.mock import AsyncMock, MagicMock, patch
 from fastapi import Request
 from fastapi.responses import JSONResponse
 import uuid
@@ -33,21 +33,23 @@ def test_get_or_create_session_id_no_cookie():
 ### --- Tests for get_or_init_state --- ###
 
 
+@pytest.mark.asyncio
 @patch("app.routes.quiz.set_state")
-@patch("app.routes.quiz.fetch_pokemon")
+@patch("app.routes.quiz.next_question", new_callable=AsyncMock)
 @patch("app.routes.quiz.get_state")
-def test_get_or_init_state_existing(get_state, fetch_pokemon, set_state):
+async def test_get_or_init_state_existing(get_state, next_question, set_state):
     get_state.return_value = {"name": "Pikachu", "score": 5}
-    result = get_or_init_state("session123")
+    result = await get_or_init_state("session123")
     assert result == {"name": "Pikachu", "score": 5}
-    fetch_pokemon.assert_not_called()
+    next_question.assert_not_awaited()
     set_state.assert_not_called()
 
 
+@pytest.mark.asyncio
 @patch("app.routes.quiz.set_state")
-@patch("app.routes.quiz.fetch_pokemon")
+@patch("app.routes.quiz.next_question", new_callable=AsyncMock)
 @patch("app.routes.quiz.get_state")
-def test_get_or_init_state_new(mock_get_state, mock_fetch_pokemon, mock_set_state):
+async def test_get_or_init_state_new(mock_get_state, mock_next_question, mock_set_state):
     mock_get_state.return_value = None
 
     # Create a real QuizInfo instance
@@ -60,9 +62,9 @@ def test_get_or_init_state_new(mock_get_state, mock_fetch_pokemon, mock_set_stat
         types=["Grass", "Poison"],
         entry="A strange seed was planted on its back at birth."
     )
-    mock_fetch_pokemon.return_value = quiz_info
+    mock_next_question.return_value = quiz_info
 
-    state = get_or_init_state("session123")
+    state = await get_or_init_state("session123")
 
     assert state["name"] == "Bulbasaur"
     assert state["types"] == ["Grass", "Poison"]
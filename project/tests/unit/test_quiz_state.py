@@ -0,0 +1,63 @@
+"""Quiz state encoding unit tests"""
+import json
+import msgpack
+import pytest
+
+from app.models.quiz_info import (
+    QuizInfo, encode_state, decode_state, STATE_SCHEMA_VERSION, MINIMAL_STATE_SCHEMA_VERSION)
+
+STATS = {"Hp": 35, "Attack": 55, "Defense": 40,
+         "Special-attack": 50, "Special-defense": 50, "Speed": 90}
+
+
+def make_state(**overrides):
+    """Session state as the quiz routes store it"""
+    state = QuizInfo(name="pikachu", pokemon_id=25, height=4, weight=60, stats=dict(STATS),
+                     types=["Electric"], entry="[Pokémon] stores electricity.").to_dict()
+    del state["entry_index"]
+    state["score"] = 50
+    state.update(overrides)
+    return state
+
+
+def test_round_trip():
+    """Encoding and decoding returns the same state"""
+    state = make_state()
+    assert decode_state(encode_state(state)) == state
+
+
+def test_stats_are_stored_positionally():
+    """The six standard stats are packed as a list without their names"""
+    fields = msgpack.unpackb(encode_state(make_state()))
+    assert fields[0] == STATE_SCHEMA_VERSION
+    assert fields[5] == [35, 55, 40, 50, 50, 90]
+
+
+def test_round_trip_non_standard_stats():
+    """Stats with other names are kept as a map"""
+    state = make_state(stats={"Hp": 35, "Speed": 90})
+    assert decode_state(encode_state(state)) == state
+
+
+def test_binary_is_smaller_than_json():
+    """The binary state is more compact than the JSON it replaces"""
+    state = make_state()
+    assert len(encode_state(state)) < len(json.dumps(state).encode())
+
+
+def test_decode_legacy_json():
+    """JSON states written by older versions are still read"""
+    state = make_state()
+    assert decode_state(json.dumps(state).encode()) == state
+
+
+def test_decode_unknown_version():
+    """Unknown schema versions are rejected"""
+    with pytest.raises(ValueError):
+        decode_state(msgpack.packb([99, "pikachu"]))
+
+
+def test_decode_minimal_state():
+    """Minimal states only carry the question reference and the score"""
+    blob = msgpack.packb([MINIMAL_STATE_SCHEMA_VERSION, 25, 3, 50])
+    assert decode_state(blob) == {"pokemon_id": 25, "entry_index": 3, "score": 50}
@@ -0,0 +1,276 @@
+"""Async redis service unit tests (redis mocked)"""
+import asyncio
+import json
+import socket
+import threading
+from unittest.mock import AsyncMock, MagicMock
+import pytest
+
+from app.services import redis_async_service, redis_service
+from app.models.quiz_info import encode_state, decode_state
+from app.services.pokedex_service import PokedexEntry
+
+SAMPLE_STATE = {
+    "name": "bulbasaur", "pokemon_id": 1, "height": 7, "weight": 69,
+    "stats": {"Hp": 45, "Attack": 49, "Defense": 49,
+              "Special-attack": 65, "Special-defense": 65, "Speed": 45},
+    "types": ["Grass", "Poison"], "entry": "A strange seed was planted on its back.",
+    "score": 25
+}
+
+
+@pytest.fixture
+def mock_redis_client(monkeypatch):
+    """Shared asyncio client replaced by a mock"""
+    client = AsyncMock()
+    client.pipeline = MagicMock()
+    client.register_script = MagicMock()
+    client.pipeline.return_value.execute = AsyncMock()
+    monkeypatch.setattr(redis_async_service, "CLIENT", client)
+    monkeypatch.setattr(redis_async_service, "get_redis_client", lambda: client)
+    monkeypatch.setattr(redis_async_service, "GUESS_SCRIPT", None)
+    return client
+
+
+def test_create_redis_client_uses_env_vars(monkeypatch):
+    """Client is built on an instrumented asyncio pool configured from the environment"""
+    monkeypatch.setenv("REDIS_HOST", "myhost")
+    monkeypatch.setenv("REDIS_MAX_CONNECTIONS", "7")
+    client = redis_async_service.create_redis_client()
+    pool = client.connection_pool
+    assert isinstance(pool, redis_async_service.InstrumentedConnectionPool)
+    assert pool.max_connections == 7
+    assert pool.connection_kwargs["host"] == "myhost"
+    assert pool.connection_kwargs["decode_responses"] is False
+
+
+@pytest.mark.asyncio
+async def test_get_redis_client_is_bound_to_event_loop(monkeypatch):
+    """The shared client is reused within a loop and replaced in a new one"""
+    monkeypatch.setattr(redis_async_service, "CLIENT", None)
+    first = redis_async_service.get_redis_client()
+    assert redis_async_service.get_redis_client() is first
+    other_loop = asyncio.new_event_loop()
+    other_loop.close()
+    monkeypatch.setattr(redis_async_service, "CLIENT_LOOP", other_loop)
+    assert redis_async_service.get_redis_client() is not first
+
+
+@pytest.mark.asyncio
+async def test_stale_client_is_closed_in_its_running_loop(monkeypatch):
+    """A client whose loop still runs in another thread is closed there"""
+    stale = MagicMock(aclose=AsyncMock())
+    stale.connection_pool.disconnect = AsyncMock()
+    loop = asyncio.new_event_loop()
+    monkeypatch.setattr(redis_async_service, "CLIENT", stale)
+    monkeypatch.setattr(redis_async_service, "CLIENT_LOOP", loop)
+    thread = threading.Thread(target=loop.run_forever)
+    thread.start()
+    try:
+        assert redis_async_service.get_redis_client() is not stale
+        await asyncio.sleep(0.05)
+    finally:
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join()
+        loop.close()
+
+    stale.aclose.assert_awaited_once()
+    stale.connection_pool.disconnect.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_stale_client_of_closed_loop_is_shut_down(monkeypatch):
+    """The connections of a client whose loop is gone are shut down and forgotten"""
+    loop = asyncio.new_event_loop()
+    loop.close()
+    stale = redis_async_service.create_redis_client()
+    connection = MagicMock()
+    sock = connection._writer.get_extra_info.return_value
+    stale.connection_pool._available_connections.append(connection)
+    monkeypatch.setattr(redis_async_service, "CLIENT", stale)
+    monkeypatch.setattr(redis_async_service, "CLIENT_LOOP", loop)
+
+    assert redis_async_service.get_redis_client() is not stale
+    sock.shutdown.assert_called_once_with(socket.SHUT_RDWR)
+    assert connection._writer is None
+    assert stale.connection_pool._available_connections == []
+
+
+@pytest.mark.asyncio
+async def test_get_state_returns_deserialized_state(mock_redis_client):
+    """The hash is turned back into the quiz state"""
+    mock_redis_client.hgetall.return_value = {
+        b"question": encode_state(dict(SAMPLE_STATE, score=0)), b"answer": b"bulbasaur",
+        b"pokemon_id": b"1", b"score": b"25"}
+    assert await redis_async_service.get_state("client1") == SAMPLE_STATE
+    mock_redis_client.hgetall.assert_awaited_once_with("quiz:client1")
+
+
+@pytest.mark.asyncio
+async def test_get_state_returns_none_if_no_state(mock_redis_client):
+    """No hash, no state"""
+    mock_redis_client.hgetall.return_value = {}
+    assert await redis_async_service.get_state("client1") is None
+
+
+@pytest.mark.asyncio
+async def test_get_state_fetches_only_requested_fields(mock_redis_client):
+    """Score-only reads do not transfer the question"""
+    mock_redis_client.hmget.return_value = [b"75"]
+    assert await redis_async_service.get_state("client1", ("score",)) == {"score": 75}
+    mock_redis_client.hmget.assert_awaited_once_with("quiz:client1", ["score"])
+    mock_redis_client.hgetall.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_get_state_converts_legacy_json(mock_redis_client):
+    """Sessions stored as a JSON string by older versions are converted into a hash"""
+    wrongtype = redis_async_service.redis.exceptions.ResponseError(
+        "WRONGTYPE Operation against a key")
+    mock_redis_client.hgetall.side_effect = [wrongtype, {
+        b"question": encode_state({"name": "bulbasaur"}), b"score": b"25"}]
+    pipe = mock_redis_client.pipeline.return_value.__aenter__.return_value = MagicMock()
+    pipe.watch = AsyncMock()
+    pipe.type = AsyncMock(return_value=b"string")
+    pipe.get = AsyncMock(return_value=json.dumps({"name": "bulbasaur", "score": 25}).encode())
+    pipe.execute = AsyncMock()
+
+    assert (await redis_async_service.get_state("client1"))["name"] == "bulbasaur"
+    pipe.watch.assert_awaited_once_with("quiz:client1")
+    pipe.multi.assert_called_once()
+    pipe.delete.assert_called_once_with("quiz:client1")
+    pipe.hset.assert_any_call("quiz:client1", "score", 25)
+    pipe.execute.assert_awaited_once()
+    mock_redis_client.delete.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_set_state_writes_hash_with_expiry(mock_redis_client):
+    """Question fields and score are written in one transaction with expiry"""
+    pipe = mock_redis_client.pipeline.return_value
+    await redis_async_service.set_state("client2", SAMPLE_STATE)
+    mapping = pipe.hset.call_args_list[0].kwargs["mapping"]
+    assert mapping["answer"] == "bulbasaur"
+    assert mapping["pokemon_id"] == 1
+    assert decode_state(mapping["question"])["name"] == "bulbasaur"
+    pipe.hdel.assert_called_once_with("quiz:client2", "entry_index")
+    pipe.hset.assert_any_call("quiz:client2", "score", 25)
+    pipe.expire.assert_called_once_with("quiz:client2", 1800)
+    pipe.execute.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_set_state_without_score_keeps_score(mock_redis_client):
+    """Storing the next question does not touch an existing score"""
+    question = {key: value for key, value in SAMPLE_STATE.items() if key != "score"}
+    await redis_async_service.set_state("client2", question)
+    pipe = mock_redis_client.pipeline.return_value
+    pipe.hsetnx.assert_called_once_with("quiz:client2", "score", 0)
+    assert pipe.hset.call_count == 1
+
+
+SNAPSHOT = {1: PokedexEntry(
+    pokemon_id=1, name="bulbasaur", height=7, weight=69, stats=(45, 49, 49, 65, 65, 45),
+    types=("Grass", "Poison"),
+    entries=("A strange seed was planted on its back.", "Bulbasaur can be seen napping."))}
+
+
+@pytest.mark.asyncio
+async def test_minimal_mode_stores_only_question_reference(mock_redis_client, monkeypatch):
+    """Minimal mode stores id and entry index and rehydrates the rest"""
+    monkeypatch.setenv("QUIZ_SESSION_MODE", "minimal")
+    monkeypatch.setattr(redis_service, "get_snapshot", lambda: SNAPSHOT)
+    state = dict(SAMPLE_STATE, entry="[Pokémon] can be seen napping.", entry_index=1)
+
+    await redis_async_service.set_state("client2", state)
+    pipe = mock_redis_client.pipeline.return_value
+    assert pipe.hset.call_args_list[0].kwargs["mapping"] == {"pokemon_id": 1, "entry_index": 1}
+    pipe.hdel.assert_called_once_with("quiz:client2", "question", "answer")
+
+    mock_redis_client.hgetall.return_value = {
+        b"pokemon_id": b"1", b"entry_index": b"1", b"score": b"25"}
+    assert await redis_async_service.get_state("client2") == state
+
+
+@pytest.mark.asyncio
+async def test_minimal_mode_keeps_questions_outside_snapshot(mock_redis_client, monkeypatch):
+    """Questions that cannot be rehydrated are stored in full"""
+    monkeypatch.setenv("QUIZ_SESSION_MODE", "minimal")
+    monkeypatch.setattr(redis_service, "get_snapshot", lambda: SNAPSHOT)
+    state = dict(SAMPLE_STATE, pokemon_id=25, entry_index=0)
+
+    await redis_async_service.set_state("client2", state)
+    mapping = mock_redis_client.pipeline.return_value.hset.call_args_list[0].kwargs["mapping"]
+    assert "question" in mapping
+
+
+@pytest.mark.asyncio
+async def test_evaluate_guess_runs_registered_script(mock_redis_client, monkeypatch):
+    """The guess is normalized and evaluated by the registered script"""
+    monkeypatch.setattr(redis_async_service, "find_pokemon_id", lambda name: 1)
+    script = AsyncMock(return_value=[1, 50])
+    script.registered_client = mock_redis_client
+    mock_redis_client.register_script.return_value = script
+
+    assert await redis_async_service.evaluate_guess("client1", " Bulbasaur ") == (True, 50)
+    assert await redis_async_service.evaluate_guess("client1", "bulbasaur") == (True, 50)
+
+    mock_redis_client.register_script.assert_called_once_with(redis_service.GUESS_LUA)
+    script.assert_awaited_with(keys=["quiz:client1"], args=["bulbasaur", 1, 25, 1800])
+
+
+@pytest.mark.asyncio
+async def test_evaluate_guess_without_state(mock_redis_client):
+    """None is returned if there is no session state"""
+    mock_redis_client.register_script.return_value = AsyncMock(return_value=None)
+    assert await redis_async_service.evaluate_guess("client1", "bulbasaur") is None
+
+
+@pytest.mark.asyncio
+async def test_clear_state_deletes_key(mock_redis_client):
+    """Clear_state deletes the key."""
+    await redis_async_service.clear_state("client3")
+    mock_redis_client.delete.assert_awaited_once_with("quiz:client3")
+
+
+@pytest.mark.asyncio
+async def test_get_score_returns_int_or_zero(mock_redis_client):
+    """Missing scores count as zero"""
+    mock_redis_client.hmget.side_effect = [[b"100"], [None]]
+    assert await redis_async_service.get_score("client4") == 100
+    assert await redis_async_service.get_score("client5") == 0
+
+
+@pytest.mark.asyncio
+async def test_increment_score_increments_and_sets_expiry(mock_redis_client):
+    """The score is incremented and the session expiry refreshed in one transaction"""
+    pipe = mock_redis_client.pipeline.return_value
+    pipe.execute.return_value = [75, True]
+    assert await redis_async_service.increment_score("client6", value=50) == 75
+    pipe.hincrby.assert_called_once_with("quiz:client6", "score", 50)
+    pipe.expire.assert_called_once_with("quiz:client6", 1800)
+
+
+@pytest.mark.asyncio
+async def test_reset_score_sets_score_field(mock_redis_client):
+    """An existing session gets its score set to zero"""
+    mock_redis_client.exists.return_value = 1
+    assert await redis_async_service.reset_score("client7") is True
+    mock_redis_client.hset.assert_awaited_once_with("quiz:client7", "score", 0)
+
+
+@pytest.mark.asyncio
+async def test_reset_score_without_session(mock_redis_client):
+    """Nothing is created for unknown sessions"""
+    mock_redis_client.exists.return_value = 0
+    assert await redis_async_service.reset_score("client7") is False
+    mock_redis_client.hset.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_close_redis_client_disconnects_pool(mock_redis_client):
+    """Closing the shared client disconnects its pool and forgets it"""
+    await redis_async_service.close_redis_client()
+    mock_redis_client.aclose.assert_awaited_once()
+    mock_redis_client.connection_pool.disconnect.assert_awaited_once()
+    assert redis_async_service.CLIENT is None
@@ -1,10 +1,10 @@
 """Redis serivce unit tests (redis mocked)"""
 import pytest
 from unittest.mock import patch, MagicMock
-import json
 import time
 
 import app.services.redis_service as redis_service
+from app.util import metrics
 
 
 @pytest.fixture
@@ -13,24 +13,56 @@ def mock_redis_client():
     with patch("app.services.redis_service.redis.Redis") as mock_redis_class:
         mock_client = MagicMock()
         mock_redis_class.return_value = mock_client
+        redis_service.CLIENT = None
         yield mock_client
+        redis_service.CLIENT = None
 
 
 def test_create_redis_client_calls_with_env_vars(monkeypatch):
     """Client calls using envs"""
     monkeypatch.setenv("REDIS_HOST", "myhost")
     monkeypatch.setenv("REDIS_PORT", "1234")
-    with patch("app.services.redis_service.redis.Redis") as mock_redis:
-        redis_service.create_redis_client()
-        mock_redis.assert_called_once_with(
-            host="myhost", port=1234, db=0, decode_responses=True)
-
-
-def test_get_redis_client_returns_new_client_instance():
-    """get redis client returns redis client, lets test that"""
+    monkeypatch.setenv("REDIS_MAX_CONNECTIONS", "7")
+    monkeypatch.setenv("REDIS_SOCKET_TIMEOUT", "2")
+    monkeypatch.setenv("REDIS_HEALTH_CHECK_INTERVAL", "15")
+    client = redis_service.create_redis_client()
+    pool = client.connection_pool
+    assert isinstance(pool, redis_service.InstrumentedConnectionPool)
+    assert pool.max_connections == 7
+    assert pool.connection_kwargs["host"] == "myhost"
+    assert pool.connection_kwargs["port"] == 1234
+    assert pool.connection_kwargs["decode_responses"] is False
+    assert pool.connection_kwargs["socket_timeout"] == 2
+    assert pool.connection_kwargs["health_check_interval"] == 15
+
+
+def test_get_redis_client_reuses_shared_client(mock_redis_client):
+    """get redis client creates the client once and then reuses it"""
     with patch("app.services.redis_service.create_redis_client") as mock_create:
-        redis_service.get_redis_client()
+        first = redis_service.get_redis_client()
+        second = redis_service.get_redis_client()
         mock_create.assert_called_once()
+        assert first is second
+
+
+def test_close_redis_client_disconnects_pool(mock_redis_client):
+    """Closing the shared client disconnects its pool and forgets it"""
+    redis_service.get_redis_client()
+    redis_service.close_redis_client()
+    mock_redis_client.connection_pool.disconnect.assert_called_once()
+    assert redis_service.CLIENT is None
+
+
+def test_pool_records_utilization_and_wait_time():
+    """Checking out and releasing connections updates the pool metrics"""
+    metrics.reset()
+    pool = redis_service.InstrumentedConnectionPool(max_connections=2, timeout=0)
+    with patch.object(pool, "make_connection", return_value=MagicMock()):
+        connection = pool.get_connection()
+        assert metrics.snapshot()["gauges"]["redis_pool.in_use"] == 1
+        pool.release(connection)
+    assert metrics.snapshot()["gauges"]["redis_pool.in_use"] == 0
+    assert metrics.snapshot()["timings"]["redis_pool.wait_seconds"]["count"] == 1
 
 
 def test_is_redis_healthy_returns_true_when_ping_success(mock_redis_client):
@@ -54,61 +86,3 @@ def test_is_redis_healthy_retries_and_returns_false(monkeypatch):
         result = redis_service.is_redis_healthy(retries=3, delay=0)
         assert result is False
         assert mock_client.ping.call_count == 3
-
-
-def test_get_state_returns_deserialized_state(mock_redis_client):
-    """I think the test name speaks for itself"""
-    sample_data = {"name": "bulbasaur", "pokemon_id": 1}
-    mock_redis_client.get.return_value = json.dumps(sample_data)
-
-    state = redis_service.get_state("client1")
-    assert state == sample_data
-    mock_redis_client.get.assert_called_once_with("quiz:client1")
-
-
-def test_get_state_returns_none_if_no_state(mock_redis_client):
-    """Return none if no state is there. duh."""
-    mock_redis_client.get.return_value = None
-    state = redis_service.get_state("client1")
-    assert state is None
-
-
-def test_set_state_sets_json_with_expiry(mock_redis_client):
-    """Json expiry set correctly"""
-    data = {"name": "charmander"}
-    redis_service.set_state("client2", data)
-    expected_key = "quiz:client2"
-    mock_redis_client.setex.assert_called_once()
-    args, kwargs = mock_redis_client.setex.call_args
-    assert args[0] == expected_key
-    assert args[1] == 1800
-    assert json.loads(args[2]) == data
-
-
-def test_clear_state_deletes_key(mock_redis_client):
-    """Clear_state deletes the key."""
-    redis_service.clear_state("client3")
-    mock_redis_client.delete.assert_called_once_with("quiz:client3")
-
-
-def test_get_score_returns_int_or_zero(mock_redis_client):
-    """Test if scores are stored correctly"""
-    mock_redis_client.get.side_effect = ["100", None]
-    score1 = redis_service.get_score("client4")
-    score2 = redis_service.get_score("client5")
-    assert score1 == 100
-    assert score2 == 0
-
-
-def test_increment_score_increments_and_sets_expiry(mock_redis_client):
-    """Test score increment"""
-    redis_service.increment_score("client6", value=50)
-    expected_key = "quiz:client6:score"
-    mock_redis_client.incrby.assert_called_once_with(expected_key, 50)
-    mock_redis_client.expire.assert_called_once_with(expected_key, 1800)
-
-
-def test_reset_score_deletes_score_key(mock_redis_client):
-    """Test reset score"""
-    redis_service.reset_score("client7")
-    mock_redis_client.delete.assert_called_once_with("quiz:client7:score")
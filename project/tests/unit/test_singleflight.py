@@ -0,0 +1,105 @@
+"""Single-flight coalescing unit tests"""
+import asyncio
+import pytest
+
+from app.util import metrics
+from app.util.singleflight import SingleFlight
+
+
+@pytest.fixture(autouse=True)
+def clean_metrics():
+    """Start every test with zeroed counters"""
+    metrics.reset()
+
+
+@pytest.mark.asyncio
+async def test_concurrent_calls_share_one_execution():
+    """Five callers, one fetch"""
+    flight = SingleFlight("test_fetch")
+    calls = []
+
+    async def fetch():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return {"name": "mew"}
+
+    results = await asyncio.gather(*(flight.do(151, fetch) for _ in range(5)))
+
+    assert len(calls) == 1
+    assert all(result == {"name": "mew"} for result in results)
+    assert metrics.get_counter("test_fetch.executed") == 1
+    assert metrics.get_counter("test_fetch.coalesced") == 4
+    assert flight.in_flight() == 0
+
+
+@pytest.mark.asyncio
+async def test_different_keys_are_not_coalesced():
+    """Every key gets its own call"""
+    flight = SingleFlight("test_fetch")
+
+    async def fetch():
+        await asyncio.sleep(0)
+        return True
+
+    await asyncio.gather(flight.do(1, fetch), flight.do(2, fetch))
+    assert metrics.get_counter("test_fetch.executed") == 2
+    assert metrics.get_counter("test_fetch.coalesced") == 0
+
+
+@pytest.mark.asyncio
+async def test_exception_reaches_every_caller():
+    """If the shared call fails, all waiting callers see the error"""
+    flight = SingleFlight("test_fetch")
+
+    async def fetch():
+        await asyncio.sleep(0.01)
+        raise ConnectionError("PokeAPI down")
+
+    results = await asyncio.gather(*(flight.do(1, fetch) for _ in range(3)),
+                                   return_exceptions=True)
+    assert all(isinstance(result, ConnectionError) for result in results)
+    assert flight.in_flight() == 0
+
+
+@pytest.mark.asyncio
+async def test_cancelled_leader_is_taken_over():
+    """Waiting callers survive the cancellation of the caller that runs the call"""
+    flight = SingleFlight("test_fetch")
+    calls = []
+
+    async def fetch():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return {"name": "mew"}
+
+    leader = asyncio.create_task(flight.do(151, fetch))
+    await asyncio.sleep(0)
+    followers = [asyncio.create_task(flight.do(151, fetch)) for _ in range(3)]
+    await asyncio.sleep(0)
+    leader.cancel()
+
+    results = await asyncio.gather(*followers)
+    assert all(result == {"name": "mew"} for result in results)
+    assert len(calls) == 2
+    assert metrics.get_counter("test_fetch.takeovers") == 3
+    assert leader.cancelled()
+
+
+@pytest.mark.asyncio
+async def test_cancelled_follower_does_not_affect_leader():
+    """A waiting caller that is cancelled itself stops waiting, the call goes on"""
+    flight = SingleFlight("test_fetch")
+
+    async def fetch():
+        await asyncio.sleep(0.01)
+        return True
+
+    leader = asyncio.create_task(flight.do(1, fetch))
+    await asyncio.sleep(0)
+    follower = asyncio.create_task(flight.do(1, fetch))
+    await asyncio.sleep(0)
+    follower.cancel()
+
+    assert await leader is True
+    with pytest.raises(asyncio.CancelledError):
+        await follower
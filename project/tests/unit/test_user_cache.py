@@ -0,0 +1,126 @@
+"""User cache unit tests (database and redis mocked)"""
+import datetime
+from unittest.mock import AsyncMock, patch
+import pytest
+
+from app.services import auth_service, user_cache
+from app.util import metrics
+
+USER = {"id": 1, "username": "ashketchum", "created_at": datetime.datetime(2025, 5, 1, 12, 0)}
+ROW = dict(USER, password_hash="hash")
+
+
+@pytest.fixture(autouse=True)
+def fresh_cache(monkeypatch):
+    monkeypatch.setattr(user_cache, "CACHE", None)
+    monkeypatch.delenv("USER_CACHE_BACKEND", raising=False)
+    metrics.reset()
+    yield
+    metrics.reset()
+
+
+@pytest.fixture
+def mock_redis_client(monkeypatch):
+    client = AsyncMock()
+    client.get.return_value = None
+    monkeypatch.setenv("USER_CACHE_BACKEND", "redis")
+    monkeypatch.setattr(user_cache, "get_redis_client", lambda: client)
+    return client
+
+
+def test_cache_evicts_least_recently_used():
+    """Beyond the size cap the least recently used entry is dropped"""
+    cache = user_cache.UserCache(ttl=60, max_entries=2)
+    cache.put("a", {"username": "a"})
+    cache.put("b", {"username": "b"})
+    cache.get("a")
+    cache.put("c", {"username": "c"})
+
+    assert cache.get("b") is None
+    assert cache.get("a") == {"username": "a"}
+    assert metrics.get_counter("user_cache.evictions") == 1
+
+
+def test_cache_entries_expire():
+    """Entries older than the TTL are misses"""
+    cache = user_cache.UserCache(ttl=60, max_entries=10)
+    with patch("app.services.user_cache.time.monotonic", return_value=100):
+        cache.put("a", {"username": "a"})
+    with patch("app.services.user_cache.time.monotonic", return_value=161):
+        assert cache.get("a") is None
+
+
+@pytest.mark.asyncio
+async def test_get_user_records_hit_ratio():
+    """Hits and misses are counted and the hit ratio is exposed as a gauge"""
+    assert await user_cache.get_user("ashketchum") is None
+    await user_cache.put_user(ROW)
+    assert await user_cache.get_user("ashketchum") == USER
+
+    snapshot = metrics.snapshot()
+    assert snapshot["counters"]["user_cache.hits"] == 1
+    assert snapshot["counters"]["user_cache.misses"] == 1
+    assert snapshot["gauges"]["user_cache.hit_ratio"] == 0.5
+    assert snapshot["gauges"]["user_cache.size"] == 1
+
+
+@pytest.mark.asyncio
+async def test_backend_off_never_caches(monkeypatch):
+    """With the cache switched off every lookup is left to the database"""
+    monkeypatch.setenv("USER_CACHE_BACKEND", "off")
+    await user_cache.put_user(USER)
+    assert await user_cache.get_user("ashketchum") is None
+
+
+@pytest.mark.asyncio
+async def test_redis_backend_shares_entries(mock_redis_client):
+    """Entries are written to Redis, without the password hash, and a local miss is
+    answered from there"""
+    await user_cache.put_user(ROW)
+    key, blob = mock_redis_client.set.call_args.args
+    assert key == "user:v2:ashketchum"
+    assert b"hash" not in blob
+    assert mock_redis_client.set.call_args.kwargs["ex"] == 60
+
+    user_cache.get_cache().discard("ashketchum")
+    mock_redis_client.get.return_value = blob
+    assert await user_cache.get_user("ashketchum") == USER
+    assert metrics.get_counter("user_cache.redis_hits") == 1
+
+
+@pytest.mark.asyncio
+async def test_invalidate_drops_local_and_redis_entry(mock_redis_client):
+    """Invalidation removes the user in this process and in Redis"""
+    await user_cache.put_user(USER)
+    await user_cache.invalidate("ashketchum")
+
+    assert user_cache.get_cache().get("ashketchum") is None
+    mock_redis_client.delete.assert_awaited_once_with("user:v2:ashketchum")
+
+
+@pytest.mark.asyncio
+async def test_row_read_before_invalidation_is_not_cached(mock_redis_client):
+    """A row read from the database while the user is invalidated is not cached"""
+    since = user_cache.generation()
+    await user_cache.invalidate("ashketchum")
+    await user_cache.put_user(ROW, since)
+
+    assert await user_cache.get_user("ashketchum") is None
+    mock_redis_client.set.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_token_lookup_reads_database_once():
+    """Resolving the same token twice only queries the database once"""
+    token = auth_service.create_access_token({"sub": "ashketchum"}).access_token
+    db_conn = object()
+    with patch("app.services.database_async_service.get_user",
+               new=AsyncMock(return_value=ROW)) as mock_get_user, \
+            patch("app.services.token_denylist.is_revoked", new=AsyncMock(return_value=False)):
+        first = await auth_service.get_user_from_token_async(token, db_conn)
+        second = await auth_service.get_user_from_token_async(token, db_conn)
+
+    assert first == second
+    assert first.password_hash is None
+    assert first.username == "ashketchum"
+    mock_get_user.assert_awaited_once()
@@ -36,9 +36,11 @@ def test_add_user_integrity_error(mock_get_connection):
     mock_cursor.close.assert_called()
 
 
+@patch("app.services.leaderboard_service.remove_player_sync")
+@patch("app.services.token_denylist.revoke_user_sync")
 @patch("app.services.database_service.get_connection")
-def test_delete_user(mock_get_connection):
-    """Check if you can delete a user. Unused."""
+def test_delete_user(mock_get_connection, mock_revoke_user, mock_remove_player):
+    """Check if you can delete a user, their tokens and leaderboard entries go with them"""
     mock_conn = MagicMock()
     mock_cursor = MagicMock()
     mock_get_connection.return_value = mock_conn
@@ -52,6 +54,8 @@ def test_delete_user(mock_get_connection):
         "DELETE FROM users WHERE username = %s", ("testuser",)
     )
     mock_conn.commit.assert_called_once()
+    mock_revoke_user.assert_called_once_with("testuser")
+    mock_remove_player.assert_called_once_with("testuser")
     # No need to call cursor.close because 'with' context manager auto-closes
 
 